@@ -0,0 +1,109 @@
+"""
+Batch reprint and end-of-day manifest.
+
+Bookings are read from the DB in id-ordered batches (yield_per) and streamed
+straight into a single spool file, so printing a 2,000-consignment day never
+holds more than one batch of rows or one rendered page in memory. Every job
+gets its own mkstemp file, so overlapping prints can't clobber each other.
+"""
+import logging
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+import db
+import receipts
+from db import CourierForm
+
+ID_CHUNK = 500   # ids per IN (...) query; stays well under SQLite's variable limit
+
+
+def iter_forms(ids=None, start=None, end=None, batch_size: int = 500):
+    """
+    Yield CourierForm rows either for the given ids (in that order) or for
+    start <= created_at < end (oldest first).
+    """
+    session = db.get_session()
+    try:
+        if ids is not None:
+            ids = list(ids)
+            for i in range(0, len(ids), ID_CHUNK):
+                chunk = ids[i:i + ID_CHUNK]
+                found = {f.id: f for f in session.query(CourierForm).filter(CourierForm.id.in_(chunk))}
+                for rid in chunk:
+                    if rid in found:
+                        yield found[rid]
+                session.expunge_all()
+            return
+        q = session.query(CourierForm)
+        if start is not None:
+            q = q.filter(CourierForm.created_at >= start)
+        if end is not None:
+            q = q.filter(CourierForm.created_at < end)
+        yield from q.order_by(CourierForm.created_at, CourierForm.id).yield_per(batch_size)
+    finally:
+        session.close()
+
+
+def day_range(day):
+    """date/datetime -> (start, end) datetimes covering that calendar day."""
+    start = datetime(day.year, day.month, day.day)
+    return start, start + timedelta(days=1)
+
+
+def _spool(write, suffix: str, prefix: str):
+    fd, path = tempfile.mkstemp(prefix=prefix, suffix=suffix)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            n = write(f)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path, n
+
+
+def spool_receipts(records, fmt: str = "pdf", template=None, progress=None):
+    """
+    Render records into one multi-page spool file. Returns (path, receipts);
+    progress(done) is called every 100 receipts.
+    """
+    if fmt not in receipts.SPOOL_SUFFIXES:
+        raise ValueError(f"Unknown receipt format {fmt!r}; expected one of {sorted(receipts.SPOOL_SUFFIXES)}")
+    path, n = _spool(
+        lambda f: receipts.write_receipts(_counted(records, progress), f, fmt, template),
+        receipts.SPOOL_SUFFIXES[fmt], "courierx_batch_",
+    )
+    logging.info("Spooled %d receipt(s) to %s", n, path)
+    return path, n
+
+
+def spool_manifest(records, title: str, fmt: str = "pdf", progress=None):
+    """
+    Render a manifest sheet into a spool file. Returns (path, pages, bookings);
+    an empty selection still renders one header-only page, so callers should
+    check bookings, not pages.
+    """
+    counted = [0]
+
+    def tally(n):
+        counted[0] = n
+        if progress:
+            progress(n)
+
+    path, pages = _spool(
+        lambda f: receipts.write_manifest(_counted(records, tally), f, title, fmt),
+        receipts.SPOOL_SUFFIXES[fmt], "courierx_manifest_",
+    )
+    logging.info("Spooled %d-page manifest of %d booking(s) to %s", pages, counted[0], path)
+    return path, pages, counted[0]
+
+
+def _counted(records, progress, every: int = 100):
+    n = 0
+    for r in records:
+        yield r
+        n += 1
+        if progress and n % every == 0:
+            progress(n)
+    if progress:
+        progress(n)
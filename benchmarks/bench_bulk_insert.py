@@ -0,0 +1,74 @@
+"""
+Benchmark: rows/second for db.bulk_insert_forms and journal batches through
+db.insert_forms_once, with the FTS5 search index maintained. Exits non-zero
+if a rate is below its floor (the defaults fail with a per-row FTS trigger).
+
+    python benchmarks/bench_bulk_insert.py [--rows 50000] [--batch 200] [--min-rate 10000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import db
+from bench_suite import booking
+
+
+def synthetic_rows(n: int, prefix: str, seed: int) -> list:
+    """Prebuilt rows, so only the insert itself is timed."""
+    rnd = random.Random(seed)
+    pins = [str(110001 + i) for i in range(500)]
+    start = datetime.now() - timedelta(days=30)
+    rows = []
+    for i in range(n):
+        data = booking(rnd, pins, start + timedelta(seconds=i))
+        data["receipt_no"] = f"{prefix}{i + 1:07d}"
+        rows.append(data)
+    return rows
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--rows", type=int, default=50_000)
+    ap.add_argument("--batch", type=int, default=200, help="journal batch size (journal.py default)")
+    ap.add_argument("--min-rate", type=float, default=10_000, help="bulk_insert_forms rows/s floor")
+    ap.add_argument("--min-journal-rate", type=float, default=5_000, help="insert_forms_once rows/s floor")
+    args = ap.parse_args()
+
+    bulk_rows = synthetic_rows(args.rows, "SX", seed=1)
+    journal_rows = synthetic_rows(args.rows, "JX", seed=2)
+    with tempfile.TemporaryDirectory() as tmp:
+        db.init_db(f"sqlite:///{os.path.join(tmp, 'courierx.db')}")
+
+        t0 = time.perf_counter()
+        inserted, failures = db.bulk_insert_forms(iter(bulk_rows))
+        bulk_rate = inserted / (time.perf_counter() - t0)
+        if failures:
+            raise RuntimeError(f"{len(failures)} synthetic rows failed, e.g. {failures[0][2]}")
+
+        t0 = time.perf_counter()
+        journaled = 0
+        for i in range(0, len(journal_rows), args.batch):
+            journaled += db.insert_forms_once(journal_rows[i:i + args.batch])[0]
+        journal_rate = journaled / (time.perf_counter() - t0)
+
+        with db._engine.begin() as conn:
+            conn.exec_driver_sql(f"INSERT INTO {db.FTS_TABLE} ({db.FTS_TABLE}) VALUES ('integrity-check')")
+        db._engine.dispose()
+
+    print(f"rows={args.rows} journal batch={args.batch}")
+    print(f"bulk_insert_forms : {bulk_rate:10,.0f} rows/s")
+    print(f"insert_forms_once : {journal_rate:10,.0f} rows/s")
+    print("FTS integrity-check: ok")
+    if bulk_rate < args.min_rate or journal_rate < args.min_journal_rate:
+        sys.exit("below the rows/s floor")
+
+
+if __name__ == "__main__":
+    main()
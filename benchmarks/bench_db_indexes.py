@@ -0,0 +1,109 @@
+"""
+Benchmark: report and lookup latency on courier_forms before/after the
+indexes added by db.migrate_db.
+
+    python benchmarks/bench_db_indexes.py [--rows 1000000] [--db /tmp/bench.db]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.schema import CreateTable
+
+from db import CourierForm, migrate_db
+
+TABLE = CourierForm.__table__
+
+
+def seed(engine, rows: int, chunk: int = 20_000):
+    """Create courier_forms without indexes and fill it with synthetic rows."""
+    rnd = random.Random(42)
+    start = datetime.now() - timedelta(days=365)
+    with engine.begin() as conn:
+        conn.execute(CreateTable(TABLE))
+    for base in range(0, rows, chunk):
+        batch = []
+        for i in range(base, min(base + chunk, rows)):
+            ts = start + timedelta(seconds=i * 365 * 86400 // rows)
+            batch.append({
+                "receipt_no": f"RX{i + 1:07d}", "token_no": f"T{rnd.randint(1, 99999)}",
+                "weight": f"{rnd.uniform(0.1, 20):.2f}", "price": str(rnd.randint(40, 2000)),
+                "sender_name": f"Sender {i}", "sender_phone": f"9{rnd.randint(0, 999999999):09d}",
+                "receiver_name": f"Receiver {i}", "receiver_phone": f"8{rnd.randint(0, 999999999):09d}",
+                "city": f"District {i % 700}", "state": f"State {i % 36}",
+                "receiver_pincode": str(rnd.randint(110001, 855117)),
+                "created_at": ts, "updated_at": ts,
+            })
+        with engine.begin() as conn:
+            conn.execute(TABLE.insert(), batch)
+
+
+def measure(engine, samples: dict, repeat: int):
+    c = TABLE.c
+    cutoff = datetime.now() - timedelta(days=30)
+    queries = {
+        "recent report (1st page)": lambda _: (select(c.id, c.created_at, c.receipt_no)
+                                               .where(c.created_at >= cutoff)
+                                               .order_by(c.created_at.desc(), c.id.desc()).limit(200)),
+        "by receipt_no": lambda v: select(c.id).where(c.receipt_no == v),
+        "by token_no": lambda v: select(c.id).where(c.token_no == v),
+        "by receiver_phone": lambda v: select(c.id).where(c.receiver_phone == v),
+    }
+    keys = {"by receipt_no": "receipt_no", "by token_no": "token_no", "by receiver_phone": "receiver_phone"}
+    out = {}
+    with engine.connect() as conn:
+        for name, build in queries.items():
+            vals = samples[keys[name]] if name in keys else [None]
+            t0 = time.perf_counter()
+            for _ in range(repeat):
+                for v in vals:
+                    conn.execute(build(v)).fetchall()
+            out[name] = (time.perf_counter() - t0) / (repeat * len(vals))
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--db", default=os.path.join(tempfile.gettempdir(), "courierx_bench_indexes.db"))
+    args = ap.parse_args()
+
+    if os.path.exists(args.db):
+        os.remove(args.db)
+    engine = create_engine(f"sqlite:///{args.db}")
+
+    t0 = time.perf_counter()
+    seed(engine, args.rows)
+    print(f"seeded {args.rows} rows in {time.perf_counter() - t0:.1f} s -> {args.db}")
+
+    with engine.connect() as conn:
+        samples = {
+            col: [r[0] for r in conn.execute(text(
+                f"SELECT {col} FROM courier_forms ORDER BY random() LIMIT 20"))]
+            for col in ("receipt_no", "token_no", "receiver_phone")
+        }
+
+    before = measure(engine, samples, args.repeat)
+    t0 = time.perf_counter()
+    migrate_db(engine)
+    print(f"migrate_db (index build) took {time.perf_counter() - t0:.1f} s")
+    after = measure(engine, samples, args.repeat)
+
+    print(f"{'query':28} {'before ms':>12} {'after ms':>12} {'speedup':>9}")
+    for name in before:
+        b, a = before[name] * 1000, after[name] * 1000
+        print(f"{name:28} {b:12.3f} {a:12.3f} {b / a:8.0f}x")
+    engine.dispose()
+    os.remove(args.db)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Micro-benchmark: receiver PIN lookup, pandas boolean-mask scan vs PinIndex.
+
+    python benchmarks/bench_pin_lookup.py [--rows 150000] [--lookups 2000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from pincodes import PinIndex
+
+
+def synthetic_frame(rows: int, seed: int = 7) -> pd.DataFrame:
+    rnd = random.Random(seed)
+    pins = [str(rnd.randint(110001, 855117)) for _ in range(rows)]
+    return pd.DataFrame({
+        "officename": [f"Office {i}" for i in range(rows)],
+        "pincode": pins,
+        "district": [f"District {int(p) % 700}" for p in pins],
+        "statename": [f"State {int(p) % 36}" for p in pins],
+    }, dtype=str)
+
+
+def scan_lookup(df: pd.DataFrame, pin: str):
+    rows = df[df["pincode"] == pin]
+    if rows.empty:
+        return None, None
+    return rows.iloc[0]["district"], rows.iloc[0]["statename"]
+
+
+def timed(fn, pins):
+    t0 = time.perf_counter()
+    for p in pins:
+        fn(p)
+    return (time.perf_counter() - t0) / len(pins)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--rows", type=int, default=150_000)
+    ap.add_argument("--lookups", type=int, default=2000)
+    args = ap.parse_args()
+
+    df = synthetic_frame(args.rows)
+    t0 = time.perf_counter()
+    idx = PinIndex.from_columns(
+        df["pincode"].tolist(), df["district"].tolist(),
+        df["statename"].tolist(), df["officename"].tolist(),
+    )
+    build = time.perf_counter() - t0
+
+    rnd = random.Random(1)
+    pins = [rnd.choice(df["pincode"].values) for _ in range(args.lookups)]
+    # Scan is slow; a small sample is enough to get a stable per-call figure
+    scan = timed(lambda p: scan_lookup(df, p), pins[:200])
+    fast = timed(idx.lookup, pins)
+
+    print(f"rows={args.rows} unique_pins={len(idx)} index_build={build * 1000:.1f} ms")
+    print(f"pandas mask scan : {scan * 1e6:10.1f} us/lookup")
+    print(f"PinIndex.lookup  : {fast * 1e6:10.3f} us/lookup  ({scan / fast:,.0f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Micro-benchmark: receipts rendered per second for each receipts.RENDERERS format.
+
+    python benchmarks/bench_receipts.py [--receipts 5000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import receipts
+
+
+def synthetic_bookings(n: int, seed: int = 7) -> list:
+    rnd = random.Random(seed)
+    return [{
+        "receipt_no": f"RX{i:05d}", "token_no": str(rnd.randint(1, 999)),
+        "weight": f"{rnd.uniform(0.1, 20):.2f}", "price": str(rnd.randint(40, 2500)),
+        "sender_name": f"Sender {i}", "sender_address": f"{rnd.randint(1, 200)} MG Road",
+        "sender_pincode": "560001", "sender_phone": f"98{rnd.randint(10**7, 10**8 - 1)}",
+        "receiver_name": f"Receiver {i}", "house": str(rnd.randint(1, 99)),
+        "street": "Station Road", "locality": "Indiranagar", "city": "Bengaluru Urban",
+        "state": "Karnataka", "receiver_pincode": str(rnd.randint(110001, 855117)),
+        "receiver_phone": f"99{rnd.randint(10**7, 10**8 - 1)}",
+    } for i in range(n)]
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--receipts", type=int, default=5000)
+    args = ap.parse_args()
+
+    bookings = synthetic_bookings(args.receipts)
+    ts = "2024-01-01 10:00:00"
+    print(f"receipts={args.receipts}")
+    for fmt in receipts.RENDERERS:
+        t0 = time.perf_counter()
+        size = 0
+        for b in bookings:
+            size += len(receipts.render(b, fmt, timestamp=ts))
+        dt = time.perf_counter() - t0
+        print(f"{fmt:<8}: {args.receipts / dt:10,.0f} receipts/s  ({size / args.receipts:,.0f} bytes/receipt)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+"""
+Benchmark suite: PIN lookup, inserts, the Reports query, search and receipt
+rendering on synthetic data, at one or more scales.
+
+    python benchmarks/bench_suite.py [--scales 10000,100000,1000000] [--out results.json]
+
+For every scale a synthetic India_pincode.csv and a courierx.db with that
+many bookings are generated (fixed seed, so runs are comparable) in a temp
+directory. The same code paths as the app are exercised:
+
+  pin.load_csv       pincodes.load_csv (what ne.load_pincode_csv runs on a cache miss)
+  pin.lookup         pincodes.lookup_pin (all of ne.lookup_pin but the metrics wrapper)
+  insert.single      db.insert_form_row_sqlalchemy
+  insert.journal     db.insert_forms_once, one journal batch of --batch rows
+  insert.bulk        db.bulk_insert_forms (seeding the table; per-row figure)
+  report.first_page  db.recent_bookings_page, as the Reports window's load_recent
+  report.next_page   db.recent_bookings_page with a cursor (scrolling / GET /bookings?before=)
+  search             db.search_booking_ids on names / phones / receipt numbers
+  receipt.<format>   receipts.render as used by print_form_details
+
+Results are written as one JSON document (per-operation p50/p95/p99/mean in
+microseconds plus ops/s, with Python/SQLite/SQLAlchemy versions and the git
+revision) so two versions can be compared by diffing or by a script.
+"""
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import sqlalchemy
+
+import db
+import metrics
+import receipts
+from pincodes import load_csv, lookup_pin
+
+SYLLABLES = ["ra", "vi", "ku", "ma", "an", "sha", "pri", "ya", "de", "sin", "gh", "la", "ni", "to"]
+STATES = ["Delhi", "Karnataka", "Maharashtra", "Punjab", "Kerala", "Bihar", "Assam", "Goa"]
+
+
+def _name(rnd: random.Random) -> str:
+    def word():
+        return "".join(rnd.choice(SYLLABLES) for _ in range(rnd.randint(2, 3))).capitalize()
+    return f"{word()} {word()}"
+
+
+def write_pincode_csv(path: str, rows: int, seed: int = 7) -> list:
+    """India_pincode.csv-shaped file with rows offices; returns the distinct PINs."""
+    rnd = random.Random(seed)
+    pins = set()
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["officename", "pincode", "district", "statename"])
+        for i in range(rows):
+            pin = str(rnd.randint(110001, 855117))
+            pins.add(pin)
+            w.writerow([f"Office {i} B.O", pin, f"District {int(pin) % 700}", STATES[int(pin) % len(STATES)]])
+    return sorted(pins)
+
+
+def booking(rnd: random.Random, pins: list, created_at: datetime = None) -> dict:
+    data = {
+        "token_no": str(rnd.randint(1, 99999)), "weight": f"{rnd.uniform(0.1, 20):.2f}",
+        "price": str(rnd.randint(40, 2500)),
+        "sender_name": _name(rnd), "sender_address": f"{rnd.randint(1, 999)} MG Road",
+        "sender_pincode": rnd.choice(pins), "sender_phone": f"9{rnd.randint(0, 10**9 - 1):09d}",
+        "receiver_name": _name(rnd), "house": str(rnd.randint(1, 500)), "street": "Station Road",
+        "locality": "Civil Lines", "city": "Sample City", "state": rnd.choice(STATES),
+        "receiver_pincode": rnd.choice(pins), "receiver_phone": f"8{rnd.randint(0, 10**9 - 1):09d}",
+    }
+    if created_at is not None:
+        data["created_at"] = created_at
+    return data
+
+
+def seed_bookings(rows: int, pins: list, seed: int = 42, chunk: int = 5000):
+    """Bulk-load rows bookings spread over the last year (oldest first)."""
+    rnd = random.Random(seed)
+    start = datetime.now() - timedelta(days=365)
+    step = 365 * 86400 / max(rows, 1)
+
+    def gen():
+        for i in range(rows):
+            data = booking(rnd, pins, start + timedelta(seconds=i * step))
+            data["receipt_no"] = f"SX{i + 1:07d}"
+            yield data
+
+    t0 = time.perf_counter()
+    inserted, failures = db.bulk_insert_forms(gen(), chunk_size=chunk)
+    if failures:
+        raise RuntimeError(f"{len(failures)} synthetic rows failed validation, e.g. {failures[0][2]}")
+    return inserted, time.perf_counter() - t0
+
+
+def _measure(name: str, fn, args_list) -> None:
+    for a in args_list:
+        with metrics.timer(name):
+            fn(a)
+
+
+def bench_pins(workdir: str, rows: int, lookups: int):
+    path = os.path.join(workdir, "India_pincode.csv")
+    pins = write_pincode_csv(path, rows)
+    with metrics.timer("pin.load_csv"):
+        idx, _cols, _n = load_csv(path)
+    rnd = random.Random(1)
+    # ~10% misses, like mistyped PINs at the counter
+    sample = [rnd.choice(pins) if rnd.random() < 0.9 else str(rnd.randint(900000, 999999))
+              for _ in range(lookups)]
+    _measure("pin.lookup", lambda pin: lookup_pin(idx, pin), sample)
+    return pins
+
+
+def bench_db(workdir: str, rows: int, pins: list, args) -> dict:
+    db_path = os.path.join(workdir, "courierx.db")
+    db.init_db(f"sqlite:///{db_path}", args.profile)
+    try:
+        inserted, secs = seed_bookings(rows, pins)
+        metrics.record("insert.bulk", secs / max(inserted, 1))   # per-row figure, one sample
+        extra = {"bulk_rows_per_sec": round(inserted / secs, 1) if secs else None}
+
+        rnd = random.Random(3)
+        singles = []
+        for i in range(args.inserts):
+            data = booking(rnd, pins)
+            data["receipt_no"] = f"BX{i + 1:07d}"
+            singles.append(data)
+        _measure("insert.single", db.insert_form_row_sqlalchemy, singles)
+
+        now = datetime.now()
+        for b in range(args.batches):
+            batch = []
+            for i in range(args.batch):
+                data = booking(rnd, pins, now)
+                data["receipt_no"] = f"JX{b:03d}{i:05d}"
+                batch.append(data)
+            with metrics.timer("insert.journal"):
+                db.insert_forms_once(batch)
+
+        for _ in range(args.repeat):
+            with metrics.timer("report.first_page"):
+                page = db.recent_bookings_page()
+            for _ in range(4):
+                if len(page) < db.REPORT_PAGE_SIZE:
+                    break
+                with metrics.timer("report.next_page"):
+                    page = db.recent_bookings_page((page[-1].created_at, page[-1].id))
+
+        with db._engine.connect() as conn:
+            sample = conn.exec_driver_sql(
+                "SELECT receiver_name, receiver_phone, receipt_no FROM courier_forms "
+                "ORDER BY random() LIMIT 20").fetchall()
+        queries = []
+        for name, phone, receipt in sample:
+            queries += [name.split()[0], phone[-6:], receipt]
+        _measure("search", db.search_booking_ids, queries * max(1, args.repeat // 5))
+        extra["db_bytes"] = os.path.getsize(db_path)
+        return extra
+    finally:
+        db.SessionLocal.remove()
+        db._engine.dispose()
+
+
+def bench_receipts(pins: list, count: int, formats):
+    rnd = random.Random(5)
+    records = []
+    for i in range(min(count, 500)):
+        data = booking(rnd, pins)
+        data["receipt_no"] = f"RX{i + 1:05d}"
+        records.append(data)
+    ts = "2025-01-01 10:00:00"
+    for fmt in formats:
+        _measure(f"receipt.{fmt}", lambda r: receipts.render(r, fmt, timestamp=ts),
+                 (records[i % len(records)] for i in range(count)))
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "-C", ROOT, "rev-parse", "--short", "HEAD"],
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _results(scale: int) -> list:
+    out = []
+    for name, t in metrics.snapshot()["timers"].items():
+        if name.startswith(("db.", "journal.")):
+            continue        # the app's own instrumentation inside the calls timed here
+        mean_us = t["total_ms"] * 1000 / t["count"]
+        out.append({
+            "scale": scale, "bench": name, "ops": t["count"],
+            "mean_us": round(mean_us, 2),
+            "p50_us": round(t["p50_ms"] * 1000, 2), "p95_us": round(t["p95_ms"] * 1000, 2),
+            "p99_us": round(t["p99_ms"] * 1000, 2),
+            "ops_per_sec": round(1e6 / mean_us, 1) if mean_us else None,
+        })
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--scales", default="10000,100000",
+                    help="comma-separated row counts for bookings and the pincode CSV (e.g. 10000,100000,1000000)")
+    ap.add_argument("--lookups", type=int, default=20000)
+    ap.add_argument("--inserts", type=int, default=500, help="single ORM inserts per scale")
+    ap.add_argument("--batch", type=int, default=200, help="rows per insert_forms_once call")
+    ap.add_argument("--batches", type=int, default=20)
+    ap.add_argument("--repeat", type=int, default=50, help="Reports query repetitions")
+    ap.add_argument("--receipts", type=int, default=2000, help="receipts rendered per format")
+    ap.add_argument("--formats", default=",".join(receipts.RENDERERS))
+    ap.add_argument("--profile", default=db.DEFAULT_SQLITE_PROFILE, help="db.SQLITE_PROFILES entry")
+    ap.add_argument("--only", default="", help="comma-separated subset of: pin,db,receipt")
+    ap.add_argument("--out", help="write the JSON here instead of stdout")
+    ap.add_argument("--keep", action="store_true", help="keep the generated files")
+    args = ap.parse_args()
+
+    scales = [int(s) for s in args.scales.split(",") if s.strip()]
+    only = {s.strip() for s in args.only.split(",") if s.strip()} or {"pin", "db", "receipt"}
+    formats = [f.strip() for f in args.formats.split(",") if f.strip()]
+
+    report = {
+        "meta": {
+            "started": datetime.now().isoformat(timespec="seconds"),
+            "git": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sqlite": sqlite3.sqlite_version,
+            "sqlalchemy": sqlalchemy.__version__,
+            "profile": args.profile,
+            "args": vars(args),
+        },
+        "results": [],
+        "scales": {},
+    }
+    metrics.enable(True)
+    for scale in scales:
+        workdir = tempfile.mkdtemp(prefix=f"courierx_bench_{scale}_")
+        metrics.reset()
+        t0 = time.perf_counter()
+        try:
+            pins = bench_pins(workdir, scale, args.lookups) if "pin" in only else \
+                [str(110001 + i * 37) for i in range(2000)]
+            extra = bench_db(workdir, scale, pins, args) if "db" in only else {}
+            if "receipt" in only:
+                bench_receipts(pins, args.receipts, formats)
+        finally:
+            if args.keep:
+                print(f"kept {workdir}", file=sys.stderr)
+            else:
+                shutil.rmtree(workdir, ignore_errors=True)
+        extra["wall_secs"] = round(time.perf_counter() - t0, 2)
+        report["scales"][str(scale)] = extra
+        report["results"] += _results(scale)
+        print(f"scale {scale}: done in {extra['wall_secs']} s", file=sys.stderr)
+        print(metrics.format_table(), file=sys.stderr)
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
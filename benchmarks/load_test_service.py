@@ -0,0 +1,139 @@
+"""
+Load test for service.py: concurrent keep-alive clients against the HTTP API.
+
+By default starts the service in-process on a throw-away DB (seeded with
+--seed bookings and a synthetic PIN index); pass --url to hit a running one.
+
+    python benchmarks/load_test_service.py [--clients 16] [--seconds 10] [--mix read|write|mixed]
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PINS = [str(110001 + i * 37) for i in range(2000)]
+
+
+def booking(rnd: random.Random) -> dict:
+    return {
+        "token_no": str(rnd.randint(1, 999)), "weight": f"{rnd.uniform(0.1, 20):.2f}",
+        "price": str(rnd.randint(40, 2500)),
+        "sender_name": "Load Test", "sender_address": "12 MG Road",
+        "sender_pincode": "560001", "sender_phone": f"98{rnd.randint(10**7, 10**8 - 1)}",
+        "receiver_name": f"Receiver {rnd.randint(1, 10**6)}", "house": "4", "street": "Station Road",
+        "locality": "Indiranagar", "receiver_pincode": rnd.choice(PINS),
+        "receiver_phone": f"99{rnd.randint(10**7, 10**8 - 1)}",
+    }
+
+
+def pick_request(rnd: random.Random, mix: str):
+    r = rnd.random()
+    if mix == "write" or (mix == "mixed" and r < 0.2):
+        return "POST", "/bookings", booking(rnd)
+    if mix == "mixed" and r < 0.3:
+        return "POST", "/receipts", None
+    if r < 0.7:
+        return "GET", f"/pin/{rnd.choice(PINS)}", None
+    if r < 0.9:
+        return "GET", "/bookings?limit=50", None
+    return "GET", f"/bookings?q={rnd.randint(10**5, 10**6 - 1)}", None   # partial phone search
+
+
+def client(host, port, mix, deadline, seed, results):
+    rnd = random.Random(seed)
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    lat, errors = [], 0
+    while time.perf_counter() < deadline:
+        method, path, body = pick_request(rnd, mix)
+        payload = json.dumps(body).encode() if body is not None else None
+        t0 = time.perf_counter()
+        try:
+            conn.request(method, path, body=payload,
+                         headers={"Content-Type": "application/json"} if payload else {})
+            resp = conn.getresponse()
+            resp.read()
+            if resp.status >= 400:
+                errors += 1
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=30)
+        lat.append(time.perf_counter() - t0)
+    conn.close()
+    results.append((lat, errors))
+
+
+def start_local_server(workers: int, seed_rows: int):
+    import db
+    import service
+    from pincodes import PinIndex
+
+    tmp = tempfile.mkdtemp(prefix="courierx_load_")
+    pin_index = PinIndex.from_columns(PINS, [f"District {i % 700}" for i in range(len(PINS))],
+                                      [f"State {i % 36}" for i in range(len(PINS))])
+    server = service.make_server(os.path.join(tmp, "courierx.db"), port=0, workers=workers,
+                                 pin_index=pin_index)
+    rnd = random.Random(3)
+    rows = []
+    for i in range(seed_rows):
+        b = booking(rnd)
+        b.update(receipt_no=f"SEED{i:07d}", city="Bengaluru", state="Karnataka")
+        rows.append(b)
+    db.bulk_insert_forms(rows)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--url", help="running service, e.g. http://127.0.0.1:8765")
+    ap.add_argument("--clients", type=int, default=16)
+    ap.add_argument("--seconds", type=float, default=10)
+    ap.add_argument("--mix", choices=("read", "write", "mixed"), default="mixed")
+    ap.add_argument("--workers", type=int, default=16, help="service threads (in-process server only)")
+    ap.add_argument("--seed", type=int, default=20000, help="bookings to preload (in-process server only)")
+    args = ap.parse_args()
+
+    server = None
+    if args.url:
+        u = urlsplit(args.url)
+        host, port = u.hostname, u.port or 80
+    else:
+        server = start_local_server(args.workers, args.seed)
+        host, port = "127.0.0.1", server.server_port
+
+    results = []
+    deadline = time.perf_counter() + args.seconds
+    threads = [threading.Thread(target=client, args=(host, port, args.mix, deadline, i, results))
+               for i in range(args.clients)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    if server is not None:
+        server.shutdown()
+        server.server_close()
+
+    lat = sorted(x for r in results for x in r[0])
+    errors = sum(r[1] for r in results)
+    if not lat:
+        print("no requests completed")
+        return
+    pct = lambda p: lat[min(len(lat) - 1, int(p / 100 * len(lat)))] * 1000
+    print(f"mix={args.mix} clients={args.clients} seconds={elapsed:.1f}")
+    print(f"requests={len(lat)} errors={errors} throughput={len(lat) / elapsed:,.0f} req/s")
+    print(f"latency ms: p50={pct(50):.2f} p95={pct(95):.2f} p99={pct(99):.2f} max={lat[-1] * 1000:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,917 @@
+"""
+CourierX database layer (SQLAlchemy ORM over SQLite).
+
+Kept free of Tkinter so the model, sessions and migrations can be used by
+benchmarks and headless tools as well as by the desktop app (ne.py).
+"""
+import logging
+import threading
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+from sqlalchemy import create_engine, event, select, text, tuple_, Column, Integer, String, DateTime, Index
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import declarative_base, sessionmaker, scoped_session
+
+import metrics
+
+
+# =========================
+# SQLAlchemy setup
+# =========================
+Base = declarative_base()
+_engine = None
+SessionLocal = None
+
+# =========================
+# SQLite performance profiles (applied on every new connection)
+# =========================
+SQLITE_PROFILES = {
+    # SQLite defaults: rollback journal, fsync on every commit
+    "legacy": {"busy_timeout": 5000},
+    # WAL, fsync only at checkpoints: safe against app crashes, readers never
+    # block the writer; a power cut can lose the last few commits at most
+    "balanced": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "temp_store": "MEMORY",
+        "cache_size": -20000,        # KiB (~20 MB)
+        "mmap_size": 268435456,      # 256 MB
+        "busy_timeout": 5000,        # ms
+    },
+    # WAL with fsync on every commit, for machines with flaky power
+    "durable": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "temp_store": "MEMORY",
+        "cache_size": -20000,
+        "busy_timeout": 5000,
+    },
+}
+DEFAULT_SQLITE_PROFILE = "balanced"
+
+def _apply_sqlite_profile(engine, profile: str):
+    pragmas = SQLITE_PROFILES.get(profile)
+    if pragmas is None:
+        logging.warning("Unknown DB profile %r; using %r", profile, DEFAULT_SQLITE_PROFILE)
+        pragmas = SQLITE_PROFILES[DEFAULT_SQLITE_PROFILE]
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_conn, _record):
+        cur = dbapi_conn.cursor()
+        try:
+            for name, value in pragmas.items():
+                cur.execute(f"PRAGMA {name} = {value}")
+        finally:
+            cur.close()
+
+class CourierForm(Base):
+    __tablename__ = "courier_forms"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    receipt_no = Column(String(32))
+    token_no = Column(String(32))
+    weight = Column(String(32))            # as typed (kg), shown on receipts
+    price = Column(String(32))             # as typed (₹), shown on receipts
+    weight_grams = Column(Integer)         # parsed, for SQL sums/filters
+    price_paise = Column(Integer)
+
+    sender_name = Column(String(128))
+    sender_address = Column(String(256))
+    sender_pincode = Column(String(16))
+    sender_phone = Column(String(16))
+
+    receiver_name = Column(String(128))
+    house = Column(String(64))
+    street = Column(String(128))
+    locality = Column(String(128))
+    city = Column(String(128))
+    state = Column(String(64))
+    receiver_pincode = Column(String(16))
+    receiver_phone = Column(String(16))
+
+    created_at = Column(DateTime)
+    updated_at = Column(DateTime)
+
+    __table_args__ = (
+        # created_at also serves the (created_at, id) keyset order: SQLite
+        # secondary indexes carry the rowid.
+        Index("ix_courier_forms_created_at", "created_at"),
+        Index("ux_courier_forms_receipt_no", "receipt_no", unique=True),
+        Index("ix_courier_forms_token_no", "token_no"),
+        Index("ix_courier_forms_receiver_phone", "receiver_phone"),
+        Index("ix_courier_forms_sender_phone", "sender_phone"),
+    )
+
+# Daily rollups for the dashboard, caught up from courier_forms by id
+class DailyRollup(Base):
+    __tablename__ = "daily_rollups"
+
+    day = Column(String(10), primary_key=True)        # YYYY-MM-DD
+    bookings = Column(Integer, nullable=False, default=0)
+    revenue_paise = Column(Integer, nullable=False, default=0)
+    weight_grams = Column(Integer, nullable=False, default=0)
+
+class DailyDestination(Base):
+    __tablename__ = "daily_destinations"
+
+    day = Column(String(10), primary_key=True)
+    state = Column(String(64), primary_key=True)
+    city = Column(String(128), primary_key=True)
+    bookings = Column(Integer, nullable=False, default=0)
+    revenue_paise = Column(Integer, nullable=False, default=0)
+
+class RollupState(Base):
+    __tablename__ = "rollup_state"
+
+    id = Column(Integer, primary_key=True)
+    last_form_id = Column(Integer, nullable=False, default=0)
+
+class ReceiptSequence(Base):
+    __tablename__ = "receipt_sequence"
+
+    name = Column(String(32), primary_key=True)
+    next_value = Column(Integer, nullable=False)
+
+def init_db(db_url: str, profile: str = DEFAULT_SQLITE_PROFILE, pool_size: int = None):
+    """
+    Create the engine (with the given SQLITE_PROFILES entry), tables and migrations.
+    pool_size sizes the connection pool for multi-threaded callers (service.py).
+    """
+    global _engine, SessionLocal
+    pool_args = {"pool_size": pool_size, "max_overflow": pool_size} if pool_size else {}
+    _engine = create_engine(db_url, connect_args={"check_same_thread": False}, **pool_args)
+    _apply_sqlite_profile(_engine, profile)
+    SessionLocal = scoped_session(sessionmaker(bind=_engine, autoflush=False, autocommit=False))
+    with _engine.connect() as conn:
+        current = conn.execute(text("PRAGMA user_version")).scalar() or 0
+    if current < SCHEMA_VERSION:
+        # Only new/old databases pay for create_all and the migration scan;
+        # tables added later must therefore come with a MIGRATIONS step.
+        Base.metadata.create_all(_engine)
+        migrate_db(_engine)
+    else:
+        # Cheap (one PRAGMA) unless duplicates kept receipt_no non-unique last time
+        with _engine.begin() as conn:
+            _ensure_unique_receipts(conn)
+    logging.info("SQLAlchemy DB ready at %s (profile: %s, schema %d)", db_url, profile,
+                 max(current, SCHEMA_VERSION))
+    return _engine
+
+# =========================
+# Schema migrations (PRAGMA user_version)
+# =========================
+def _create_indexes(conn):
+    """Add the courier_forms indexes to databases created before they existed."""
+    for idx in CourierForm.__table__.indexes:
+        try:
+            idx.create(conn, checkfirst=True)
+        except IntegrityError:
+            # Old temp-file receipt counters could hand out duplicates; keep
+            # the lookup fast even if uniqueness can't be enforced yet.
+            logging.warning("Duplicate receipt numbers found; creating %s as non-unique", idx.name)
+            conn.execute(text(
+                f"CREATE INDEX IF NOT EXISTS {idx.name} ON courier_forms (receipt_no)"
+            ))
+
+def parse_price_paise(value):
+    """'₹1,250.50' / '120' -> paise (int); '' -> None; raises ValueError if unparseable."""
+    s = str(value or "").strip()
+    for junk in ("₹", "Rs.", "Rs", "INR", ",", " "):
+        s = s.replace(junk, "")
+    if not s:
+        return None
+    try:
+        amount = Decimal(s)
+    except InvalidOperation:
+        raise ValueError(f"not a price: {value!r}")
+    if not amount.is_finite() or amount < 0:
+        raise ValueError(f"not a price: {value!r}")
+    return int((amount * 100).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+
+def parse_weight_grams(value):
+    """'1.25' / '1.25 kg' -> grams (int); '' -> None; raises ValueError if unparseable."""
+    s = str(value or "").strip().lower().replace("kgs", "").replace("kg", "").replace(",", "").strip()
+    if not s:
+        return None
+    try:
+        kg = Decimal(s)
+    except InvalidOperation:
+        raise ValueError(f"not a weight: {value!r}")
+    if not kg.is_finite() or kg < 0:
+        raise ValueError(f"not a weight: {value!r}")
+    return int((kg * 1000).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+
+def _add_numeric_columns(conn):
+    """Add price_paise / weight_grams and fill them from the text columns."""
+    existing = {r[1] for r in conn.execute(text("PRAGMA table_info(courier_forms)"))}
+    for col in ("price_paise", "weight_grams"):
+        if col not in existing:
+            conn.execute(text(f"ALTER TABLE courier_forms ADD COLUMN {col} INTEGER"))
+
+    bad = []
+    last_id = 0
+    while True:
+        rows = conn.execute(text(
+            "SELECT id, receipt_no, price, weight FROM courier_forms "
+            "WHERE id > :last ORDER BY id LIMIT 5000"), {"last": last_id}).all()
+        if not rows:
+            break
+        updates = []
+        for rid, receipt, price, weight in rows:
+            try:
+                paise = parse_price_paise(price)
+            except ValueError:
+                paise = None
+                bad.append((rid, receipt, "price", price))
+            try:
+                grams = parse_weight_grams(weight)
+            except ValueError:
+                grams = None
+                bad.append((rid, receipt, "weight", weight))
+            updates.append({"id": rid, "p": paise, "g": grams})
+        conn.execute(text("UPDATE courier_forms SET price_paise = :p, weight_grams = :g WHERE id = :id"), updates)
+        last_id = rows[-1][0]
+
+    if bad:
+        logging.warning("%d price/weight value(s) could not be parsed and were left empty:", len(bad))
+        for rid, receipt, field, value in bad[:200]:
+            logging.warning("  id=%s receipt=%s %s=%r", rid, receipt, field, value)
+        if len(bad) > 200:
+            logging.warning("  ... and %d more", len(bad) - 200)
+
+    # Rollups summed from the text columns are rebuilt by _integer_rollups (5)
+
+# Columns indexed for full-text search (Reports window search box)
+FTS_TABLE = "courier_forms_fts"
+FTS_COLUMNS = (
+    "sender_name", "receiver_name", "sender_phone", "receiver_phone",
+    "receipt_no", "token_no", "sender_address", "house", "street", "locality",
+    "city", "state", "sender_pincode", "receiver_pincode",
+)
+
+def _create_fts(conn):
+    """FTS5 index over courier_forms (external content), kept in sync by triggers."""
+    cols = ", ".join(FTS_COLUMNS)
+    new_vals = ", ".join(f"new.{c}" for c in FTS_COLUMNS)
+    old_vals = ", ".join(f"old.{c}" for c in FTS_COLUMNS)
+    # trigram matches any 3+ char fragment (middle of a phone number, part of
+    # a name); older SQLite builds fall back to word-prefix matching
+    version = tuple(int(x) for x in conn.execute(text("SELECT sqlite_version()")).scalar().split("."))
+    tokenizer = "trigram" if version >= (3, 34) else "unicode61"
+    try:
+        conn.execute(text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            f"{cols}, content='courier_forms', content_rowid='id', tokenize='{tokenizer}')"
+        ))
+    except Exception as e:
+        logging.warning("SQLite FTS5 unavailable (%s); booking search disabled", e)
+        return
+    conn.execute(text(f"""
+        CREATE TRIGGER IF NOT EXISTS courier_forms_fts_ai AFTER INSERT ON courier_forms BEGIN
+            INSERT INTO {FTS_TABLE} (rowid, {cols}) VALUES (new.id, {new_vals});
+        END"""))
+    conn.execute(text(f"""
+        CREATE TRIGGER IF NOT EXISTS courier_forms_fts_ad AFTER DELETE ON courier_forms BEGIN
+            INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, {cols}) VALUES ('delete', old.id, {old_vals});
+        END"""))
+    conn.execute(text(f"""
+        CREATE TRIGGER IF NOT EXISTS courier_forms_fts_au AFTER UPDATE OF {cols} ON courier_forms BEGIN
+            INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, {cols}) VALUES ('delete', old.id, {old_vals});
+            INSERT INTO {FTS_TABLE} (rowid, {cols}) VALUES (new.id, {new_vals});
+        END"""))
+    conn.execute(text(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')"))
+
+# While this table has a row (only ever inside a bulk write transaction, so no
+# other connection sees it) the per-row FTS insert trigger is skipped and the
+# bulk path indexes the new id range in one statement instead.
+FTS_PAUSE_TABLE = "courier_forms_fts_pause"
+
+def _pausable_fts_trigger(conn):
+    """Recreate the FTS insert trigger so bulk inserts can index set-wise."""
+    exists = conn.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :n"), {"n": FTS_TABLE}).first()
+    if not exists:
+        return
+    cols = ", ".join(FTS_COLUMNS)
+    new_vals = ", ".join(f"new.{c}" for c in FTS_COLUMNS)
+    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {FTS_PAUSE_TABLE} (paused INTEGER)"))
+    conn.execute(text("DROP TRIGGER IF EXISTS courier_forms_fts_ai"))
+    conn.execute(text(f"""
+        CREATE TRIGGER courier_forms_fts_ai AFTER INSERT ON courier_forms
+        WHEN NOT EXISTS (SELECT 1 FROM {FTS_PAUSE_TABLE}) BEGIN
+            INSERT INTO {FTS_TABLE} (rowid, {cols}) VALUES (new.id, {new_vals});
+        END"""))
+
+def _seed_receipt_sequence(conn):
+    """Start the DB receipt sequence after the highest RXnnnnn already stored,
+    and make the receipt_no index unique if duplicates kept it plain."""
+    ReceiptSequence.__table__.create(conn, checkfirst=True)
+    max_no = conn.execute(text(
+        "SELECT MAX(CAST(SUBSTR(receipt_no, 3) AS INTEGER)) FROM courier_forms "
+        "WHERE receipt_no LIKE 'RX%' AND SUBSTR(receipt_no, 3) GLOB '[0-9]*'")).scalar() or 0
+    conn.execute(text(
+        "INSERT OR IGNORE INTO receipt_sequence (name, next_value) VALUES (:n, :v)"),
+        {"n": RECEIPT_SEQUENCE, "v": max_no + 1})
+    _ensure_unique_receipts(conn)
+
+def _ensure_unique_receipts(conn) -> bool:
+    """
+    Make ux_courier_forms_receipt_no unique if duplicates kept it plain and
+    they are gone now. Runs on every start until it succeeds. Returns True
+    when receipt_no is unique.
+    """
+    unique = {r[1]: r[2] for r in conn.execute(text("PRAGMA index_list(courier_forms)"))}
+    if unique.get("ux_courier_forms_receipt_no") != 0:
+        return True
+    dupes = conn.execute(text(
+        "SELECT receipt_no, COUNT(*) FROM courier_forms WHERE receipt_no IS NOT NULL "
+        "GROUP BY receipt_no HAVING COUNT(*) > 1 ORDER BY receipt_no LIMIT 21")).all()
+    if dupes:
+        logging.warning("Receipt numbers used more than once: %s%s. receipt_no stays non-unique; "
+                        "renumber or delete the extra bookings and restart to enforce it.",
+                        ", ".join(f"{r} (x{n})" for r, n in dupes[:20]), " ..." if len(dupes) > 20 else "")
+        return False
+    conn.execute(text("DROP INDEX ux_courier_forms_receipt_no"))
+    conn.execute(text("CREATE UNIQUE INDEX ux_courier_forms_receipt_no ON courier_forms (receipt_no)"))
+    logging.info("receipt_no is unique again")
+    return True
+
+def _integer_rollups(conn):
+    """Recreate the rollup tables with integer paise/grams; refresh_rollups refills them."""
+    for table in (DailyRollup, DailyDestination, RollupState):
+        conn.execute(text(f"DROP TABLE IF EXISTS {table.__tablename__}"))
+        table.__table__.create(conn)
+
+MIGRATIONS = [
+    (1, _create_indexes),
+    (2, _add_numeric_columns),
+    (3, _create_fts),
+    (4, _seed_receipt_sequence),
+    (5, _integer_rollups),
+    (6, _pausable_fts_trigger),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def migrate_db(engine) -> int:
+    """Apply pending MIGRATIONS in order; returns the resulting schema version."""
+    with engine.begin() as conn:
+        current = conn.execute(text("PRAGMA user_version")).scalar() or 0
+        for version, step in MIGRATIONS:
+            if version <= current:
+                continue
+            logging.info("Migrating courierx.db schema %d -> %d", current, version)
+            step(conn)
+            conn.execute(text(f"PRAGMA user_version = {int(version)}"))
+            current = version
+    return current
+
+def get_session():
+    if SessionLocal is None:
+        raise RuntimeError("DB not initialized. Call init_db() first.")
+    return SessionLocal()
+
+# =========================
+# Validation (shared by the form, bulk insert and imports)
+# =========================
+FORM_FIELDS = (
+    "receipt_no", "token_no", "weight", "price",
+    "sender_name", "sender_address", "sender_pincode", "sender_phone",
+    "receiver_name", "house", "street", "locality", "city", "state",
+    "receiver_pincode", "receiver_phone",
+)
+
+def validate_form_data(data: dict):
+    """Return None if data passes the booking rules, else the error message."""
+    def get(key):
+        return str(data.get(key) or "").strip()
+
+    def digits(key, n):
+        v = get(key)
+        return not v or (v.isdigit() and len(v) == n)
+
+    if not get("receipt_no"):
+        return "Receipt No is required."
+    if not get("sender_name") or not get("receiver_name"):
+        return "Sender and Receiver names are required."
+    if not digits("receiver_pincode", 6):
+        return "Receiver Pin Code must be 6 digits."
+    if not digits("sender_pincode", 6):
+        return "Sender Pin Code must be 6 digits."
+    if not digits("sender_phone", 10):
+        return "Sender Phone must be 10 digits."
+    if not digits("receiver_phone", 10):
+        return "Receiver Phone must be 10 digits."
+    try:
+        parse_price_paise(data.get("price"))
+    except ValueError:
+        return "Price must be a number (e.g. 120 or 120.50)."
+    try:
+        parse_weight_grams(data.get("weight"))
+    except ValueError:
+        return "Weight must be a number in kg (e.g. 1.25)."
+    return None
+
+@metrics.timed("db.insert_form_row")
+def insert_form_row_sqlalchemy(data: dict):
+    """Insert one row via SQLAlchemy ORM."""
+    try:
+        now = datetime.now()
+        obj = CourierForm(
+            receipt_no=data.get("receipt_no"),
+            token_no=data.get("token_no"),
+            weight=data.get("weight"),
+            price=data.get("price"),
+            weight_grams=parse_weight_grams(data.get("weight")),
+            price_paise=parse_price_paise(data.get("price")),
+
+            sender_name=data.get("sender_name"),
+            sender_address=data.get("sender_address"),
+            sender_pincode=data.get("sender_pincode"),
+            sender_phone=data.get("sender_phone"),
+
+            receiver_name=data.get("receiver_name"),
+            house=data.get("house"),
+            street=data.get("street"),
+            locality=data.get("locality"),
+            city=data.get("city"),
+            state=data.get("state"),
+            receiver_pincode=data.get("receiver_pincode"),
+            receiver_phone=data.get("receiver_phone"),
+
+            created_at=now,
+            updated_at=now
+        )
+        session = get_session()
+        session.add(obj)
+        session.commit()
+        session.close()
+        return True, None
+    except Exception as e:
+        logging.exception("Insert failed: %s", e)
+        # try to rollback if session is still open
+        try:
+            session.rollback()
+            session.close()
+        except Exception:
+            pass
+        return False, str(e)
+
+def _db_timestamp(value) -> str:
+    """Format like SQLAlchemy's SQLite DateTime so ORM reads parse it."""
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S.%f")
+    return str(value)
+
+# Positional driver-level executemany: skips per-row ORM/Core parameter
+# processing, which dominates the cost at bulk volumes.
+_BULK_COLUMNS = FORM_FIELDS + ("price_paise", "weight_grams", "created_at", "updated_at")
+_BULK_INSERT_SQL = (f"INSERT INTO {CourierForm.__tablename__} ({', '.join(_BULK_COLUMNS)}) "
+                    f"VALUES ({', '.join('?' * len(_BULK_COLUMNS))})")
+
+def _bulk_params(data: dict, now: str) -> tuple:
+    get = data.get
+    params = tuple(None if get(f) is None else str(get(f)).strip() for f in FORM_FIELDS)
+    created = get("created_at")
+    return params + (
+        parse_price_paise(get("price")), parse_weight_grams(get("weight")),
+        _db_timestamp(created) if created else now, now,
+    )
+
+_fts_pausable = {}   # engine -> bool (FTS5 present and migrated to the pausable trigger)
+
+def _bulk_execute(conn, params) -> None:
+    """
+    executemany of _BULK_INSERT_SQL with the per-row FTS trigger paused, then
+    one INSERT ... SELECT indexes the new id range (several times faster than
+    the trigger for the trigram tokenizer). Call inside a transaction.
+    """
+    if _engine not in _fts_pausable:
+        _fts_pausable[_engine] = conn.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (FTS_PAUSE_TABLE,)).first() is not None
+    if not _fts_pausable[_engine]:
+        conn.exec_driver_sql(_BULK_INSERT_SQL, params)
+        return
+    cols = ", ".join(FTS_COLUMNS)
+    # The pause row is written first: it takes the write lock, so no other
+    # writer can add ids above `last` before ours
+    conn.exec_driver_sql(f"INSERT INTO {FTS_PAUSE_TABLE} (paused) VALUES (1)")
+    last = conn.exec_driver_sql(f"SELECT COALESCE(MAX(id), 0) FROM {CourierForm.__tablename__}").scalar()
+    conn.exec_driver_sql(_BULK_INSERT_SQL, params)
+    conn.exec_driver_sql(f"INSERT INTO {FTS_TABLE} (rowid, {cols}) "
+                         f"SELECT id, {cols} FROM {CourierForm.__tablename__} WHERE id > ?", (last,))
+    conn.exec_driver_sql(f"DELETE FROM {FTS_PAUSE_TABLE}")
+
+def bulk_insert_forms(rows, chunk_size: int = 5000, progress=None, allocate_receipt=None,
+                      check=None, on_failure=None):
+    """
+    Validate and insert many form dicts with chunked executemany.
+    Each chunk is one transaction; if a chunk hits a constraint error it is
+    retried row by row so only the offending rows fail.
+    allocate_receipt() -> str fills a blank receipt_no, called only once the
+    row has validated so rejected rows don't use up numbers.
+    check(data) -> error or None runs before the booking rules (e.g. the
+    importer's date check).
+    progress(rows_seen, inserted, failed) is called after every chunk.
+    Returns (inserted, failures) where failures is a list of
+    (row_number, data, error) with 1-based row numbers; with
+    on_failure(row_number, data, error) they are passed on as they happen
+    instead and the list stays empty.
+    """
+    if _engine is None:
+        raise RuntimeError("DB not initialized. Call init_db() first.")
+    sql = _BULK_INSERT_SQL
+    inserted = failed = 0
+    failures = []
+
+    def fail(n, data, err):
+        nonlocal failed
+        failed += 1
+        if on_failure is not None:
+            on_failure(n, data, err)
+        else:
+            failures.append((n, data, err))
+
+    def flush(batch):
+        nonlocal inserted
+        if not batch:
+            return
+        try:
+            with _engine.begin() as conn:
+                _bulk_execute(conn, [p for _, _, p in batch])
+            inserted += len(batch)
+            return
+        except Exception as e:
+            logging.warning("Bulk chunk failed (%s); retrying %d rows one by one",
+                            getattr(e, "orig", e), len(batch))
+        with _engine.begin() as conn:
+            for n, data, params in batch:
+                try:
+                    conn.exec_driver_sql(sql, params)
+                    inserted += 1
+                except Exception as e:
+                    fail(n, data, str(getattr(e, "orig", e)))
+
+    now = _db_timestamp(datetime.now())
+    batch = []
+    n = 0
+    for n, data in enumerate(rows, start=1):
+        blank = allocate_receipt is not None and not str(data.get("receipt_no") or "").strip()
+        err = (check and check(data)) or validate_form_data({**data, "receipt_no": "-"} if blank else data)
+        if err:
+            fail(n, data, err)
+            continue
+        if blank:
+            data["receipt_no"] = allocate_receipt()
+        batch.append((n, data, _bulk_params(data, now)))
+        if len(batch) >= chunk_size:
+            flush(batch)
+            batch = []
+            if progress:
+                progress(n, inserted, failed)
+    flush(batch)
+    if progress:
+        progress(n, inserted, failed)
+    return inserted, failures
+
+@metrics.timed("db.insert_forms_once")
+def insert_forms_once(rows):
+    """
+    Idempotent insert for replayed bookings (see journal.py): one transaction;
+    a row whose receipt_no is already stored with the same created_at was
+    applied before and is skipped, a different booking under that receipt_no
+    is a conflict. Rows must be validated and carry created_at. If the batch
+    still hits a constraint it is retried row by row (as in bulk_insert_forms)
+    and the offending rows become conflicts.
+    Returns (inserted, skipped, conflicts); DB errors (e.g. locked) propagate.
+    """
+    if _engine is None:
+        raise RuntimeError("DB not initialized. Call init_db() first.")
+    now = _db_timestamp(datetime.now())
+    params = [_bulk_params(data, now) for data in rows]
+    i_receipt, i_created = _BULK_COLUMNS.index("receipt_no"), _BULK_COLUMNS.index("created_at")
+    receipts = list({p[i_receipt] for p in params})
+    to_insert, skipped, conflicts = [], 0, []
+    with _engine.begin() as conn:
+        seen = {}
+        for i in range(0, len(receipts), 500):
+            chunk = receipts[i:i + 500]
+            seen.update(conn.exec_driver_sql(
+                f"SELECT receipt_no, created_at FROM {CourierForm.__tablename__} "
+                f"WHERE receipt_no IN ({', '.join('?' * len(chunk))})", tuple(chunk)).all())
+        for data, p in zip(rows, params):
+            if p[i_receipt] not in seen:
+                seen[p[i_receipt]] = p[i_created]
+                to_insert.append((data, p))
+            elif seen[p[i_receipt]] == p[i_created]:
+                skipped += 1
+            else:
+                conflicts.append((data, f"Receipt {p[i_receipt]} already used by another booking"))
+        if not to_insert:
+            return 0, skipped, conflicts
+        try:
+            with conn.begin_nested():
+                _bulk_execute(conn, [p for _, p in to_insert])
+            return len(to_insert), skipped, conflicts
+        except IntegrityError as e:
+            logging.warning("Journal batch failed (%s); retrying %d rows one by one", e.orig, len(to_insert))
+        inserted = 0
+        for data, p in to_insert:
+            try:
+                with conn.begin_nested():
+                    conn.exec_driver_sql(_BULK_INSERT_SQL, p)
+                inserted += 1
+            except IntegrityError as e:
+                conflicts.append((data, f"Receipt {p[i_receipt]} could not be stored: {e.orig}"))
+    return inserted, skipped, conflicts
+
+def receipt_no_in_use(receipt_no: str) -> bool:
+    """True if a stored booking already has this receipt number."""
+    if _engine is None:
+        raise RuntimeError("DB not initialized. Call init_db() first.")
+    with _engine.connect() as conn:
+        return conn.exec_driver_sql(
+            f"SELECT 1 FROM {CourierForm.__tablename__} WHERE receipt_no = ? LIMIT 1",
+            ((receipt_no or "").strip(),)).first() is not None
+
+# =========================
+# Daily rollups (dashboard)
+# =========================
+def refresh_rollups(chunk_ids: int = 50000) -> int:
+    """
+    Fold courier_forms rows with id > the stored watermark into the daily
+    tables. Each chunk claims its id range by advancing the watermark with a
+    compare-and-set first, so two processes never count the same rows.
+    Returns the number of forms rolled up.
+    """
+    if _engine is None:
+        raise RuntimeError("DB not initialized. Call init_db() first.")
+    rolled = 0
+    with _engine.connect() as conn:
+        conn.execute(text("INSERT OR IGNORE INTO rollup_state (id, last_form_id) VALUES (1, 0)"))
+        conn.commit()
+        while True:
+            last = conn.execute(text("SELECT last_form_id FROM rollup_state WHERE id = 1")).scalar() or 0
+            max_id = conn.execute(text("SELECT MAX(id) FROM courier_forms")).scalar() or 0
+            if max_id <= last:
+                break
+            upto = min(max_id, last + chunk_ids)
+            claimed = conn.execute(
+                text("UPDATE rollup_state SET last_form_id = :upto WHERE id = 1 AND last_form_id = :last"),
+                {"upto": upto, "last": last},
+            ).rowcount
+            if not claimed:          # another process got there first; re-read
+                conn.rollback()
+                continue
+            params = {"lo": last, "hi": upto}
+            rolled += conn.execute(text("""
+                SELECT COUNT(*) FROM courier_forms
+                 WHERE id > :lo AND id <= :hi AND created_at IS NOT NULL"""), params).scalar() or 0
+            conn.execute(text("""
+                INSERT INTO daily_rollups (day, bookings, revenue_paise, weight_grams)
+                SELECT date(created_at), COUNT(*), COALESCE(SUM(price_paise), 0), COALESCE(SUM(weight_grams), 0)
+                  FROM courier_forms
+                 WHERE id > :lo AND id <= :hi AND created_at IS NOT NULL
+                 GROUP BY date(created_at)
+                ON CONFLICT(day) DO UPDATE SET
+                    bookings = bookings + excluded.bookings,
+                    revenue_paise = revenue_paise + excluded.revenue_paise,
+                    weight_grams = weight_grams + excluded.weight_grams"""), params)
+            conn.execute(text("""
+                INSERT INTO daily_destinations (day, state, city, bookings, revenue_paise)
+                SELECT date(created_at), COALESCE(state, ''), COALESCE(city, ''), COUNT(*),
+                       COALESCE(SUM(price_paise), 0)
+                  FROM courier_forms
+                 WHERE id > :lo AND id <= :hi AND created_at IS NOT NULL
+                 GROUP BY date(created_at), COALESCE(state, ''), COALESCE(city, '')
+                ON CONFLICT(day, state, city) DO UPDATE SET
+                    bookings = bookings + excluded.bookings,
+                    revenue_paise = revenue_paise + excluded.revenue_paise"""), params)
+            conn.commit()
+    return rolled
+
+RECENT_DAYS = 30   # what "recent" means for Reports, the dashboard, exports and the service
+
+def recent_day_range(today=None):
+    """(first, last) dates of the last RECENT_DAYS calendar days, both inclusive."""
+    today = today or datetime.now().date()
+    return today - timedelta(days=RECENT_DAYS - 1), today
+
+REPORT_PAGE_SIZE = 200
+REPORT_COLUMNS = ("id", "created_at", "receipt_no", "token_no", "price", "weight",
+                  "sender_name", "sender_phone", "receiver_name", "receiver_phone",
+                  "city", "state", "receiver_pincode")
+
+@metrics.timed("db.recent_bookings_page")
+def recent_bookings_page(cursor=None, limit: int = REPORT_PAGE_SIZE, days: int = RECENT_DAYS,
+                         columns=REPORT_COLUMNS, newer: bool = False) -> list:
+    """
+    One page of the last `days` days of bookings, newest first (the Reports
+    window, GET /bookings). cursor is (created_at, id) of the previous page's
+    last row; with newer=True it is the first row of the current page and the
+    page just above it is returned (still newest first). The row-value
+    comparison keeps every page a plain range scan on ix_courier_forms_created_at.
+    """
+    key = tuple_(CourierForm.created_at, CourierForm.id)
+    session = get_session()
+    try:
+        q = (session.query(*[getattr(CourierForm, c) for c in columns])
+                    .filter(CourierForm.created_at >= datetime.now() - timedelta(days=days)))
+        if newer:
+            rows = (q.filter(key > tuple_(*cursor))
+                     .order_by(CourierForm.created_at, CourierForm.id).limit(limit).all())
+            return rows[::-1]
+        if cursor is not None:
+            q = q.filter(key < tuple_(*cursor))
+        return (q.order_by(CourierForm.created_at.desc(), CourierForm.id.desc())
+                 .limit(limit).all())
+    finally:
+        session.close()
+
+def dashboard_summary(start_day: str, end_day: str, top_n: int = 10) -> dict:
+    """
+    Totals, per-day rows and top destinations for start_day..end_day
+    (inclusive, YYYY-MM-DD), read from the rollup tables after catching up.
+    Money is in paise and weight in grams (integers); format for display.
+    """
+    refresh_rollups()
+    params = {"a": start_day, "b": end_day, "n": top_n}
+    with _engine.connect() as conn:
+        daily = conn.execute(text("""
+            SELECT day, bookings, revenue_paise, weight_grams FROM daily_rollups
+             WHERE day BETWEEN :a AND :b ORDER BY day DESC"""), params).all()
+        top_states = conn.execute(text("""
+            SELECT state, SUM(bookings) AS n, SUM(revenue_paise) FROM daily_destinations
+             WHERE day BETWEEN :a AND :b GROUP BY state ORDER BY n DESC LIMIT :n"""), params).all()
+        top_cities = conn.execute(text("""
+            SELECT city, state, SUM(bookings) AS n, SUM(revenue_paise) FROM daily_destinations
+             WHERE day BETWEEN :a AND :b GROUP BY city, state ORDER BY n DESC LIMIT :n"""), params).all()
+    return {
+        "bookings": sum(r[1] for r in daily),
+        "revenue_paise": sum(r[2] for r in daily),
+        "weight_grams": sum(r[3] for r in daily),
+        "daily": daily,
+        "top_states": top_states,
+        "top_cities": top_cities,
+    }
+
+# =========================
+# Full-text search
+# =========================
+_fts_tokenizer = {}
+
+def _fts_match_expr(conn, query: str):
+    """User text -> FTS5 MATCH expression (every term must match), or None."""
+    if _engine not in _fts_tokenizer:
+        sql = conn.execute(text(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :n"), {"n": FTS_TABLE}).scalar()
+        _fts_tokenizer[_engine] = None if sql is None else ("trigram" if "trigram" in sql else "unicode61")
+    tokenizer = _fts_tokenizer[_engine]
+    if tokenizer is None:
+        raise RuntimeError("Search is unavailable: this SQLite build has no FTS5 support.")
+    terms = [t.replace('"', '""') for t in query.split()]
+    if tokenizer == "trigram":
+        terms = [t for t in terms if len(t) >= 3]   # trigram can't match shorter fragments
+        return " AND ".join(f'"{t}"' for t in terms) or None
+    return " AND ".join(f'"{t}"*' for t in terms) or None
+
+SEARCH_LIMIT = 200   # best matches returned by default
+
+def search_booking_ids(query: str, limit: int = SEARCH_LIMIT) -> list:
+    """Ids of bookings matching query (names, phones, address, receipt/token), best first."""
+    if _engine is None:
+        raise RuntimeError("DB not initialized. Call init_db() first.")
+    with _engine.connect() as conn:
+        expr = _fts_match_expr(conn, query)
+        if not expr:
+            # Too short for trigrams (e.g. token "T7"): exact receipt/token hit
+            q = query.strip()
+            return [r[0] for r in conn.execute(text(
+                "SELECT id FROM courier_forms WHERE receipt_no = :q OR token_no = :q "
+                "ORDER BY id DESC LIMIT :n"), {"q": q, "n": limit})] if q else []
+        return [r[0] for r in conn.execute(text(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :q "
+            f"ORDER BY bm25({FTS_TABLE}) LIMIT :n"), {"q": expr, "n": limit})]
+
+# =========================
+# Receipt numbers (DB sequence, allocated in blocks)
+# =========================
+RECEIPT_SEQUENCE = "receipt"
+RECEIPT_PREFIX = "RX"
+RECEIPT_BLOCK_SIZE = 20     # numbers reserved per DB write; unused ones are given back on exit
+
+_receipt_lock = threading.Lock()
+_receipt_block = []
+_receipt_range = [0, 0]     # [start, end) of the block this process reserved last
+
+def format_receipt_no(n: int) -> str:
+    return f"{RECEIPT_PREFIX}{n:05d}"
+
+def _receipt_number(receipt_no: str):
+    s = str(receipt_no or "").strip()
+    digits = s[len(RECEIPT_PREFIX):]
+    return int(digits) if s.startswith(RECEIPT_PREFIX) and digits.isdigit() else None
+
+# Smallest RX number above :s whose successor is not stored: one scan over
+# the stored numbers instead of walking them block by block (after a reset).
+_NEXT_GAP_SQL = text(f"""
+    WITH used(n) AS (
+        SELECT CAST(SUBSTR(receipt_no, {len(RECEIPT_PREFIX) + 1}) AS INTEGER) FROM courier_forms
+         WHERE receipt_no LIKE '{RECEIPT_PREFIX}_%'
+           AND SUBSTR(receipt_no, {len(RECEIPT_PREFIX) + 1}) NOT GLOB '*[^0-9]*')
+    SELECT MIN(n) + 1 FROM used WHERE n >= :s AND n + 1 NOT IN (SELECT n FROM used WHERE n > :s)""")
+
+def _first_free_receipt(conn, n: int, taken) -> int:
+    """Smallest number >= n that is neither stored nor in taken."""
+    while True:
+        if format_receipt_no(n) in taken:
+            n += 1
+        elif conn.execute(select(CourierForm.id).where(
+                CourierForm.receipt_no == format_receipt_no(n)).limit(1)).first() is None:
+            return n
+        else:
+            n = conn.execute(_NEXT_GAP_SQL, {"s": n}).scalar() or n + 1
+
+def _reserve_receipt_block(size: int, taken=frozenset()) -> list:
+    """
+    Atomically take `size` numbers from the first free one at next_value,
+    skipping numbers already stored or in taken (e.g. still in the journal).
+    """
+    while True:
+        with _engine.begin() as conn:
+            # Write lock first (SQLite locks on the UPDATE), so two processes
+            # can never reserve the same block.
+            conn.execute(text(
+                "UPDATE receipt_sequence SET next_value = next_value WHERE name = :n"), {"n": RECEIPT_SEQUENCE})
+            start = conn.execute(text(
+                "SELECT next_value FROM receipt_sequence WHERE name = :n"), {"n": RECEIPT_SEQUENCE}).scalar()
+            if start is None:
+                conn.execute(text("INSERT INTO receipt_sequence (name, next_value) VALUES (:n, 1)"),
+                             {"n": RECEIPT_SEQUENCE})
+                start = 1
+            start = _first_free_receipt(conn, start, taken)
+            end = start + size
+            conn.execute(text("UPDATE receipt_sequence SET next_value = :v WHERE name = :n"),
+                         {"v": end, "n": RECEIPT_SEQUENCE})
+            candidates = [format_receipt_no(i) for i in range(start, end)]
+            used = {r[0] for r in conn.execute(
+                select(CourierForm.receipt_no).where(CourierForm.receipt_no.in_(candidates)))}
+        _receipt_range[:] = [start, end]
+        block = [c for c in candidates if c not in used and c not in taken]
+        if block:
+            return block
+
+def allocate_receipt_no(taken=frozenset()) -> str:
+    """
+    Next unused receipt number (RXnnnnn); unique across app instances sharing
+    the DB. taken: numbers in use outside courier_forms (journaled bookings).
+    """
+    if _engine is None:
+        raise RuntimeError("DB not initialized. Call init_db() first.")
+    with _receipt_lock:
+        while True:
+            if not _receipt_block:
+                _receipt_block.extend(_reserve_receipt_block(RECEIPT_BLOCK_SIZE, taken))
+            receipt = _receipt_block.pop(0)
+            if receipt not in taken:
+                return receipt
+
+def release_receipt_numbers(unused=()) -> int:
+    """
+    At shutdown: hand the rest of this process's block (plus unused numbers
+    from it, e.g. the one shown on an empty form) back to the sequence, if no
+    other process has reserved after us. Returns how many were given back.
+    """
+    if _engine is None:
+        return 0
+    with _receipt_lock:
+        start, end = _receipt_range
+        nums = {_receipt_number(r) for r in list(_receipt_block) + list(unused)}
+        _receipt_block.clear()
+        first = end
+        while first - 1 >= start and first - 1 in nums:
+            first -= 1
+        if first == end:
+            return 0
+        with _engine.begin() as conn:
+            given = conn.execute(text(
+                "UPDATE receipt_sequence SET next_value = :first WHERE name = :n AND next_value = :end"),
+                {"first": first, "end": end, "n": RECEIPT_SEQUENCE}).rowcount
+        _receipt_range[:] = [0, 0]
+    return end - first if given else 0
+
+def reset_receipt_sequence(start: int = 1) -> None:
+    """Restart numbering at start; numbers already stored are skipped when handed out."""
+    with _receipt_lock:
+        _receipt_block.clear()
+        _receipt_range[:] = [0, 0]
+        with _engine.begin() as conn:
+            conn.execute(text("UPDATE receipt_sequence SET next_value = :v WHERE name = :n"),
+                         {"v": max(1, int(start)), "n": RECEIPT_SEQUENCE})
+
+def raise_receipt_floor(next_value: int) -> None:
+    """Make sure the sequence never goes below next_value (e.g. an old counter file)."""
+    with _engine.begin() as conn:
+        conn.execute(text(
+            "UPDATE receipt_sequence SET next_value = MAX(next_value, :v) WHERE name = :n"),
+            {"v": int(next_value), "n": RECEIPT_SEQUENCE})
@@ -0,0 +1,145 @@
+"""
+Streaming export of courier_forms to CSV, XLSX or newline-delimited JSON.
+
+Rows are read with yield_per and written as they arrive, so exporting a
+year of bookings never holds more than one batch in memory.
+"""
+import csv
+import json
+import logging
+import os
+from datetime import datetime
+
+from sqlalchemy import func
+
+import db
+from db import CourierForm
+
+EXPORT_COLUMNS = ("id", "created_at", "updated_at") + db.FORM_FIELDS
+EXPORT_FORMATS = {"csv": ".csv", "xlsx": ".xlsx", "ndjson": ".ndjson"}
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+def _range_filter(q, start, end):
+    if start is not None:
+        q = q.filter(CourierForm.created_at >= start)
+    if end is not None:
+        q = q.filter(CourierForm.created_at < end)
+    return q
+
+
+def count_bookings(start=None, end=None) -> int:
+    session = db.get_session()
+    try:
+        return _range_filter(session.query(func.count(CourierForm.id)), start, end).scalar() or 0
+    finally:
+        session.close()
+
+
+def iter_booking_rows(start=None, end=None, batch_size: int = 1000):
+    """Yield tuples in EXPORT_COLUMNS order, oldest first, batch_size at a time from the DB."""
+    session = db.get_session()
+    try:
+        q = session.query(*[getattr(CourierForm, c) for c in EXPORT_COLUMNS])
+        q = _range_filter(q, start, end).order_by(CourierForm.created_at, CourierForm.id)
+        for row in q.yield_per(batch_size):
+            yield tuple(row)
+    finally:
+        session.close()
+
+
+def _fmt(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    return value
+
+
+class _CsvWriter:
+    def __init__(self, path):
+        self.f = open(path, "w", encoding="utf-8-sig", newline="")
+        self.w = csv.writer(self.f)
+        self.w.writerow(EXPORT_COLUMNS)
+
+    def write(self, row):
+        self.w.writerow([_fmt(v) for v in row])
+
+    def close(self):
+        self.f.close()
+
+
+class _NdjsonWriter:
+    def __init__(self, path):
+        self.f = open(path, "w", encoding="utf-8")
+
+    def write(self, row):
+        self.f.write(json.dumps(
+            {c: (_fmt(v) if isinstance(v, datetime) else v) for c, v in zip(EXPORT_COLUMNS, row)},
+            ensure_ascii=False
+        ))
+        self.f.write("\n")
+
+    def close(self):
+        self.f.close()
+
+
+class _XlsxWriter:
+    def __init__(self, path):
+        try:
+            from openpyxl import Workbook
+        except ImportError:
+            raise RuntimeError("Writing .xlsx files needs the 'openpyxl' package (pip install openpyxl).")
+        self.path = path
+        self.wb = Workbook(write_only=True)   # rows are streamed, not kept as cells
+        self.ws = self.wb.create_sheet("Bookings")
+        self.ws.append(list(EXPORT_COLUMNS))
+
+    def write(self, row):
+        self.ws.append([_fmt(v) for v in row])
+
+    def close(self):
+        self.wb.save(self.path)
+
+
+_WRITERS = {"csv": _CsvWriter, "xlsx": _XlsxWriter, "ndjson": _NdjsonWriter}
+
+
+def export_bookings(path: str, fmt: str, start=None, end=None, progress=None, cancel=None,
+                    batch_size: int = 1000) -> int:
+    """
+    Write bookings with start <= created_at < end to path in fmt
+    ("csv", "xlsx" or "ndjson"). progress(done, total) is called every batch;
+    setting the cancel Event stops the export and removes the partial file.
+    Returns the number of rows written.
+    """
+    if fmt not in _WRITERS:
+        raise ValueError(f"Unknown export format {fmt!r}; expected one of {sorted(_WRITERS)}")
+    total = count_bookings(start, end)
+    writer = _WRITERS[fmt](path)
+    done = 0
+    try:
+        for row in iter_booking_rows(start, end, batch_size):
+            writer.write(row)
+            done += 1
+            if done % batch_size == 0:
+                if cancel is not None and cancel.is_set():
+                    raise ExportCancelled()
+                if progress:
+                    progress(done, total)
+        writer.close()
+    except BaseException:
+        try:
+            writer.close()
+        except Exception:
+            pass
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+    if progress:
+        progress(done, total)
+    logging.info("Exported %d booking(s) to %s", done, path)
+    return done
@@ -0,0 +1,220 @@
+"""
+Bulk import of pre-booked consignments from CSV / XLSX spreadsheets.
+
+Rows are streamed (csv module / openpyxl read-only mode), mapped onto the
+CourierForm fields by header name, city/state are filled from the PIN index
+when blank, valid rows without a receipt number get one from the DB sequence, and
+everything is written through db.bulk_insert_forms in
+batches; failed rows go straight to <file>.errors.csv, so memory stays flat
+regardless of file size. A booking date that doesn't parse fails the row
+(only an empty cell means "booked at import time").
+
+Headless use:
+    courierx --import bookings.xlsx            (via ne.py)
+    python importer.py bookings.csv --db courierx.db --pincodes India_pincode.csv
+"""
+import argparse
+import csv
+import logging
+import os
+from datetime import datetime
+
+import db
+
+# Normalised header (lowercase, alphanumerics only) -> CourierForm field
+COLUMN_ALIASES = {
+    "receiptno": "receipt_no", "receipt": "receipt_no", "rxno": "receipt_no",
+    "tokenno": "token_no", "token": "token_no",
+    "weight": "weight", "weightkg": "weight",
+    "price": "price", "amount": "price", "charges": "price", "pricers": "price",
+    "sendername": "sender_name", "sender": "sender_name", "fromname": "sender_name",
+    "senderaddress": "sender_address", "fromaddress": "sender_address",
+    "senderpincode": "sender_pincode", "senderpin": "sender_pincode",
+    "senderphone": "sender_phone", "sendermobile": "sender_phone",
+    "receivername": "receiver_name", "receiver": "receiver_name", "consignee": "receiver_name",
+    "house": "house", "houseno": "house", "houseflatno": "house", "flatno": "house",
+    "street": "street", "streetname": "street",
+    "locality": "locality", "area": "locality", "localityarea": "locality",
+    "city": "city", "district": "city", "citydistrict": "city",
+    "state": "state",
+    "receiverpincode": "receiver_pincode", "receiverpin": "receiver_pincode",
+    "pincode": "receiver_pincode", "pin": "receiver_pincode",
+    "receiverphone": "receiver_phone", "receivermobile": "receiver_phone",
+    "phone": "receiver_phone", "mobile": "receiver_phone",
+    "createdat": "created_at", "bookedat": "created_at", "date": "created_at",
+}
+
+
+def _norm_header(h) -> str:
+    return "".join(ch for ch in str(h or "").lower() if ch.isalnum())
+
+
+def map_columns(header) -> dict:
+    """Return {column position: field} for the recognised headers."""
+    mapping = {}
+    for i, h in enumerate(header):
+        field = COLUMN_ALIASES.get(_norm_header(h))
+        if field and field not in mapping.values():
+            mapping[i] = field
+    return mapping
+
+
+def _cell(value):
+    """Spreadsheet cell -> string (phones/PINs often arrive as 9876543210.0)."""
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, datetime):
+        return value
+    return str(value).strip()
+
+
+DATE_FORMATS = ("YYYY-MM-DD [HH:MM]", "DD-MM-YYYY [HH:MM]", "DD/MM/YYYY [HH:MM]")
+
+
+def _parse_date(value):
+    """Non-empty booking date cell -> datetime, or None if it isn't one of DATE_FORMATS."""
+    if isinstance(value, datetime):
+        return value
+    for fmt in (None, "%d-%m-%Y", "%d/%m/%Y", "%d-%m-%Y %H:%M", "%d/%m/%Y %H:%M"):
+        try:
+            return datetime.fromisoformat(value) if fmt is None else datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def iter_sheet_rows(path: str):
+    """Yield raw row lists (header first) from a .csv or .xlsx file."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".xlsx", ".xlsm"):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise RuntimeError("Reading .xlsx files needs the 'openpyxl' package (pip install openpyxl).")
+        wb = load_workbook(path, read_only=True, data_only=True)
+        try:
+            for row in wb.worksheets[0].iter_rows(values_only=True):
+                yield list(row)
+        finally:
+            wb.close()
+    else:
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            yield from csv.reader(f)
+
+
+def iter_bookings(path: str, pin_index=None):
+    """Yield form dicts, one per non-empty data row, with PIN autofill applied."""
+    rows = iter_sheet_rows(path)
+    header = next(rows, None)
+    if not header:
+        return
+    mapping = map_columns(header)
+    if not mapping:
+        raise ValueError(f"No known booking columns in {os.path.basename(path)}: {header}")
+    for row in rows:
+        data = {f: "" for f in db.FORM_FIELDS}
+        for i, field in mapping.items():
+            if i < len(row):
+                data[field] = _cell(row[i])
+        if not any(data[f] for f in db.FORM_FIELDS):
+            continue
+        if pin_index is not None and data["receiver_pincode"] and not (data["city"] and data["state"]):
+            dist, state = pin_index.lookup(data["receiver_pincode"])
+            data["city"] = data["city"] or dist or ""
+            data["state"] = data["state"] or state or ""
+        raw = data.pop("created_at", None)
+        if raw:
+            # An unparseable date stays text and fails _check_date; only a blank
+            # cell means "booked now"
+            data["created_at"] = _parse_date(raw) or raw
+        yield data
+
+
+def _check_date(data):
+    created = data.get("created_at")
+    if created is not None and not isinstance(created, datetime):
+        return f"Booking date {created!r} not understood (use {', '.join(DATE_FORMATS)})."
+    return None
+
+
+class FailureLog:
+    """
+    Writes failed rows (with their error) to <source>.errors.csv as they
+    happen, so memory stays flat however many rows fail. The file is only
+    created for the first failure; a stale one from an earlier run is removed.
+    """
+
+    def __init__(self, source_path: str):
+        self.path = os.path.splitext(source_path)[0] + ".errors.csv"
+        self.count = 0
+        self._file = self._writer = None
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def __call__(self, n, data, err):
+        if self._file is None:
+            self._file = open(self.path, "w", encoding="utf-8", newline="")
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(["row", "error", *db.FORM_FIELDS, "created_at"])
+        created = data.get("created_at")
+        self._writer.writerow([n + 1, err, *(data.get(k, "") for k in db.FORM_FIELDS),    # +1: header row
+                               "" if created is None else str(created)])
+        self.count += 1
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+def import_bookings(path: str, pin_index=None, chunk_size: int = 2000, progress=None):
+    """
+    Stream path into courier_forms. Rows without a receipt number get the
+    next one once they validate. Returns (inserted, failed, errors_path);
+    errors_path is None when every row went in.
+    """
+    log = FailureLog(path)
+    try:
+        inserted, _ = db.bulk_insert_forms(
+            iter_bookings(path, pin_index), chunk_size=chunk_size, progress=progress,
+            allocate_receipt=db.allocate_receipt_no, check=_check_date, on_failure=log,
+        )
+    finally:
+        log.close()
+    logging.info("Imported %d booking(s) from %s; %d failed", inserted, path, log.count)
+    return inserted, log.count, log.path if log.count else None
+
+
+def main(argv=None, pin_index=None) -> int:
+    ap = argparse.ArgumentParser(prog="courierx --import",
+                                 description="Import bookings from a CSV/XLSX file.")
+    ap.add_argument("path", help="bookings .csv or .xlsx")
+    ap.add_argument("--db", help="courierx.db to import into (default: the app's DB)")
+    ap.add_argument("--pincodes", help="India_pincode.csv for city/state autofill")
+    ap.add_argument("--chunk-size", type=int, default=2000)
+    args = ap.parse_args(argv)
+
+    if args.db or db.SessionLocal is None:
+        db.init_db(f"sqlite:///{os.path.abspath(args.db or 'courierx.db')}")
+    if pin_index is None and args.pincodes:
+        from pincodes import load_csv
+        pin_index = load_csv(args.pincodes)[0]
+
+    def report(seen, ok, bad):
+        print(f"\r{seen} rows read, {ok} imported, {bad} failed", end="", flush=True)
+
+    inserted, failed, errors_path = import_bookings(
+        args.path, pin_index, chunk_size=args.chunk_size, progress=report
+    )
+    print()
+    if errors_path:
+        print(f"{failed} row(s) failed; see {errors_path}")
+    return 0 if not failed else 1
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+    raise SystemExit(main())
@@ -0,0 +1,222 @@
+"""
+Write-ahead booking journal.
+
+Every booking is appended to a local journal file and fsync'd before the
+form is released, so a locked database, a disk hiccup or a crash can no
+longer lose it. A background drainer applies the journal to courier_forms
+in batches (db.insert_forms_once, deduplicated by receipt number) and
+truncates the file once everything in it is in the DB. Whatever is left
+over from a previous run is replayed when the drainer starts.
+
+Each line is "<crc32 hex> <json>\\n"; a torn last line (crash mid-append,
+never acknowledged) is dropped on open. Entries that can never be applied
+(corrupt, invalid, receipt number taken by another booking) are moved to
+<journal>.rejected so they can be re-entered by hand, and reported through
+on_reject so the UI can tell the operator.
+"""
+import json
+import logging
+import os
+import threading
+import zlib
+from collections import Counter
+from datetime import datetime
+
+import db
+import metrics
+
+
+def _encode(data: dict) -> bytes:
+    entry = {k: data.get(k, "") for k in db.FORM_FIELDS}
+    created = data.get("created_at") or datetime.now()
+    entry["created_at"] = created.isoformat() if isinstance(created, datetime) else str(created)
+    body = json.dumps(entry, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return b"%08x " % zlib.crc32(body) + body + b"\n"
+
+
+def _decode(line: bytes):
+    """Journal line -> form dict (created_at as datetime), or None if corrupt."""
+    crc, _, body = line.rstrip(b"\n").partition(b" ")
+    try:
+        if int(crc, 16) != zlib.crc32(body):
+            return None
+        data = json.loads(body)
+        data["created_at"] = datetime.fromisoformat(data["created_at"])
+        return data
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def _receipt_of(line: bytes):
+    data = _decode(line)
+    return str(data.get("receipt_no") or "").strip() if data else None
+
+
+class BookingJournal:
+    """
+    append(data) -> (ok, err)    durable once it returns ok (fsync'd)
+    start()                      replay leftovers, then drain in the background
+    pending()                    entries not yet applied to the DB
+    pending_receipts()           their receipt numbers
+    close()                      final drain attempt, then stop the drainer
+    on_reject([(receipt_no, reason), ...]) is called from the drainer thread.
+    """
+
+    def __init__(self, path: str, apply=db.insert_forms_once, batch_size: int = 200,
+                 interval: float = 0.5, max_backoff: float = 30.0, on_reject=None):
+        self.path = path
+        self.rejected_path = path + ".rejected"
+        self._apply = apply
+        self._batch_size = batch_size
+        self._interval = interval
+        self._max_backoff = max_backoff
+        self._on_reject = on_reject or (lambda entries: None)
+        self._lock = threading.Lock()          # guards the file, _offset and the pending counts
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._offset = 0                       # bytes already applied to the DB
+        self.last_error = None
+        self._f = self._open()
+        lines = self._read_lines(0)[0]
+        self._pending = len(lines)
+        self._receipts = Counter(filter(None, map(_receipt_of, lines)))
+
+    def _open(self):
+        f = open(self.path, "a+b")
+        size = f.seek(0, os.SEEK_END)
+        if size:
+            f.seek(max(0, size - 1))
+            if f.read(1) != b"\n":
+                # Torn append from a crash: that booking was never acknowledged
+                f.seek(0)
+                keep = f.read().rfind(b"\n") + 1
+                logging.warning("Journal %s: dropping %d byte(s) of incomplete entry", self.path, size - keep)
+                f.truncate(keep)
+                f.flush()
+                os.fsync(f.fileno())
+        return f
+
+    # ---------- writer side (UI thread) ----------
+    def append(self, data: dict):
+        try:
+            line = _encode(data)
+            with self._lock:
+                self._f.seek(0, os.SEEK_END)
+                self._f.write(line)
+                self._f.flush()
+                os.fsync(self._f.fileno())
+                self._pending += 1
+                self._receipts[str(data.get("receipt_no") or "").strip()] += 1
+        except Exception as e:
+            logging.exception("Journal append failed: %s", e)
+            return False, str(e)
+        self._wake.set()
+        return True, None
+
+    def pending(self) -> int:
+        return self._pending
+
+    def pending_receipts(self) -> set:
+        """Receipt numbers journaled but not yet in the DB (they count as taken)."""
+        with self._lock:
+            return {r for r, n in self._receipts.items() if n > 0 and r}
+
+    # ---------- drainer ----------
+    def _read_lines(self, offset: int):
+        """Complete lines from offset as (lines, end offset)."""
+        with self._lock:
+            self._f.seek(offset)
+            chunk = self._f.read()
+        end = chunk.rfind(b"\n") + 1
+        return chunk[:end].splitlines(keepends=True), offset + end
+
+    def _reject(self, entries) -> None:
+        with open(self.rejected_path, "ab") as f:
+            for raw, reason in entries:
+                f.write(b"# " + reason.encode("utf-8", "replace") + b"\n" + raw)
+            f.flush()
+            os.fsync(f.fileno())
+        logging.error("Journal: %d booking(s) could not be applied; see %s", len(entries), self.rejected_path)
+        try:
+            self._on_reject([(_receipt_of(raw) or "?", reason) for raw, reason in entries])
+        except Exception:
+            logging.exception("Journal reject callback failed")
+
+    def drain_once(self) -> int:
+        """Apply everything journaled so far. Returns rows inserted; DB errors propagate."""
+        lines, end = self._read_lines(self._offset)
+        inserted = 0
+        pos = self._offset
+        for i in range(0, len(lines), self._batch_size):
+            batch = lines[i:i + self._batch_size]
+            rows, raw_by_row, rejected, taken = [], [], [], []
+            for raw in batch:
+                data = _decode(raw)
+                if data is not None:
+                    taken.append(str(data.get("receipt_no") or "").strip())
+                err = "Corrupt journal entry" if data is None else db.validate_form_data(data)
+                if err:
+                    rejected.append((raw, err))
+                else:
+                    rows.append(data)
+                    raw_by_row.append(raw)
+            with metrics.timer("journal.apply_batch"):
+                n, _skipped, conflicts = self._apply(rows) if rows else (0, 0, [])
+            raw_of = {id(r): raw for r, raw in zip(rows, raw_by_row)}
+            rejected += [(raw_of[id(data)], err) for data, err in conflicts]
+            if rejected:
+                metrics.count("journal.rejected", len(rejected))
+                self._reject(rejected)
+            inserted += n
+            pos += sum(len(raw) for raw in batch)
+            with self._lock:
+                self._offset = pos
+                self._pending = max(0, self._pending - len(batch))
+                self._receipts.subtract(taken)
+        self._compact(end)
+        return inserted
+
+    def _compact(self, end: int) -> None:
+        """Truncate the journal once every entry in it has been applied."""
+        with self._lock:
+            if self._offset == end and self._f.seek(0, os.SEEK_END) == end and end:
+                self._f.truncate(0)
+                self._f.flush()
+                os.fsync(self._f.fileno())
+                self._offset = 0
+                self._receipts.clear()
+
+    def _run(self):
+        delay = self._interval
+        while not self._stop.is_set():
+            try:
+                n = self.drain_once()
+                if n:
+                    logging.info("Journal: applied %d booking(s)", n)
+                self.last_error, delay = None, self._interval
+            except Exception as e:
+                # Typically "database is locked": keep the entries, back off, retry
+                self.last_error = str(getattr(e, "orig", e))
+                logging.warning("Journal drain failed (%s); %d booking(s) waiting", self.last_error, self._pending)
+                delay = min(delay * 2, self._max_backoff)
+            self._wake.wait(delay)
+            self._wake.clear()
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="booking-journal", daemon=True)
+            self._thread.start()
+
+    def close(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                return                      # drainer still busy; leftovers replay on next start
+        try:
+            self.drain_once()
+        except Exception as e:
+            logging.warning("Journal: %d booking(s) left for the next start (%s)", self._pending, e)
+        self._f.close()
@@ -0,0 +1,153 @@
+"""
+Lightweight timers and counters for the hot paths (PIN lookup, inserts,
+reports, printing, license checks).
+
+Off by default and nearly free while off: timer() hands back a shared no-op
+context manager. Switch on with COURIERX_METRICS=1 or enable(True) at
+runtime (the Diagnostics window does this). Each timer keeps its last
+SAMPLE_LIMIT durations, so percentiles follow recent behaviour and memory
+stays bounded however long the counter runs.
+
+    with metrics.timer("pin.lookup"):
+        ...
+    @metrics.timed("db.insert_form_row")
+    def insert(...): ...
+    metrics.count("bookings.saved")
+
+snapshot() gives count / total / p50 / p95 / p99 / max in ms per timer;
+dump(path) writes it as JSON; format_table() as plain text.
+"""
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+from datetime import datetime
+from functools import wraps
+
+SAMPLE_LIMIT = 4096
+
+_enabled = os.environ.get("COURIERX_METRICS", "").strip().lower() in ("1", "true", "yes", "on")
+_lock = threading.Lock()
+_timers = {}            # name -> [count, total_secs, max_secs, deque of recent secs]
+_counters = {}          # name -> int
+_NULL = nullcontext()
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def enable(on: bool = True) -> None:
+    global _enabled
+    _enabled = bool(on)
+
+
+def reset() -> None:
+    with _lock:
+        _timers.clear()
+        _counters.clear()
+
+
+def record(name: str, secs: float) -> None:
+    with _lock:
+        t = _timers.get(name)
+        if t is None:
+            t = _timers[name] = [0, 0.0, 0.0, deque(maxlen=SAMPLE_LIMIT)]
+        t[0] += 1
+        t[1] += secs
+        if secs > t[2]:
+            t[2] = secs
+        t[3].append(secs)
+
+
+def count(name: str, n: int = 1) -> None:
+    if _enabled:
+        with _lock:
+            _counters[name] = _counters.get(name, 0) + n
+
+
+class _Timer:
+    __slots__ = ("name", "t0")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, time.perf_counter() - self.t0)
+        return False
+
+
+def timer(name: str):
+    """Context manager timing its block under name (a no-op while disabled)."""
+    return _Timer(name) if _enabled else _NULL
+
+
+def timed(name: str):
+    """Decorator form of timer(); the enabled check happens per call."""
+    def deco(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - t0)
+        return wrapper
+    return deco
+
+
+def _percentile(sorted_vals, p: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_vals:
+        return 0.0
+    k = math.ceil(p / 100.0 * len(sorted_vals)) - 1
+    return sorted_vals[max(0, min(len(sorted_vals) - 1, k))]
+
+
+def snapshot() -> dict:
+    """{"timers": {name: {count, total_ms, p50_ms, p95_ms, p99_ms, max_ms}}, "counters": {...}}"""
+    with _lock:
+        timers = {name: (c, total, mx, sorted(samples)) for name, (c, total, mx, samples) in _timers.items()}
+        counters = dict(_counters)
+    out = {}
+    for name, (c, total, mx, vals) in sorted(timers.items()):
+        out[name] = {
+            "count": c,
+            "total_ms": round(total * 1000, 3),
+            "p50_ms": round(_percentile(vals, 50) * 1000, 3),
+            "p95_ms": round(_percentile(vals, 95) * 1000, 3),
+            "p99_ms": round(_percentile(vals, 99) * 1000, 3),
+            "max_ms": round(mx * 1000, 3),
+        }
+    return {"timers": out, "counters": dict(sorted(counters.items()))}
+
+
+def dump(path: str) -> dict:
+    """Write snapshot() (plus a timestamp) to path as JSON; returns what was written."""
+    snap = snapshot()
+    snap["at"] = datetime.now().isoformat(timespec="seconds")
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(snap, f, indent=2)
+    os.replace(tmp, path)
+    return snap
+
+
+def format_table(snap: dict = None) -> str:
+    snap = snap or snapshot()
+    lines = [f"{'timer':<28}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}"]
+    for name, t in snap["timers"].items():
+        lines.append(f"{name:<28}{t['count']:>8}{t['p50_ms']:>10.2f}{t['p95_ms']:>10.2f}"
+                     f"{t['p99_ms']:>10.2f}{t['max_ms']:>10.2f}")
+    for name, n in snap["counters"].items():
+        lines.append(f"{name:<28}{n:>8}")
+    return "\n".join(lines)
@@ -1,22 +1,62 @@
+import time
+_STARTUP_T0 = time.perf_counter()
+
 import tkinter as tk
 from tkinter import ttk, messagebox, font
 import tempfile
 import os, sys
-import pandas as pd
 import logging
 from datetime import datetime
-import json, hashlib, uuid, time, base64
+import json, hashlib, uuid, base64
+import threading
+import atexit
+import queue
 
+import pincodes
+from pincodes import load_cache, load_csv, save_cache
+import metrics
+import pipeline
+import receipts
 
 # ---- SQLAlchemy ORM ----
-from sqlalchemy import create_engine, Column, Integer, String, DateTime
-from sqlalchemy.orm import declarative_base, sessionmaker, scoped_session
+# db (and with it SQLAlchemy, the slowest import by far) is loaded by
+# _init_backend() after the window is on screen; see "Deferred startup".
+db = None
 
 # =========================
 # Logging
 # =========================
 logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
 
+# =========================
+# Startup timings (logged once everything is ready; optionally appended as
+# JSON lines to COURIERX_STARTUP_LOG to compare releases)
+# =========================
+_startup_marks = []
+
+def startup_mark(phase: str):
+    _startup_marks.append((phase, time.perf_counter()))
+
+def _report_startup():
+    parts, prev = [], _STARTUP_T0
+    for phase, t in sorted(_startup_marks, key=lambda m: m[1]):
+        parts.append(f"{phase} +{(t - prev) * 1000:.0f}ms (@{(t - _STARTUP_T0) * 1000:.0f})")
+        prev = t
+    logging.info("Startup: %s", ", ".join(parts))
+    if metrics.enabled():
+        for phase, t in _startup_marks:
+            metrics.record(f"startup.{phase}", t - _STARTUP_T0)
+    log_path = os.environ.get("COURIERX_STARTUP_LOG")
+    if log_path:
+        try:
+            with open(log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({
+                    "at": datetime.now().isoformat(timespec="seconds"),
+                    **{phase: round((t - _STARTUP_T0) * 1000, 1) for phase, t in _startup_marks},
+                }) + "\n")
+        except OSError as e:
+            logging.warning("Could not write startup log %s: %s", log_path, e)
+
 # =========================
 # Utility: resource path (PyInstaller-safe)
 # =========================
@@ -34,9 +74,15 @@ from tkinter import messagebox
 from datetime import datetime, timedelta
 from datetime import datetime, timedelta
 
-RECENT_DAYS = 30  # change this to 7/90/etc to control what "recent" means
+# The Reports Treeview holds at most this many pages of items; scrolling past
+# them reuses the items of the page furthest away for the page being fetched.
+REPORT_WINDOW_PAGES = 3
 
 def open_reports_window():
+    if not _require_backend():
+        return
+    CourierForm, get_session = db.CourierForm, db.get_session
+
     # ---------- Window ----------
     win = tk.Toplevel(root)
     win.title("CourierX Reports (Recent)")
@@ -51,7 +97,7 @@ def open_reports_window():
 
     info_lbl = ttk.Label(
         top,
-        text=f"Showing records from the last {RECENT_DAYS} day(s), newest first.",
+        text=f"Showing records from the last {db.RECENT_DAYS} day(s), newest first.",
         font=("Helvetica", 11)
     )
     info_lbl.pack(side="left")
@@ -59,13 +105,26 @@ def open_reports_window():
     btn_refresh = ttk.Button(top, text="🔄 Refresh")
     btn_refresh.pack(side="right", padx=4)
 
+    btn_export = ttk.Button(top, text="⬇ Export", command=lambda: open_export_dialog(win))
+    btn_export.pack(side="right", padx=4)
+
+    btn_batch_print = ttk.Button(top, text="🖨 Print...")
+    btn_batch_print.pack(side="right", padx=4)
+
+    search_bar = tk.Frame(win, bg="#FAFAFA")
+    search_bar.pack(fill="x", padx=12, pady=(0, 8))
+    ttk.Label(search_bar, text="🔍 Search (name, phone, locality, receipt, token):",
+              font=("Helvetica", 11)).pack(side="left")
+    search_var = tk.StringVar()
+    entry_search = ttk.Entry(search_bar, textvariable=search_var, width=40)
+    entry_search.pack(side="left", padx=6)
+    btn_search = ttk.Button(search_bar, text="Search")
+    btn_search.pack(side="left", padx=4)
+    btn_search_clear = ttk.Button(search_bar, text="Clear")
+    btn_search_clear.pack(side="left", padx=4)
+
     # ---------- Table ----------
-    cols = [
-        "id","created_at","receipt_no","token_no","price","weight",
-        "sender_name","sender_phone",
-        "receiver_name","receiver_phone",
-        "city","state","receiver_pincode"
-    ]
+    cols = list(db.REPORT_COLUMNS)
     col_headers = {
         "id": "ID",
         "created_at": "Created At",
@@ -88,7 +147,7 @@ def open_reports_window():
     tree = ttk.Treeview(table_frame, columns=cols, show="headings", height=22)
     vsb = ttk.Scrollbar(table_frame, orient="vertical", command=tree.yview)
     hsb = ttk.Scrollbar(table_frame, orient="horizontal", command=tree.xview)
-    tree.configure(yscroll=vsb.set, xscroll=hsb.set)
+    tree.configure(xscroll=hsb.set)
 
     tree.grid(row=0, column=0, sticky="nsew")
     vsb.grid(row=0, column=1, sticky="ns")
@@ -109,38 +168,121 @@ def open_reports_window():
     for c in cols:
         tree.column(c, width=widths.get(c, 120), anchor="w", stretch=True)
 
-    # ---------- Data loader ----------
-    def load_recent():
-        # clear table
-        for it in tree.get_children():
-            tree.delete(it)
+    # ---------- Data loader (keyset pages both ways over a fixed window of items) ----------
+    # at_top / at_end: no newer / older rows beyond the items in the tree.
+    # fetch_pending: direction of the one fetch queued from on_yscroll (True = older).
+    page = {"at_top": True, "at_end": False, "loading": False, "fetch_pending": None}
+    row_keys = {}       # item id -> (created_at, id), the keyset cursor at that row
 
+    def row_values(r):
+        return tuple(
+            (v.strftime("%Y-%m-%d %H:%M:%S") if c == "created_at" else v) if v is not None else ""
+            for c, v in zip(cols, r)
+        )
+
+    @metrics.timed("reports.fetch_page")
+    def fetch_page(older: bool = True):
+        if page["loading"] or page["at_end" if older else "at_top"]:
+            return
+        items = tree.get_children()
+        cursor = row_keys[items[-1] if older else items[0]] if items else None
+        page["loading"] = True
+        try:
+            rows = db.recent_bookings_page(cursor, newer=not older)
+        finally:
+            page["loading"] = False
+        page["at_end" if older else "at_top"] = len(rows) < db.REPORT_PAGE_SIZE
+        if rows:
+            place_rows(rows, older)
+        info_lbl.configure(text=f"Showing records from the last {db.RECENT_DAYS} day(s), newest first."
+                                + ("" if page["at_end"] else " Scroll down for older ones."))
+
+    def place_rows(rows, at_bottom: bool):
+        """Add a page below (older) or above (newer), recycling the items furthest away."""
+        items = tree.get_children()
+        top = round(float(tree.yview()[0]) * len(items))     # first visible row
+        spare = len(items) + len(rows) - db.REPORT_PAGE_SIZE * REPORT_WINDOW_PAGES
+        recycled = []
+        if spare > 0:
+            recycled = list(items[:spare] if at_bottom else items[-spare:])
+            tree.selection_remove(*recycled)
+            for iid in recycled:
+                del row_keys[iid]
+            page["at_top" if at_bottom else "at_end"] = False
+        # A newer page (newest first) goes in above the current first row, oldest of it first
+        for r in (rows if at_bottom else reversed(rows)):
+            index = "end" if at_bottom else 0
+            if recycled:
+                iid = recycled.pop()
+                tree.item(iid, values=row_values(r))
+                tree.move(iid, "", index)
+            else:
+                iid = tree.insert("", index, values=row_values(r))
+            row_keys[iid] = (r.created_at, r.id)
+        if recycled:
+            tree.delete(*recycled)
+        # Keep the same rows on screen after items moved above them
+        top = top - max(spare, 0) if at_bottom else top + len(rows)
+        tree.yview_moveto(max(top, 0) / max(len(tree.get_children()), 1))
+
+    def run_queued_fetch():
+        older, page["fetch_pending"] = page["fetch_pending"], None
+        if older is not None:
+            fetch_page(older)
+
+    def on_yscroll(first, last):
+        vsb.set(first, last)
+        # Near either edge (or the view isn't full yet): fetch the next page that
+        # way, queued once however many scroll events arrive before it runs
+        if page["fetch_pending"] is not None or page["loading"]:
+            return
+        if float(last) >= 0.95 and not page["at_end"]:
+            page["fetch_pending"] = True
+        elif float(first) <= 0.05 and not page["at_top"]:
+            page["fetch_pending"] = False
+        else:
+            return
+        win.after_idle(run_queued_fetch)
+
+    @metrics.timed("reports.load_recent")
+    def load_recent():
+        tree.delete(*tree.get_children())
+        row_keys.clear()
+        page.update(at_top=True, at_end=False, loading=False, fetch_pending=None)
+        fetch_page()
+
+    # ---------- Search (FTS5, all dates, best matches first) ----------
+    def run_search(_evt=None):
+        q = search_var.get().strip()
+        if not q:
+            load_recent()
+            return
+        try:
+            ids = db.search_booking_ids(q)
+        except Exception as e:
+            messagebox.showerror("Search", str(e), parent=win)
+            return
         session = get_session()
         try:
-            cutoff = datetime.now() - timedelta(days=RECENT_DAYS)
-            rows = (session.query(CourierForm)
-                        .filter(CourierForm.created_at >= cutoff)
-                        .order_by(CourierForm.created_at.desc())
-                        .all())
+            found = (session.query(*[getattr(CourierForm, c) for c in cols])
+                            .filter(CourierForm.id.in_(ids)).all()) if ids else []
         finally:
             session.close()
-
-        for obj in rows:
-            tree.insert("", "end", values=(
-                obj.id,
-                obj.created_at.strftime("%Y-%m-%d %H:%M:%S") if obj.created_at else "",
-                obj.receipt_no or "",
-                obj.token_no or "",
-                obj.price or "",
-                obj.weight or "",
-                obj.sender_name or "",
-                obj.sender_phone or "",
-                obj.receiver_name or "",
-                obj.receiver_phone or "",
-                obj.city or "",
-                obj.state or "",
-                obj.receiver_pincode or ""
-            ))
+        rank = {i: n for n, i in enumerate(ids)}
+        found.sort(key=lambda r: rank[r.id])
+        tree.delete(*tree.get_children())
+        row_keys.clear()
+        page.update(at_top=True, at_end=True, loading=False, fetch_pending=None)   # no paging for results
+        for r in found:
+            tree.insert("", "end", values=row_values(r))
+        info_lbl.configure(text=f"{len(found)} match(es) for \"{q}\"" +
+                                (" (showing best matches)" if len(found) >= db.SEARCH_LIMIT else ""))
+
+    def clear_search():
+        search_var.set("")
+        load_recent()
+
+    tree.configure(yscroll=on_yscroll)
 
     # ---------- Row detail (optional) ----------
     def on_row_double_click(_evt):
@@ -192,214 +334,497 @@ def open_reports_window():
             txt.insert("end", "\n".join(str(x) for x in lines))
         txt.configure(state="disabled")
 
+    def selected_ids():
+        return [int(tree.item(i, "values")[0]) for i in tree.selection()]
+
     # Bind & initial load
     tree.bind("<Double-1>", on_row_double_click)
-    btn_refresh.configure(command=load_recent)
+    btn_batch_print.configure(command=lambda: open_batch_print_dialog(win, selected_ids()))
+    btn_refresh.configure(command=run_search)
+    btn_search.configure(command=run_search)
+    btn_search_clear.configure(command=clear_search)
+    entry_search.bind("<Return>", run_search)
     load_recent()
 
+def open_diagnostics_window():
+    """Live timer/counter table from metrics (Ctrl+Shift+D); collection can be switched here."""
+    win = tk.Toplevel(root)
+    win.title("CourierX Diagnostics")
+    win.geometry("820x480")
+    win.transient(root)
+
+    top = tk.Frame(win)
+    top.pack(fill="x", padx=12, pady=8)
+    on_var = tk.BooleanVar(value=metrics.enabled())
+    ttk.Checkbutton(top, text="Collect timings", variable=on_var,
+                    command=lambda: metrics.enable(on_var.get())).pack(side="left")
+
+    def save():
+        try:
+            metrics.dump(METRICS_PATH)
+        except OSError as e:
+            messagebox.showerror("Diagnostics", f"Could not write {METRICS_PATH}: {e}", parent=win)
+            return
+        status_var.set(f"Metrics written to {METRICS_PATH}")
+
+    ttk.Button(top, text="Save to file", command=save).pack(side="right")
+    ttk.Button(top, text="Reset", command=lambda: (metrics.reset(), refresh(reschedule=False))).pack(side="right", padx=6)
+
+    cols = ("name", "count", "p50", "p95", "p99", "max", "total")
+    tree = ttk.Treeview(win, columns=cols, show="headings")
+    for c, title, w in zip(cols, ("Timer / counter", "Count", "p50 ms", "p95 ms", "p99 ms", "max ms", "total ms"),
+                           (260, 80, 80, 80, 80, 80, 100)):
+        tree.heading(c, text=title)
+        tree.column(c, width=w, anchor="w" if c == "name" else "e")
+    tree.pack(fill="both", expand=True, padx=12, pady=(0, 12))
+
+    def refresh(reschedule=True):
+        if not win.winfo_exists():
+            return
+        snap = metrics.snapshot()
+        tree.delete(*tree.get_children())
+        for name, t in snap["timers"].items():
+            tree.insert("", "end", values=(name, t["count"], f"{t['p50_ms']:.2f}", f"{t['p95_ms']:.2f}",
+                                           f"{t['p99_ms']:.2f}", f"{t['max_ms']:.2f}", f"{t['total_ms']:.1f}"))
+        for name, n in snap["counters"].items():
+            tree.insert("", "end", values=(name, n, "", "", "", "", ""))
+        if reschedule:
+            win.after(1000, refresh)
+
+    refresh()
+
+def open_dashboard_window():
+    """Totals, per-day figures and top destinations from the daily rollup tables."""
+    if not _require_backend():
+        return
+    win = tk.Toplevel(root)
+    win.title("CourierX Dashboard")
+    win.geometry("1100x650")
+    win.configure(bg="#FAFAFA")
+    win.transient(root)
+    win.grab_set()
+
+    top = tk.Frame(win, bg="#FAFAFA")
+    top.pack(fill="x", padx=12, pady=8)
+    first_day, today = db.recent_day_range()
+    from_var = tk.StringVar(value=first_day.isoformat())
+    to_var = tk.StringVar(value=today.isoformat())
+    ttk.Label(top, text="From:").pack(side="left")
+    ttk.Entry(top, textvariable=from_var, width=12).pack(side="left", padx=(4, 12))
+    ttk.Label(top, text="To:").pack(side="left")
+    ttk.Entry(top, textvariable=to_var, width=12).pack(side="left", padx=4)
+    btn_refresh = ttk.Button(top, text="🔄 Refresh")
+    btn_refresh.pack(side="right", padx=4)
+
+    totals_var = tk.StringVar(value="")
+    ttk.Label(win, textvariable=totals_var, font=("Helvetica", 14, "bold")).pack(anchor="w", padx=12)
+
+    body = tk.Frame(win, bg="#FAFAFA")
+    body.pack(fill="both", expand=True, padx=12, pady=8)
+
+    def make_table(parent, title, cols, widths):
+        frame = ttk.LabelFrame(parent, text=title, padding=6)
+        frame.pack(side="left", fill="both", expand=True, padx=4)
+        tree = ttk.Treeview(frame, columns=cols, show="headings")
+        vsb = ttk.Scrollbar(frame, orient="vertical", command=tree.yview)
+        tree.configure(yscroll=vsb.set)
+        tree.pack(side="left", fill="both", expand=True)
+        vsb.pack(side="right", fill="y")
+        for c, w in zip(cols, widths):
+            tree.heading(c, text=c)
+            tree.column(c, width=w, anchor="w")
+        return tree
+
+    daily_tree = make_table(body, "Per day", ("Day", "Bookings", "Revenue ₹", "Weight kg"), (100, 80, 100, 90))
+    states_tree = make_table(body, "Top states", ("State", "Bookings", "Revenue ₹"), (150, 80, 100))
+    cities_tree = make_table(body, "Top cities", ("City", "State", "Bookings"), (130, 120, 80))
+
+    def refresh():
+        try:
+            a = datetime.strptime(from_var.get().strip(), "%Y-%m-%d").date().isoformat()
+            b = datetime.strptime(to_var.get().strip(), "%Y-%m-%d").date().isoformat()
+        except ValueError:
+            messagebox.showerror("Dashboard", "Enter dates as YYYY-MM-DD.", parent=win)
+            return
+        try:
+            s = db.dashboard_summary(a, b)
+        except Exception as e:
+            logging.exception("Dashboard query failed: %s", e)
+            messagebox.showerror("DB Error", f"Failed to load dashboard: {e}", parent=win)
+            return
+        totals_var.set(f"Bookings: {s['bookings']}    Revenue: ₹{s['revenue_paise'] / 100:,.2f}    "
+                       f"Weight: {s['weight_grams'] / 1000:,.2f} kg")
+        for tree in (daily_tree, states_tree, cities_tree):
+            tree.delete(*tree.get_children())
+        for day, n, rev, wt in s["daily"]:
+            daily_tree.insert("", "end", values=(day, n, f"{rev / 100:,.2f}", f"{wt / 1000:,.2f}"))
+        for state, n, rev in s["top_states"]:
+            states_tree.insert("", "end", values=(state or "(none)", n, f"{rev / 100:,.2f}"))
+        for city, state, n, _rev in s["top_cities"]:
+            cities_tree.insert("", "end", values=(city or "(none)", state, n))
+
+    btn_refresh.configure(command=refresh)
+    refresh()
+
+def open_export_dialog(parent):
+    """Export a date range of bookings (CSV/XLSX/NDJSON) on a worker thread, with cancel."""
+    import exporter
+
+    dlg = tk.Toplevel(parent)
+    dlg.title("Export Bookings")
+    dlg.geometry("460x230")
+    dlg.transient(parent)
+    dlg.grab_set()
+    dlg.resizable(False, False)
+
+    frm = tk.Frame(dlg, padx=14, pady=12)
+    frm.pack(fill="both", expand=True)
+
+    first_day, today = db.recent_day_range()
+    from_var = tk.StringVar(value=first_day.isoformat())
+    to_var = tk.StringVar(value=today.isoformat())
+    fmt_var = tk.StringVar(value="csv")
+    msg_var = tk.StringVar(value="Dates are inclusive (YYYY-MM-DD).")
+
+    tk.Label(frm, text="From:").grid(row=0, column=0, sticky="w", pady=4)
+    ttk.Entry(frm, textvariable=from_var, width=14).grid(row=0, column=1, sticky="w")
+    tk.Label(frm, text="To:").grid(row=0, column=2, sticky="w", padx=(12, 0))
+    ttk.Entry(frm, textvariable=to_var, width=14).grid(row=0, column=3, sticky="w")
+    tk.Label(frm, text="Format:").grid(row=1, column=0, sticky="w", pady=4)
+    ttk.Combobox(frm, textvariable=fmt_var, values=list(exporter.EXPORT_FORMATS),
+                 state="readonly", width=10).grid(row=1, column=1, sticky="w")
+
+    progress = ttk.Progressbar(frm, mode="determinate", length=400)
+    progress.grid(row=2, column=0, columnspan=4, pady=(12, 4), sticky="ew")
+    tk.Label(frm, textvariable=msg_var, anchor="w").grid(row=3, column=0, columnspan=4, sticky="w")
+
+    btns = tk.Frame(frm)
+    btns.grid(row=4, column=0, columnspan=4, sticky="ew", pady=(10, 0))
+    btn_start = ttk.Button(btns, text="Export")
+    btn_start.pack(side="left")
+    btn_cancel = ttk.Button(btns, text="Close")
+    btn_cancel.pack(side="right")
+
+    job = {"cancel": None}
+    updates = queue.Queue()
+
+    def poll():
+        try:
+            while True:
+                kind, payload = updates.get_nowait()
+                if kind == "progress":
+                    done, total = payload
+                    progress.configure(maximum=max(total, 1), value=done)
+                    msg_var.set(f"Exported {done} of {total} row(s)...")
+                    continue
+                job["cancel"] = None
+                btn_start.configure(state="normal")
+                btn_cancel.configure(text="Close")
+                if kind == "done":
+                    msg_var.set(f"Done: {payload} row(s) written.")
+                elif kind == "cancelled":
+                    msg_var.set("Export cancelled.")
+                else:
+                    msg_var.set("Export failed.")
+                    messagebox.showerror("Export Error", f"Failed to export: {payload}", parent=dlg)
+                return
+        except queue.Empty:
+            pass
+        if dlg.winfo_exists():
+            dlg.after(100, poll)
+
+    def start():
+        try:
+            start_dt = datetime.strptime(from_var.get().strip(), "%Y-%m-%d")
+            end_dt = datetime.strptime(to_var.get().strip(), "%Y-%m-%d") + timedelta(days=1)
+        except ValueError:
+            msg_var.set("Enter dates as YYYY-MM-DD.")
+            return
+        fmt = fmt_var.get()
+        ext = exporter.EXPORT_FORMATS[fmt]
+        path = filedialog.asksaveasfilename(
+            parent=dlg, title="Export bookings", defaultextension=ext,
+            initialfile=f"courierx_{start_dt:%Y%m%d}_{end_dt - timedelta(days=1):%Y%m%d}{ext}",
+            filetypes=[(fmt.upper(), f"*{ext}")]
+        )
+        if not path:
+            return
+        cancel = threading.Event()
+        job["cancel"] = cancel
+
+        def worker():
+            try:
+                n = exporter.export_bookings(
+                    path, fmt, start_dt, end_dt, cancel=cancel,
+                    progress=lambda done, total: updates.put(("progress", (done, total)))
+                )
+                updates.put(("done", n))
+            except exporter.ExportCancelled:
+                updates.put(("cancelled", None))
+            except Exception as e:
+                logging.exception("Export failed: %s", e)
+                updates.put(("error", e))
+
+        btn_start.configure(state="disabled")
+        btn_cancel.configure(text="Cancel")
+        msg_var.set("Exporting...")
+        threading.Thread(target=worker, name="bookings-export", daemon=True).start()
+        dlg.after(100, poll)
+
+    def cancel_or_close():
+        if job["cancel"] is not None:
+            job["cancel"].set()
+            msg_var.set("Cancelling...")
+        else:
+            dlg.destroy()
+
+    btn_start.configure(command=start)
+    btn_cancel.configure(command=cancel_or_close)
+    dlg.protocol("WM_DELETE_WINDOW", cancel_or_close)
+
+def open_batch_print_dialog(parent, ids):
+    """Reprint the selected records, or a whole day, as one spool job (receipts or manifest)."""
+    import batchprint
+
+    dlg = tk.Toplevel(parent)
+    dlg.title("Batch Print")
+    dlg.geometry("440x250")
+    dlg.transient(parent)
+    dlg.grab_set()
+    dlg.resizable(False, False)
+
+    frm = tk.Frame(dlg, padx=14, pady=12)
+    frm.pack(fill="both", expand=True)
+
+    source_var = tk.StringVar(value="selected" if ids else "day")
+    day_var = tk.StringVar(value=datetime.now().date().isoformat())
+    kind_var = tk.StringVar(value="receipts" if ids else "manifest")
+    fmt_var = tk.StringVar(value=RECEIPT_FORMAT if RECEIPT_FORMAT in receipts.SPOOL_SUFFIXES else "text")
+    msg_var = tk.StringVar(value="One print job; each receipt starts on a new page.")
+
+    rb_sel = ttk.Radiobutton(frm, text=f"Selected rows ({len(ids)})", variable=source_var, value="selected")
+    rb_sel.grid(row=0, column=0, columnspan=2, sticky="w")
+    if not ids:
+        rb_sel.configure(state="disabled")
+    ttk.Radiobutton(frm, text="Whole day:", variable=source_var, value="day").grid(row=1, column=0, sticky="w")
+    ttk.Entry(frm, textvariable=day_var, width=14).grid(row=1, column=1, sticky="w")
+    ttk.Radiobutton(frm, text="Receipts", variable=kind_var, value="receipts").grid(row=2, column=0, sticky="w", pady=(8, 0))
+    ttk.Radiobutton(frm, text="Manifest sheet", variable=kind_var, value="manifest").grid(row=2, column=1, sticky="w", pady=(8, 0))
+    tk.Label(frm, text="Format:").grid(row=3, column=0, sticky="w", pady=4)
+    cmb_fmt = ttk.Combobox(frm, textvariable=fmt_var, state="readonly", width=10)
+    cmb_fmt.grid(row=3, column=1, sticky="w")
+    tk.Label(frm, textvariable=msg_var, anchor="w").grid(row=4, column=0, columnspan=3, sticky="w", pady=(8, 0))
+
+    btns = tk.Frame(frm)
+    btns.grid(row=5, column=0, columnspan=3, sticky="ew", pady=(12, 0))
+    btn_print = ttk.Button(btns, text="Print")
+    btn_print.pack(side="left")
+    ttk.Button(btns, text="Close", command=dlg.destroy).pack(side="right")
+
+    def on_kind(*_):
+        formats = list(receipts.SPOOL_SUFFIXES) if kind_var.get() == "receipts" else ["pdf", "text"]
+        cmb_fmt.configure(values=formats)
+        if fmt_var.get() not in formats:
+            fmt_var.set(formats[0])
+    kind_var.trace_add("write", on_kind)
+    on_kind()
+
+    updates = queue.Queue()
+
+    def poll():
+        try:
+            while True:
+                kind, payload = updates.get_nowait()
+                if kind == "progress":
+                    msg_var.set(f"Rendering... {payload} record(s)")
+                    continue
+                btn_print.configure(state="normal")
+                if kind == "done":
+                    msg_var.set(payload)
+                    status_var.set(payload)
+                else:
+                    msg_var.set("Batch print failed.")
+                    messagebox.showerror("Print Error", f"Batch print failed: {payload}", parent=dlg)
+                return
+        except queue.Empty:
+            pass
+        if dlg.winfo_exists():
+            dlg.after(100, poll)
+
+    def start():
+        if source_var.get() == "selected":
+            records, title = (lambda: batchprint.iter_forms(ids=ids)), f"Manifest: {len(ids)} selected booking(s)"
+        else:
+            try:
+                day = datetime.strptime(day_var.get().strip(), "%Y-%m-%d")
+            except ValueError:
+                msg_var.set("Enter the day as YYYY-MM-DD.")
+                return
+            start_dt, end_dt = batchprint.day_range(day)
+            records = lambda: batchprint.iter_forms(start=start_dt, end=end_dt)
+            title = f"CourierX manifest for {day:%d-%m-%Y}"
+        kind, fmt = kind_var.get(), fmt_var.get()
+
+        def worker():
+            try:
+                progress = lambda n: updates.put(("progress", n))
+                if kind == "receipts":
+                    path, n = batchprint.spool_receipts(records(), fmt, _receipt_template(), progress=progress)
+                    summary = f"Sent {n} receipt(s) to the printer."
+                else:
+                    path, pages, n = batchprint.spool_manifest(records(), title, fmt, progress=progress)
+                    summary = f"Sent a {pages}-page manifest ({n} booking(s)) to the printer."
+                if n:
+                    try:
+                        pipeline.send_to_printer(path)
+                    except Exception:
+                        pipeline.discard_temp_file(path)
+                        raise
+                else:
+                    os.remove(path)
+                    summary = "No bookings to print."
+                updates.put(("done", summary))
+            except Exception as e:
+                logging.exception("Batch print failed: %s", e)
+                updates.put(("error", e))
+
+        btn_print.configure(state="disabled")
+        msg_var.set("Rendering...")
+        threading.Thread(target=worker, name="batch-print", daemon=True).start()
+        dlg.after(100, poll)
+
+    btn_print.configure(command=start)
+
 # Paths
 CSV_PATH = resource_path("India_pincode.csv")
 APP_DIR = os.path.dirname(os.path.abspath(sys.argv[0]))
+PIN_CACHE_PATH = os.path.join(APP_DIR, "India_pincode.cache")
 DB_PATH = os.path.join(APP_DIR, "courierx.db")
 DB_URL = f"sqlite:///{DB_PATH}"
-
-# =========================
-# SQLAlchemy setup
-# =========================
-Base = declarative_base()
-_engine = None
-SessionLocal = None
-
-class CourierForm(Base):
-    __tablename__ = "courier_forms"
-
-    id = Column(Integer, primary_key=True, autoincrement=True)
-    receipt_no = Column(String(32))
-    token_no = Column(String(32))
-    weight = Column(String(32))
-    price = Column(String(32))
-
-    sender_name = Column(String(128))
-    sender_address = Column(String(256))
-    sender_pincode = Column(String(16))
-    sender_phone = Column(String(16))
-
-    receiver_name = Column(String(128))
-    house = Column(String(64))
-    street = Column(String(128))
-    locality = Column(String(128))
-    city = Column(String(128))
-    state = Column(String(64))
-    receiver_pincode = Column(String(16))
-    receiver_phone = Column(String(16))
-
-    created_at = Column(DateTime)
-    updated_at = Column(DateTime)
-
-def init_db():
-    global _engine, SessionLocal
-    _engine = create_engine(DB_URL, connect_args={"check_same_thread": False})
-    SessionLocal = scoped_session(sessionmaker(bind=_engine, autoflush=False, autocommit=False))
-    Base.metadata.create_all(_engine)
-    logging.info("SQLAlchemy DB ready at %s", DB_PATH)
-
-def get_session():
-    if SessionLocal is None:
-        raise RuntimeError("DB not initialized. Call init_db() first.")
-    return SessionLocal()
-
-def insert_form_row_sqlalchemy(data: dict):
-    """Insert one row via SQLAlchemy ORM."""
-    try:
-        now = datetime.now()
-        obj = CourierForm(
-            receipt_no=data.get("receipt_no"),
-            token_no=data.get("token_no"),
-            weight=data.get("weight"),
-            price=data.get("price"),
-
-            sender_name=data.get("sender_name"),
-            sender_address=data.get("sender_address"),
-            sender_pincode=data.get("sender_pincode"),
-            sender_phone=data.get("sender_phone"),
-
-            receiver_name=data.get("receiver_name"),
-            house=data.get("house"),
-            street=data.get("street"),
-            locality=data.get("locality"),
-            city=data.get("city"),
-            state=data.get("state"),
-            receiver_pincode=data.get("receiver_pincode"),
-            receiver_phone=data.get("receiver_phone"),
-
-            created_at=now,
-            updated_at=now
-        )
-        session = get_session()
-        session.add(obj)
-        session.commit()
-        session.close()
-        return True, None
-    except Exception as e:
-        logging.exception("Insert failed: %s", e)
-        # try to rollback if session is still open
-        try:
-            session.rollback()
-            session.close()
-        except Exception:
-            pass
-        return False, str(e)
+JOURNAL_PATH = os.path.join(APP_DIR, "courierx.journal")   # write-ahead log of bookings
+METRICS_PATH = os.path.join(APP_DIR, "courierx_metrics.json")  # Diagnostics "Save to file" / exit dump
+DB_PROFILE = os.environ.get("COURIERX_DB_PROFILE", "balanced")  # see db.SQLITE_PROFILES
+RECEIPT_FORMAT = os.environ.get("COURIERX_RECEIPT_FORMAT", "text")  # see receipts.RENDERERS
+RECEIPT_TEMPLATE = os.path.join(APP_DIR, "receipt_template.txt")  # optional layout override
 
 # =========================
 # Pincode CSV load (cached)
 # =========================
-PINCODES_DF = None
+PIN_INDEX = None
+LOCALITY_PREFIX = CITY_PREFIX = None   # PrefixIndex, built after PIN_INDEX
 COL_AREA = COL_PIN = COL_DIST = COL_STATE = None
 
+@metrics.timed("pin.load_csv")
 def load_pincode_csv():
-    """Load India_pincode.csv with flexible column detection."""
-    global PINCODES_DF, COL_AREA, COL_PIN, COL_DIST, COL_STATE
+    """
+    Load India_pincode.csv with flexible column detection (streamed with the
+    csv module; only PIN/district/state/area are kept).
+    Uses the binary PIN cache when it matches the CSV; otherwise parses the
+    CSV and rebuilds the cache for the next start.
+    """
+    global PIN_INDEX, COL_AREA, COL_PIN, COL_DIST, COL_STATE
+    cached = load_cache(PIN_CACHE_PATH, CSV_PATH)
+    if cached is not None:
+        PIN_INDEX, cols = cached
+        COL_AREA, COL_PIN = cols.get("area"), cols.get("pin")
+        COL_DIST, COL_STATE = cols.get("dist"), cols.get("state")
+        logging.info("Loaded PIN index from cache %s", PIN_CACHE_PATH)
+        return
     try:
-        PINCODES_DF = pd.read_csv(
-            CSV_PATH, low_memory=False, dtype=str,
-            encoding="utf-8", keep_default_na=False
-        )
-        PINCODES_DF.columns = [c.strip() for c in PINCODES_DF.columns]
-
-        def find_col(candidates):
-            cols_norm = {c: c.strip().lower().replace(" ", "").replace("_", "") for c in PINCODES_DF.columns}
-            for c, n in cols_norm.items():
-                if n in candidates:
-                    return c
-            return None
-
-        COL_AREA = find_col({"area", "locality", "officename", "village", "location", "place", "areaname"})
-        COL_PIN  = find_col({"pincode", "pin", "postcode", "zipcode", "pincodeno", "pincodenumber"})
-        if COL_PIN is None:
-            for c in PINCODES_DF.columns:
-                if c.strip().lower() in ("pin code", "pin-code", "pin code number", "p.o.pincode"):
-                    COL_PIN = c
-                    break
-
-        COL_DIST = next((c for c in PINCODES_DF.columns
-                         if c.strip().lower() in ("district", "districtname", "district name")), None)
-        COL_STATE = next((c for c in PINCODES_DF.columns
-                          if c.strip().lower() in ("state", "statename", "state name")), None)
+        PIN_INDEX, cols, rows = load_csv(CSV_PATH)
+        COL_AREA, COL_PIN = cols["area"], cols["pin"]
+        COL_DIST, COL_STATE = cols["dist"], cols["state"]
+        logging.info("Parsed %d rows from %s", rows, CSV_PATH)
+        save_cache(PIN_INDEX, PIN_CACHE_PATH, CSV_PATH, cols)
     except Exception as e:
         logging.exception(f"Failed to load India_pincode.csv from {CSV_PATH}: {e}")
 
-load_pincode_csv()
-if PINCODES_DF is None:
-    logging.error("India_pincode.csv failed to load. CSV_PATH=%s", CSV_PATH)
-else:
-    logging.info("Loaded India_pincode.csv: %d rows. Using columns -> PIN: %s, DIST: %s, STATE: %s",
-                 len(PINCODES_DF), COL_PIN, COL_DIST, COL_STATE)
+# Loaded on a worker thread so the window appears immediately; the Tk side
+# polls _pin_load_done via root.after and never touches the worker directly.
+_pin_load_done = threading.Event()
+_pin_lookup_pending = False
+
+def _pincode_loader_worker():
+    global LOCALITY_PREFIX, CITY_PREFIX
+    try:
+        load_pincode_csv()
+        if PIN_INDEX is not None:
+            LOCALITY_PREFIX = PIN_INDEX.locality_index()
+            CITY_PREFIX = PIN_INDEX.district_index()
+        startup_mark("pin index")
+        if PIN_INDEX is None:
+            logging.error("India_pincode.csv failed to load. CSV_PATH=%s", CSV_PATH)
+        else:
+            logging.info("PIN index ready: %d PINs. Using columns -> PIN: %s, DIST: %s, STATE: %s",
+                         len(PIN_INDEX), COL_PIN, COL_DIST, COL_STATE)
+    finally:
+        _pin_load_done.set()
+
+def _poll_pincode_loader():
+    """Runs on the Tk thread until the worker finishes."""
+    global _pin_lookup_pending
+    if not _pin_load_done.is_set():
+        root.after(50, _poll_pincode_loader)
+        return
+    if PIN_INDEX is None:
+        status_var.set("PIN data failed to load; enter City/State manually.")
+    elif _pin_lookup_pending:
+        autofill_receiver_from_pin()
+    else:
+        status_var.set(f"PIN data loaded ({len(PIN_INDEX)} PINs).")
+    _pin_lookup_pending = False
 
 # =========================
-# Persistent Receipt Counter (text file)
+# Receipt numbers (DB sequence, see db.allocate_receipt_no)
 # =========================
-RECEIPT_FILE = os.path.join(tempfile.gettempdir(), "courierx_receipt_counter.txt")
+# Pre-DB builds kept the counter here; it is folded into the DB sequence once
+LEGACY_RECEIPT_FILE = os.path.join(tempfile.gettempdir(), "courierx_receipt_counter.txt")
 
-def load_receipt_counter() -> int:
+def _adopt_legacy_receipt_counter():
     try:
-        if os.path.exists(RECEIPT_FILE):
-            with open(RECEIPT_FILE, "r", encoding="utf-8") as f:
+        if os.path.exists(LEGACY_RECEIPT_FILE):
+            with open(LEGACY_RECEIPT_FILE, "r", encoding="utf-8") as f:
                 val = int((f.read() or "0").strip())
-                return max(1, val)
-    except Exception:
-        pass
-    return 1
-
-def save_receipt_counter(counter: int) -> None:
-    try:
-        with open(RECEIPT_FILE, "w", encoding="utf-8") as f:
-            f.write(str(counter))
-    except Exception:
-        pass
-
-_receipt_counter = load_receipt_counter()
+            db.raise_receipt_floor(val)
+            os.remove(LEGACY_RECEIPT_FILE)
+            logging.info("Adopted legacy receipt counter %d from %s", val, LEGACY_RECEIPT_FILE)
+    except Exception as e:
+        logging.warning("Could not adopt legacy receipt counter: %s", e)
 
 def get_next_receipt() -> str:
-    global _receipt_counter
-    receipt_no = f"RX{_receipt_counter:05d}"
-    _receipt_counter += 1
-    save_receipt_counter(_receipt_counter)
-    return receipt_no
+    # Journaled bookings are not in courier_forms yet but their numbers are taken
+    return db.allocate_receipt_no(booking_journal.pending_receipts() if booking_journal else frozenset())
 
 def set_next_receipt_into_entry():
+    if not _require_backend():
+        return
     entry_receipt.delete(0, tk.END)
     entry_receipt.insert(0, get_next_receipt())
 
 def reset_receipt_counter():
-    global _receipt_counter
-    if messagebox.askyesno("Confirm Reset", "Do you want to reset Receipt No back to RX00001?"):
-        _receipt_counter = 1
-        save_receipt_counter(_receipt_counter)
+    if not _require_backend():
+        return
+    if messagebox.askyesno("Confirm Reset", "Do you want to reset Receipt No back to RX00001?\n"
+                                            "Numbers already saved will be skipped."):
+        db.reset_receipt_sequence(1)
         set_next_receipt_into_entry()
-        status_var.set("Receipt counter reset to RX00001")
+        status_var.set(f"Receipt counter reset; next is {entry_receipt.get()}")
 
 # =========================
 # PIN lookup helpers (Receiver autofill)
 # =========================
+@metrics.timed("pin.lookup")
 def lookup_pin(pin: str):
-    """Return (district, state) from the loaded CSV for a given 6-digit pin."""
-    if not (PINCODES_DF is not None and COL_PIN):
-        return None, None
-    pin = (pin or "").strip()
-    if len(pin) != 6 or not pin.isdigit():
-        return None, None
-    try:
-        rows = PINCODES_DF[PINCODES_DF[COL_PIN] == pin]
-        if rows.empty:
-            return None, None
-        dist = rows.iloc[0][COL_DIST] if COL_DIST else ""
-        state = rows.iloc[0][COL_STATE] if COL_STATE else ""
-        return (str(dist).strip(), str(state).strip())
-    except Exception as e:
-        logging.exception("PIN lookup failed: %s", e)
-        return None, None
+    """Return (district, state) from the PIN index for a given 6-digit pin."""
+    return pincodes.lookup_pin(PIN_INDEX, pin)
 
 def autofill_receiver_from_pin(_evt=None):
+    global _pin_lookup_pending
+    if not _pin_load_done.is_set():
+        # Re-run from _poll_pincode_loader once the index is ready
+        _pin_lookup_pending = bool(entry_pincode.get().strip())
+        status_var.set("PIN data still loading...")
+        return
     dist, state = lookup_pin(entry_pincode.get())
     if dist:
         entry_city.delete(0, tk.END)
@@ -408,6 +833,90 @@ def autofill_receiver_from_pin(_evt=None):
         entry_state.set(state)
     status_var.set("PIN found." if (dist or state) else "PIN not found in CSV.")
 
+def suggest_localities(text: str) -> list:
+    """Localities under the receiver PIN that start with text."""
+    pin = entry_pincode.get().strip()
+    if LOCALITY_PREFIX is None or len(pin) != 6:
+        return []
+    return LOCALITY_PREFIX.suggest(text, scope=pin)
+
+def suggest_cities(text: str) -> list:
+    """District names (all states) that start with text."""
+    if CITY_PREFIX is None:
+        return []
+    return CITY_PREFIX.suggest(text)
+
+def attach_suggestions(entry, suggest, max_rows=8):
+    """Show a dropdown of suggest(entry text) under entry while typing."""
+    popup = {"win": None, "lb": None}
+
+    def hide(_evt=None):
+        if popup["win"] is not None:
+            popup["win"].destroy()
+        popup["win"] = popup["lb"] = None
+
+    def pick(_evt=None):
+        lb = popup["lb"]
+        if lb is None or not lb.curselection():
+            return
+        value = lb.get(lb.curselection()[0])
+        entry.delete(0, tk.END)
+        entry.insert(0, value)
+        hide()
+        entry.focus_set()
+        entry.icursor(tk.END)
+        return "break"
+
+    def show(items):
+        if popup["win"] is None:
+            win = tk.Toplevel(entry)
+            win.overrideredirect(True)
+            try:
+                win.attributes("-topmost", True)
+            except Exception:
+                pass
+            lb = tk.Listbox(win, font=("Helvetica", 12), activestyle="dotbox", exportselection=False)
+            lb.pack(fill="both", expand=True)
+            lb.bind("<ButtonRelease-1>", pick)
+            lb.bind("<Return>", pick)
+            lb.bind("<Escape>", lambda e: (hide(), entry.focus_set()))
+            lb.bind("<FocusOut>", on_focus_out)
+            popup["win"], popup["lb"] = win, lb
+        lb = popup["lb"]
+        lb.delete(0, tk.END)
+        for it in items:
+            lb.insert(tk.END, it)
+        lb.configure(height=min(len(items), max_rows))
+        popup["win"].geometry(f"{entry.winfo_width()}x{lb.winfo_reqheight()}"
+                              f"+{entry.winfo_rootx()}+{entry.winfo_rooty() + entry.winfo_height()}")
+
+    def on_key(evt):
+        if evt.keysym in ("Escape", "Return", "Tab"):
+            hide()
+            return
+        if evt.keysym == "Down" and popup["lb"] is not None:
+            popup["lb"].focus_set()
+            popup["lb"].selection_set(0)
+            return
+        if evt.keysym in ("Up", "Left", "Right", "Shift_L", "Shift_R"):
+            return
+        items = suggest(entry.get())
+        show(items) if items else hide()
+
+    def on_focus_out(_evt):
+        # Keep the popup while the user moves into the listbox
+        def _check():
+            try:
+                focused = root.focus_get()
+            except Exception:
+                focused = None
+            if popup["lb"] is None or focused not in (entry, popup["lb"]):
+                hide()
+        entry.after(150, _check)
+
+    entry.bind("<KeyRelease>", on_key, add="+")
+    entry.bind("<FocusOut>", on_focus_out, add="+")
+
 # =========================
 # Tkinter App
 # =========================
@@ -438,8 +947,9 @@ def collect_form_data() -> dict:
     return {
         "receipt_no": entry_receipt.get().strip(),
         "token_no": entry_token.get().strip(),
-        "weight": entry_weight.get().strip(),
-        "price": entry_pr.get().strip(),
+        # units are printed on the receipt; drop them if typed (validated in basic_validate)
+        "weight": entry_weight.get().strip().lower().removesuffix("kg").strip(),
+        "price": entry_pr.get().strip().lstrip("₹").strip(),
 
         "sender_name": entry_sender_name.get().strip(),
         "sender_address": entry_sender_address.get().strip(),
@@ -457,126 +967,277 @@ def collect_form_data() -> dict:
     }
 
 def basic_validate(data: dict) -> bool:
-    if not data["receipt_no"]:
-        messagebox.showerror("Validation", "Receipt No is required.")
-        return False
-    if not data["sender_name"] or not data["receiver_name"]:
-        messagebox.showerror("Validation", "Sender and Receiver names are required.")
-        return False
-    if data["receiver_pincode"] and (not data["receiver_pincode"].isdigit() or len(data["receiver_pincode"]) != 6):
-        messagebox.showerror("Validation", "Receiver Pin Code must be 6 digits.")
-        return False
-    if data["sender_pincode"] and (not data["sender_pincode"].isdigit() or len(data["sender_pincode"]) != 6):
-        messagebox.showerror("Validation", "Sender Pin Code must be 6 digits.")
-        return False
-    if data["sender_phone"] and (not data["sender_phone"].isdigit() or len(data["sender_phone"]) != 10):
-        messagebox.showerror("Validation", "Sender Phone must be 10 digits.")
+    if not _require_backend():
         return False
-    if data["receiver_phone"] and (not data["receiver_phone"].isdigit() or len(data["receiver_phone"]) != 10):
-        messagebox.showerror("Validation", "Receiver Phone must be 10 digits.")
+    err = db.validate_form_data(data)
+    if err:
+        messagebox.showerror("Validation", err)
         return False
-    return True
+    return receipt_is_free(data)
+
+def receipt_is_free(data: dict) -> bool:
+    """
+    Refuse a receipt number that is already stored or still waiting in the
+    journal, before the booking is acknowledged; offers the next free number.
+    """
+    receipt = data["receipt_no"]
+    try:
+        taken = receipt in booking_journal.pending_receipts() or db.receipt_no_in_use(receipt)
+    except Exception as e:
+        # e.g. DB locked: the drainer still refuses the duplicate and it is reported
+        logging.warning("Could not check receipt %s: %s", receipt, e)
+        return True
+    if not taken:
+        return True
+    if messagebox.askyesno("Duplicate Receipt", f"Receipt No {receipt} is already used by another booking.\n"
+                                                "Use the next free number instead?"):
+        set_next_receipt_into_entry()
+        data["receipt_no"] = entry_receipt.get().strip()
+        return bool(data["receipt_no"])
+    return False
 
 def save_to_db():
     data = collect_form_data()
     if not basic_validate(data):
         return
-    ok, err = insert_form_row_sqlalchemy(data)
+    with metrics.timer("save_to_db"):
+        ok, err = booking_journal.append(data)   # durable now; the drainer writes it to the DB
     if ok:
+        metrics.count("bookings.saved")
         status_var.set("Saved.")
-        messagebox.showinfo("Saved", "Form data saved to database.")
+        # Journaled (crash-safe); the drainer adds it to the DB in the background
+        messagebox.showinfo("Saved", "Booking saved.")
     else:
         messagebox.showerror("DB Error", f"Failed to save: {err or 'unknown error'}")
 
+def format_receipt_text(data: dict, ts: str = None) -> str:
+    """Boxed plain-text receipt for one booking (form dict)."""
+    return receipts.render_text(data, _receipt_template(), timestamp=ts)
+
+def _receipt_template():
+    """receipt_template.txt next to the app if present (re-read only when it changes)."""
+    if os.path.exists(RECEIPT_TEMPLATE):
+        try:
+            return receipts.load_template(RECEIPT_TEMPLATE)
+        except (OSError, ValueError) as e:
+            logging.warning("Ignoring %s, using the default layout: %s", RECEIPT_TEMPLATE, e)
+    return None
+
+@metrics.timed("receipt.render")
+def render_receipt(data: dict):
+    """Receipt in the configured COURIERX_RECEIPT_FORMAT (text, pdf or escpos)."""
+    return receipts.render(data, RECEIPT_FORMAT, _receipt_template())
+
 def print_form_details(font_size=12, line_spacing=1.5):
-    # Save to DB before printing (submit)
+    """Validate, then hand save (+ print) to the background pipeline and free the form."""
     data = collect_form_data()
     if not basic_validate(data):
         return
-    ok, err = insert_form_row_sqlalchemy(data)
-    if not ok:
-        messagebox.showerror("DB Error", f"Failed to save before printing: {err}")
+    do_print = messagebox.askyesno("Confirm Print", "Do you want to print the CourierX form details too?\n"
+                                                   "(No = save only)")
+    # Timed from here on: the confirmation dialog would swamp everything else
+    with metrics.timer("print_form_details"):
+        ok, err = booking_journal.append(data)   # fsync'd; the journal drainer writes it to the DB
+        if not ok:
+            messagebox.showerror("DB Error", f"Failed to save: {err or 'unknown error'}")
+            return
+        if do_print:
+            booking_pipeline.submit(data, print_receipt=True, saved=True)
+        clear_form()
+    metrics.count("bookings.saved")
+    status_var.set(f"{data['receipt_no']} queued for saving{' and printing' if do_print else ''}. "
+                   f"Ready for the next booking.")
+
+# Job status comes from the pipeline worker; shown on the Tk thread by _poll_job_updates
+_job_updates = queue.Queue()
+# Bookings the journal drainer could not store: [(receipt_no, reason), ...] batches
+_journal_rejects = queue.Queue()
+_rejected_bookings = []
+
+def show_rejected_bookings(entries=None):
+    """List bookings that were acknowledged but could not be written to the DB."""
+    entries = entries if entries is not None else list(_rejected_bookings)
+    if not entries:
         return
+    lines = [f"{receipt}: {reason}" for receipt, reason in entries[:15]]
+    if len(entries) > 15:
+        lines.append(f"... and {len(entries) - 15} more")
+    messagebox.showerror("Bookings Not Saved",
+                         f"{len(entries)} booking(s) could not be saved to the database:\n\n" + "\n".join(lines) +
+                         f"\n\nPlease re-enter them. Details are kept in {booking_journal.rejected_path}")
+
+def _acknowledge_rejected():
+    show_rejected_bookings()
+    _rejected_bookings.clear()
+    btn_rejected.pack_forget()
+
+def _poll_job_updates():
+    try:
+        while True:
+            status, job = _job_updates.get_nowait()
+            if status == pipeline.SAVING:
+                status_var.set(f"{job.receipt_no}: saving...")
+            elif status == pipeline.PRINTING:
+                status_var.set(f"{job.receipt_no}: saved, sending to printer...")
+            elif status == pipeline.DONE:
+                status_var.set(f"{job.receipt_no}: " + ("saved and sent to printer." if job.print_receipt else "saved."))
+            elif status == pipeline.FAILED:
+                stage = "print" if job.saved else "save"
+                status_var.set(f"{job.receipt_no}: {stage} failed - {job.error}. Use Retry.")
+    except queue.Empty:
+        pass
+    new_rejects = []
+    try:
+        while True:
+            new_rejects += _journal_rejects.get_nowait()
+    except queue.Empty:
+        pass
+    if new_rejects:
+        _rejected_bookings.extend(new_rejects)
+        btn_rejected.configure(text=f"⚠ {len(_rejected_bookings)} booking(s) not saved")
+        if not btn_rejected.winfo_ismapped():
+            btn_rejected.pack(side="bottom", anchor="e", padx=8, pady=(0, 4))
+        status_var.set(f"{len(new_rejects)} booking(s) could not be saved; see ⚠ below.")
+        show_rejected_bookings(new_rejects)
+    failed = len(booking_pipeline.failed_jobs()) if booking_pipeline else 0
+    if failed:
+        btn_retry_jobs.configure(text=f"⟳ Retry failed ({failed})")
+        if not btn_retry_jobs.winfo_ismapped():
+            btn_retry_jobs.pack(side="bottom", anchor="e", padx=8, pady=(0, 4))
+    elif btn_retry_jobs.winfo_ismapped():
+        btn_retry_jobs.pack_forget()
+    root.after(200, _poll_job_updates)
+
+def retry_failed_jobs():
+    n = booking_pipeline.retry_failed()
+    status_var.set(f"Retrying {n} job(s)...")
 
-    details_left = {
-        "Sender Name": data["sender_name"],
-        "Sender Address": data["sender_address"],
-        "Sender Pin Code": data["sender_pincode"],
-        "Sender Phone": data["sender_phone"],
-    }
-    details_right = {
-        "Receiver Name": data["receiver_name"],
-        "House/Flat No": data["house"],
-        "Street Name": data["street"],
-        "Locality/Area": data["locality"],
-        "City": data["city"],
-        "State": data["state"],
-        "Receiver Pin Code": data["receiver_pincode"],
-        "Receiver Phone": data["receiver_phone"],
-    }
+# =========================
+# Bulk import (CSV / XLSX)
+# =========================
+_import_running = {"busy": False}
 
-    receipt_no = data["receipt_no"]
-    token_no = data["token_no"]
-    weight = data["weight"]
-    price = data["price"]
-
-    left_lines = [f"{k}: {v}" for k, v in details_left.items()]
-    right_lines = [f"{k}: {v}" for k, v in details_right.items()]
-    max_lines = max(len(left_lines), len(right_lines))
-    while len(left_lines) < max_lines: left_lines.append("")
-    while len(right_lines) < max_lines: right_lines.append("")
-
-    left_width = max((len(line) for line in left_lines), default=20)
-    right_width = max((len(line) for line in right_lines), default=20)
-
-    header = f"*** RECEIPT NO: {receipt_no} ***"
-    token_line = f"Token No: {token_no}"
-    weight_price = f"Weight: {weight} kg   |   Price: ₹{price}"
-
-    total_width = left_width + right_width + 7
-    border_top = "╔" + "═" * total_width + "╗"
-    border_bottom = "╚" + "═" * total_width + "╝"
-    title = " CourierX Form Details "
-    title_line = "║" + title.center(total_width) + "║"
-    mid_sep = "╟" + "─" * total_width + "╢"
-
-    content_lines = [
-        "║ " + l.ljust(left_width) + " │ " + r.ljust(right_width) + " ║"
-        for l, r in zip(left_lines, right_lines)
-    ]
-
-    ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    boxed_text = [
-        border_top,
-        title_line,
-        "║" + header.center(total_width) + "║",
-        "║" + token_line.center(total_width) + "║",
-        "║" + weight_price.center(total_width) + "║",
-        "║" + f"Day/Time: {ts}".center(total_width) + "║",
-        mid_sep,
-        *content_lines,
-        border_bottom
-    ]
-    formatted_text = "\n".join(boxed_text)
-
-    if not messagebox.askyesno("Confirm Print", "Saved to DB.\nDo you want to print the CourierX form details now?"):
-        status_var.set("Saved to DB. Print cancelled by user.")
+def import_bookings_dialog():
+    """Pick a spreadsheet and import it on a worker thread; progress goes to the status bar."""
+    if not _require_backend():
+        return
+    if _import_running["busy"]:
+        status_var.set("An import is already running...")
+        return
+    path = filedialog.askopenfilename(
+        title="Import bookings",
+        filetypes=[("Spreadsheets", "*.csv *.xlsx"), ("CSV", "*.csv"), ("Excel", "*.xlsx"), ("All files", "*.*")]
+    )
+    if not path:
         return
+    import importer
+    updates = queue.Queue()
 
-    temp_path = os.path.join(tempfile.gettempdir(), "courier_form.txt")
-    try:
-        with open(temp_path, "w", encoding="utf-8") as f:
-            f.write(formatted_text)
-        os.startfile(temp_path, "print")
-        status_var.set("Record saved and sending form to printer...")
-    except Exception as e:
-        messagebox.showerror("Print Error", f"Failed to print: {e}")
+    def worker():
+        try:
+            result = importer.import_bookings(
+                path, PIN_INDEX, progress=lambda seen, ok, bad: updates.put(("progress", (seen, ok, bad)))
+            )
+            updates.put(("done", result))
+        except Exception as e:
+            logging.exception("Import failed: %s", e)
+            updates.put(("error", e))
+
+    def poll():
+        try:
+            while True:
+                kind, payload = updates.get_nowait()
+                if kind == "progress":
+                    status_var.set("Importing {}: {} rows read, {} imported, {} failed...".format(
+                        os.path.basename(path), *payload))
+                    continue
+                _import_running["busy"] = False
+                if kind == "error":
+                    status_var.set("Import failed.")
+                    messagebox.showerror("Import Error", f"Failed to import: {payload}")
+                    return
+                inserted, failed, errors_path = payload
+                status_var.set(f"Imported {inserted} booking(s), {failed} failed.")
+                msg = f"Imported {inserted} booking(s) from {os.path.basename(path)}."
+                if errors_path:
+                    msg += f"\n{failed} row(s) failed; details saved to:\n{errors_path}"
+                messagebox.showinfo("Import", msg)
+                return
+        except queue.Empty:
+            pass
+        root.after(100, poll)
+
+    _import_running["busy"] = True
+    status_var.set(f"Importing {os.path.basename(path)}...")
+    threading.Thread(target=worker, name="bookings-import", daemon=True).start()
+    root.after(100, poll)
 
 # =========================
-# Build UI
+# Deferred startup: DB, journal and print pipeline
 # =========================
-# Ensure DB exists
-init_db()
+# Runs on a worker thread once the window has been drawn (or inline for
+# headless --import). Tk code that needs the DB calls _require_backend().
+booking_journal = booking_pipeline = None
+_backend_ready = threading.Event()
+_backend_error = None
+
+def _init_backend():
+    global db, booking_journal, booking_pipeline, _backend_error
+    try:
+        import db
+        import journal
+        startup_mark("db import")
+        db.init_db(DB_URL, DB_PROFILE)      # create_all/migrations only when the schema is behind
+        _adopt_legacy_receipt_counter()
+        booking_journal = journal.BookingJournal(JOURNAL_PATH, on_reject=_journal_rejects.put)
+        booking_journal.start()             # replays anything left from the last run
+        atexit.register(booking_journal.close)
+        booking_pipeline = pipeline.BookingPipeline(
+            booking_journal.append, render_receipt,
+            on_status=lambda job: _job_updates.put((job.status, job))   # status snapshot; job mutates
+        )
+        startup_mark("db ready")
+        pipeline.cleanup_temp_files()       # receipts/spools printed by earlier runs
+    except Exception as e:
+        logging.exception("Database initialisation failed: %s", e)
+        _backend_error = e
+    finally:
+        _backend_ready.set()
+
+def _require_backend() -> bool:
+    """
+    True once _init_backend has succeeded. Never waits on the Tk thread: while
+    the DB is still opening the action is refused with a status message (the
+    Save buttons stay disabled until then, see _poll_deferred_init).
+    """
+    if not _backend_ready.is_set():
+        status_var.set("Still opening the database, try again in a moment...")
+        return False
+    if _backend_error is not None:
+        messagebox.showerror("DB Error", f"The database could not be opened: {_backend_error}")
+        return False
+    return True
+
+def _start_deferred_init():
+    """After the first paint: load the DB and PIN data off the Tk thread."""
+    startup_mark("first paint")
+    threading.Thread(target=_init_backend, name="backend-init", daemon=True).start()
+    threading.Thread(target=_pincode_loader_worker, name="pincode-loader", daemon=True).start()
+    root.after(50, _poll_deferred_init)
+
+def _poll_deferred_init(receipt_set: bool = False):
+    if not receipt_set and _backend_ready.is_set():
+        if _backend_error is None:
+            set_next_receipt_into_entry()
+            for btn in (btn_print_form, btn_save_db):
+                btn.configure(state="normal")
+        else:
+            status_var.set(f"Database unavailable: {_backend_error}")
+        receipt_set = True
+    if not (receipt_set and _pin_load_done.is_set()):
+        root.after(50, _poll_deferred_init, receipt_set)
+        return
+    _report_startup()
 
 
 # =========================
@@ -592,6 +1253,12 @@ ACTIVATION_KEY = ("enter you passoword")                    # <<< your key
 SMALL_SKEW = 120            # 2 minutes allowable backward skew
 FORWARD_JUMP_CAP = 6*3600   # honor at most 6 hours of forward jump per run
 
+# The license lives in memory between checks; usage is written back every
+# LICENSE_CHECKPOINT_SECS of consumption, immediately on expiry or a large
+# clock jump, and at exit. The file is only re-read when it changes on disk.
+LICENSE_CHECKPOINT_SECS = 60
+_lic = {"d": None, "stamp": None, "saved_consumed": 0, "ok": None}
+
 def _machine_id() -> str:
     """Stable device id (MAC)."""
     return hex(uuid.getnode())[2:]
@@ -607,11 +1274,19 @@ def _sign_blob(d: dict) -> str:
     }, sort_keys=True).encode("utf-8")
     return hashlib.sha256(payload + SECRET_SALT.encode()).hexdigest()
 
+def _license_file_stamp():
+    try:
+        st = os.stat(LICENSE_FILE)
+        return st.st_size, st.st_mtime_ns
+    except OSError:
+        return None
+
 def _save_license_blob(d: dict):
     d["sig"] = _sign_blob(d)
     blob = base64.b64encode(json.dumps(d).encode("utf-8"))
     with open(LICENSE_FILE, "wb") as f:
         f.write(blob)
+    _lic.update(d=d, stamp=_license_file_stamp(), saved_consumed=d.get("consumed_secs", 0))
 
 def _load_license_blob():
     try:
@@ -624,6 +1299,23 @@ def _load_license_blob():
     except Exception:
         return None
 
+def _current_license():
+    """In-memory license dict (None if missing/invalid); re-read only when the file changed."""
+    stamp = _license_file_stamp()
+    if _lic["d"] is None or stamp != _lic["stamp"]:
+        d = _load_license_blob()
+        _lic.update(d=d, stamp=stamp, saved_consumed=d.get("consumed_secs", 0) if d else 0)
+    return _lic["d"]
+
+def flush_license_checkpoint():
+    """Write the in-memory usage checkpoint to disk (at exit)."""
+    d = _lic["d"]
+    if d is not None and _license_file_stamp() == _lic["stamp"]:
+        try:
+            _save_license_blob(d)
+        except Exception as e:
+            logging.warning("Could not save license checkpoint: %s", e)
+
 def _init_new_license(exp_epoch: int):
     now_wall = int(time.time())
     now_mono = time.monotonic()
@@ -639,7 +1331,7 @@ def _init_new_license(exp_epoch: int):
 def extend_license_days(days: int):
     """Stackable extension by calendar days; creates blob if missing."""
     now = int(time.time())
-    d = _load_license_blob()
+    d = _current_license()
     if not d:
         base = now
         _init_new_license(base + days*86400)
@@ -648,12 +1340,13 @@ def extend_license_days(days: int):
     d["exp"] = base + days*86400
     _save_license_blob(d)
 
+@metrics.timed("license.check")
 def _update_runtime_and_check():
     """
     Update checkpoints, accumulate usage (monotonic), detect clock tamper.
     Returns (ok: bool, reason: str).
     """
-    d = _load_license_blob()
+    d = _current_license()
     if not d:
         return False, "No license"
 
@@ -681,17 +1374,23 @@ def _update_runtime_and_check():
     # Accumulate usage
     consumed += int(delta_mono + honored_forward)
 
-    # Save updated checkpoints
+    # Update checkpoints (in memory)
     d["last_wall"] = now_wall
     d["last_mono"] = now_mono
     d["consumed_secs"] = consumed
-    _save_license_blob(d)
 
     # Calendar AND/OR Usage checks
     calendar_ok = now_wall < exp
     usage_ok = consumed < TRIAL_SECONDS
 
     ok = calendar_ok and usage_ok
+
+    # Persist on the coarse schedule, and right away for anything that must
+    # survive a crash/kill (state change, a forward jump being honored)
+    if (ok != _lic["ok"] or forward_jump > SMALL_SKEW
+            or consumed - int(_lic["saved_consumed"] or 0) >= LICENSE_CHECKPOINT_SECS):
+        _save_license_blob(d)
+    _lic["ok"] = ok
     reason = "" if ok else "Trial expired (calendar/usage)"
     return ok, reason
 
@@ -704,7 +1403,7 @@ def license_days_left() -> int:
     Report remaining whole days by calendar (exp - now).
     Note: usage cap may expire earlier; this is for status display.
     """
-    d = _load_license_blob()
+    d = _current_license()
     if not d:
         return 0
     exp = int(d.get("exp", 0))
@@ -843,6 +1542,22 @@ def _show_expired_overlay():
     ttk.Button(btns, text="Exit", command=_do_exit).pack(side="left", padx=6)
 
 
+# Headless: courierx --import bookings.csv|xlsx (no window, so no activation
+# dialog: the license must already be active)
+if len(sys.argv) > 1 and sys.argv[1] == "--import":
+    if not license_is_active():
+        logging.error("CourierX is not activated or the license has expired; "
+                      "activate it in the app before importing.")
+        sys.exit(2)
+    atexit.register(flush_license_checkpoint)
+    _init_backend()
+    if _backend_error is not None:
+        sys.exit(1)
+    _pincode_loader_worker()
+    import importer
+    sys.exit(importer.main(sys.argv[2:], pin_index=PIN_INDEX))
+
+startup_mark("imports")
 root = tk.Tk()
 root.attributes("-fullscreen", True)
 root.title("Courier Form")
@@ -854,9 +1569,11 @@ enforce_license_or_exit(root)
 def _license_watchdog():
     if not license_is_active():
         _show_expired_overlay()
-    root.after(1000, _license_watchdog)  # check every second
+    root.after(1000, _license_watchdog)  # check every second (in memory; see LICENSE_CHECKPOINT_SECS)
 
 _license_watchdog()
+atexit.register(flush_license_checkpoint)
+startup_mark("license")
 
 
 # Header
@@ -871,7 +1588,23 @@ btn_frame.pack(side="right", padx=10)
 
 
 def on_close():
-    if messagebox.askyesno("Exit", "Are you sure you want to close CourierX?"):
+    pending = booking_pipeline.pending() if booking_pipeline else 0
+    msg = "Are you sure you want to close CourierX?"
+    if booking_journal and booking_journal.pending():
+        msg = (f"{booking_journal.pending()} saved booking(s) are not in the database yet "
+               f"({booking_journal.last_error or 'still writing'}).\n"
+               "They are kept safely and will be written on the next start. Close anyway?")
+    elif pending:
+        msg = f"{pending} booking(s) are still being saved/printed.\nClose anyway?"
+    elif booking_pipeline and booking_pipeline.failed_jobs():
+        msg = f"{len(booking_pipeline.failed_jobs())} booking(s) failed to save/print.\nClose anyway?"
+    if messagebox.askyesno("Exit", msg):
+        if _backend_ready.is_set() and _backend_error is None:
+            try:
+                # Give this session's unused block back so the next start continues without a gap
+                db.release_receipt_numbers([entry_receipt.get().strip()])
+            except Exception:
+                logging.exception("Could not release unused receipt numbers")
         root.destroy()
 
 def on_minimize():
@@ -899,6 +1632,13 @@ btn_reports.bind("<Enter>", lambda e: btn_reports.config(bg="#3949ab"))
 btn_reports.bind("<Leave>", lambda e: btn_reports.config(bg="#1a237e"))
 btn_reports.bind("<Button-1>", lambda e: open_reports_window())
 
+btn_dashboard = tk.Label(btn_frame, text="📈 Dashboard", fg="white", bg="#1a237e",
+                         font=("Helvetica", 12, "bold"), cursor="hand2", padx=10, pady=4)
+btn_dashboard.pack(side="right", padx=8)
+btn_dashboard.bind("<Enter>", lambda e: btn_dashboard.config(bg="#3949ab"))
+btn_dashboard.bind("<Leave>", lambda e: btn_dashboard.config(bg="#1a237e"))
+btn_dashboard.bind("<Button-1>", lambda e: open_dashboard_window())
+
 btn_activate = tk.Label(btn_frame, text="🔑 Activate", fg="white", bg="#1a237e",
                         font=("Helvetica", 12, "bold"), cursor="hand2", padx=10, pady=4)
 btn_activate.pack(side="right", padx=8)
@@ -913,6 +1653,24 @@ def _do_activate(_=None):
             pass
 btn_activate.bind("<Button-1>", _do_activate)
 
+btn_import = tk.Label(btn_frame, text="📥 Import", fg="white", bg="#1a237e",
+                      font=("Helvetica", 12, "bold"), cursor="hand2", padx=10, pady=4)
+btn_import.pack(side="right", padx=8)
+btn_import.bind("<Enter>", lambda e: btn_import.config(bg="#3949ab"))
+btn_import.bind("<Leave>", lambda e: btn_import.config(bg="#1a237e"))
+btn_import.bind("<Button-1>", lambda e: import_bookings_dialog())
+
+root.bind_all("<Control-Shift-D>", lambda e: open_diagnostics_window())
+
+def _dump_metrics_at_exit():
+    if metrics.enabled():
+        try:
+            metrics.dump(METRICS_PATH)
+        except OSError as e:
+            logging.warning("Could not write %s: %s", METRICS_PATH, e)
+
+atexit.register(_dump_metrics_at_exit)
+
 
 # Fonts and Styles
 LABEL_FONT = ("Helvetica", 15)
@@ -927,6 +1685,8 @@ style.configure("TLabelframe.Label", font=HEADER_FONT)
 status_var = tk.StringVar(value="Ready")
 status_bar = ttk.Label(root, textvariable=status_var, relief="sunken", anchor="w")
 status_bar.pack(fill="x", side="bottom")
+btn_retry_jobs = ttk.Button(root, text="⟳ Retry failed", command=retry_failed_jobs)
+btn_rejected = ttk.Button(root, text="⚠ Not saved", command=_acknowledge_rejected)
 
 # Validations
 def validate_phone(P): return P == "" or (P.isdigit() and len(P) <= 10)
@@ -1013,10 +1773,12 @@ entry_street.grid(row=1, column=1, pady=5)
 ttk.Label(receiver_frame, text="Locality/Area:").grid(row=1, column=2, sticky="w", pady=5)
 entry_locality = ttk.Entry(receiver_frame, width=30)
 entry_locality.grid(row=1, column=3, pady=5)
+attach_suggestions(entry_locality, suggest_localities)
 
 ttk.Label(receiver_frame, text="City (District):").grid(row=2, column=0, sticky="w", pady=5)
 entry_city = ttk.Entry(receiver_frame, width=30)
 entry_city.grid(row=2, column=1, pady=5)
+attach_suggestions(entry_city, suggest_cities)
 
 ttk.Label(receiver_frame, text="State:").grid(row=2, column=2, sticky="w", pady=5)
 INDIA_STATES = [
@@ -1041,18 +1803,22 @@ entry_receiver_phone.grid(row=3, column=3, pady=5)
 btn_clear_form = ttk.Button(receiver_frame, text="Clear Form", command=clear_form)
 btn_clear_form.grid(row=3, column=4, padx=10, pady=5)
 
-btn_print_form = ttk.Button(receiver_frame, text="saves", command=print_form_details)
+btn_print_form = ttk.Button(receiver_frame, text="saves", command=print_form_details, state="disabled")
 btn_print_form.grid(row=3, column=5, padx=10, pady=5)
 
 # Save button
-btn_save_db = ttk.Button(receiver_frame, text="💾 Save to DB", command=save_to_db)
+btn_save_db = ttk.Button(receiver_frame, text="💾 Save to DB", command=save_to_db, state="disabled")
 btn_save_db.grid(row=4, column=5, padx=10, pady=(5,10), sticky="e")
 
 # Status + DB path quick info
 db_hint = ttk.Label(root, text=f"DB: {DB_PATH}", font=("Helvetica", 9))
 db_hint.pack(side="bottom", anchor="w", padx=8, pady=(0,6))
 
-# Initialize first receipt number
-set_next_receipt_into_entry()
+# First receipt number is filled in by _poll_deferred_init once the DB is open
+startup_mark("ui built")
+root.after_idle(_start_deferred_init)   # idle callbacks run after the pending redraws
+
+root.after(50, _poll_pincode_loader)
+root.after(200, _poll_job_updates)
 
 root.mainloop()
@@ -0,0 +1,256 @@
+"""
+PIN code index for India_pincode.csv.
+
+Maps each 6-digit PIN to (district, state) plus the localities (post office /
+area names) listed under it, so a lookup is a single dict hit instead of a
+scan over the whole CSV.
+
+The CSV is streamed with the stdlib csv module, keeping only the PIN,
+district, state and area columns, so no DataFrame is built at startup.
+
+PrefixIndex answers as-you-type suggestions (localities under a PIN,
+district names) from sorted arrays with bisect.
+
+The index can be persisted to a small binary cache (marshal) so later starts
+skip parsing the CSV entirely; the cache is keyed by the CSV's size and mtime.
+"""
+import csv
+from bisect import bisect_left
+import logging
+import marshal
+import os
+import sys
+
+
+def _clean(value) -> str:
+    if value is None:
+        return ""
+    return sys.intern(str(value).strip())
+
+
+class PinIndex:
+    """PIN -> (district, state, localities). Built once at load time."""
+
+    __slots__ = ("_by_pin",)
+
+    def __init__(self):
+        self._by_pin = {}
+
+    def __len__(self) -> int:
+        return len(self._by_pin)
+
+    def __contains__(self, pin) -> bool:
+        return (pin or "").strip() in self._by_pin
+
+    def add(self, pin, district="", state="", area="") -> None:
+        pin = (pin or "").strip()
+        if len(pin) != 6 or not pin.isdigit():
+            return
+        entry = self._by_pin.get(pin)
+        if entry is None:
+            # First row wins for district/state (same as the old iloc[0] lookup)
+            entry = self._by_pin[pin] = (_clean(district), _clean(state), [])
+        area = _clean(area)
+        if area and area not in entry[2]:
+            entry[2].append(area)
+
+    def lookup(self, pin: str):
+        """Return (district, state) for a 6-digit pin, or (None, None)."""
+        entry = self._by_pin.get((pin or "").strip())
+        if entry is None:
+            return None, None
+        return entry[0], entry[1]
+
+    def localities(self, pin: str) -> list:
+        """Return the locality / office names listed under a pin."""
+        entry = self._by_pin.get((pin or "").strip())
+        return list(entry[2]) if entry else []
+
+    def pins(self):
+        return self._by_pin.keys()
+
+    def districts(self) -> set:
+        return {entry[0] for entry in self._by_pin.values() if entry[0]}
+
+    def locality_index(self) -> "PrefixIndex":
+        """Localities scoped by PIN: suggest(prefix, scope=pin)."""
+        return PrefixIndex(
+            (PrefixIndex.key(area, pin), area)
+            for pin, entry in self._by_pin.items() for area in entry[2]
+        )
+
+    def district_index(self) -> "PrefixIndex":
+        return PrefixIndex((PrefixIndex.key(d), d) for d in self.districts())
+
+    @classmethod
+    def from_columns(cls, pins, districts=None, states=None, areas=None):
+        """Build from parallel column sequences; missing columns may be None."""
+        idx = cls()
+        n = len(pins)
+        districts = districts if districts is not None else [""] * n
+        states = states if states is not None else [""] * n
+        areas = areas if areas is not None else [""] * n
+        for pin, dist, state, area in zip(pins, districts, states, areas):
+            idx.add(pin, dist, state, area)
+        return idx
+
+
+def lookup_pin(index, pin: str):
+    """
+    (district, state) for what was typed into a PIN field, or (None, None)
+    when the index isn't loaded, the input isn't 6 digits or the PIN is unknown.
+    """
+    if index is None:
+        return None, None
+    pin = (pin or "").strip()
+    if len(pin) != 6 or not pin.isdigit():
+        return None, None
+    return index.lookup(pin)
+
+
+class PrefixIndex:
+    """
+    Case-insensitive prefix search over sorted keys (bisect), optionally
+    scoped (e.g. by PIN) by prefixing each key with the scope.
+    """
+
+    __slots__ = ("_keys", "_values")
+    SEP = "\x1f"
+
+    def __init__(self, entries=()):
+        by_key = {}
+        for k, v in entries:
+            by_key.setdefault(k, v)
+        self._keys = sorted(by_key)
+        self._values = [by_key[k] for k in self._keys]
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    @classmethod
+    def key(cls, text: str, scope: str = "") -> str:
+        return f"{scope}{cls.SEP}{text.strip().casefold()}"
+
+    def suggest(self, prefix: str, limit: int = 10, scope: str = "") -> list:
+        """Return up to `limit` display values whose key starts with prefix."""
+        prefix = (prefix or "").strip()
+        if not prefix and not scope:
+            return []
+        p = self.key(prefix, scope)
+        keys = self._keys
+        i = bisect_left(keys, p)
+        out = []
+        while i < len(keys) and len(out) < limit and keys[i].startswith(p):
+            out.append(self._values[i])
+            i += 1
+        return out
+
+
+# =========================
+# Streaming CSV loader
+# =========================
+AREA_CANDIDATES = {"area", "locality", "officename", "village", "location", "place", "areaname"}
+PIN_CANDIDATES = {"pincode", "pin", "postcode", "zipcode", "pincodeno", "pincodenumber"}
+PIN_FALLBACKS = ("pin code", "pin-code", "pin code number", "p.o.pincode")
+DIST_NAMES = ("district", "districtname", "district name")
+STATE_NAMES = ("state", "statename", "state name")
+
+
+def detect_columns(header) -> dict:
+    """
+    Flexible header detection. Returns {"area", "pin", "dist", "state"} ->
+    column name (or None when the CSV has no such column).
+    """
+    header = [c.strip() for c in header]
+
+    def find_col(candidates):
+        for c in header:
+            if c.lower().replace(" ", "").replace("_", "") in candidates:
+                return c
+        return None
+
+    pin = find_col(PIN_CANDIDATES)
+    if pin is None:
+        pin = next((c for c in header if c.lower() in PIN_FALLBACKS), None)
+    return {
+        "area": find_col(AREA_CANDIDATES),
+        "pin": pin,
+        "dist": next((c for c in header if c.lower() in DIST_NAMES), None),
+        "state": next((c for c in header if c.lower() in STATE_NAMES), None),
+    }
+
+
+def load_csv(csv_path: str, encoding: str = "utf-8-sig"):
+    """
+    Stream csv_path row by row into a PinIndex.
+    Returns (PinIndex, columns, rows_read); raises ValueError if no PIN column.
+    """
+    idx = PinIndex()
+    rows = 0
+    with open(csv_path, "r", encoding=encoding, newline="") as f:
+        reader = csv.reader(f)
+        header = [c.strip() for c in next(reader, [])]
+        columns = detect_columns(header)
+        if columns["pin"] is None:
+            raise ValueError(f"No PIN column found in {csv_path} (header: {header})")
+        pos = {k: (header.index(v) if v else None) for k, v in columns.items()}
+        i_pin, i_dist, i_state, i_area = pos["pin"], pos["dist"], pos["state"], pos["area"]
+        width = len(header)
+        add = idx.add
+        for row in reader:
+            rows += 1
+            if len(row) < width:
+                row = row + [""] * (width - len(row))
+            add(row[i_pin],
+                row[i_dist] if i_dist is not None else "",
+                row[i_state] if i_state is not None else "",
+                row[i_area] if i_area is not None else "")
+    return idx, columns, rows
+
+
+# =========================
+# Binary cache
+# =========================
+CACHE_MAGIC = b"CXPIN"
+CACHE_VERSION = 1
+
+
+def _csv_stamp(csv_path: str):
+    st = os.stat(csv_path)
+    return st.st_size, st.st_mtime_ns
+
+
+def save_cache(index: PinIndex, cache_path: str, csv_path: str, columns=None) -> bool:
+    """Write the index to cache_path, stamped with the CSV's size/mtime."""
+    try:
+        size, mtime_ns = _csv_stamp(csv_path)
+        payload = marshal.dumps((CACHE_VERSION, size, mtime_ns,
+                                 dict(columns or {}), index._by_pin))
+        tmp = cache_path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(CACHE_MAGIC)
+            f.write(payload)
+        os.replace(tmp, cache_path)
+        return True
+    except Exception as e:
+        logging.warning("Could not write PIN cache %s: %s", cache_path, e)
+        return False
+
+
+def load_cache(cache_path: str, csv_path: str):
+    """
+    Return (PinIndex, columns) from cache_path if it matches csv_path,
+    else None (missing, stale, corrupt or from another version).
+    """
+    try:
+        with open(cache_path, "rb") as f:
+            if f.read(len(CACHE_MAGIC)) != CACHE_MAGIC:
+                return None
+            version, size, mtime_ns, columns, by_pin = marshal.loads(f.read())
+        if version != CACHE_VERSION or (size, mtime_ns) != _csv_stamp(csv_path):
+            return None
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    idx = PinIndex()
+    idx._by_pin = by_pin
+    return idx, columns
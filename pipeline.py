@@ -0,0 +1,194 @@
+"""
+Background save-and-print pipeline.
+
+Bookings are handed to a single worker thread that persists them and then
+renders/prints the receipt, so a slow disk or print spooler never blocks
+the form. Every status change is reported through on_status(job) from the
+worker thread; the Tk side marshals it onto its own thread.
+"""
+import logging
+import os
+import queue
+import re
+import tempfile
+import threading
+import time
+from itertools import count
+
+QUEUED, SAVING, PRINTING, DONE, FAILED = "queued", "saving", "printing", "done", "failed"
+
+TEMP_MAX_AGE = 3600     # secs; the shell print has long finished reading the file by then
+# Only names mkstemp made for write_temp_receipt / batchprint spools (8 random chars),
+# never e.g. the legacy courierx_receipt_counter.txt
+_TEMP_NAME = re.compile(r"^courierx_(?:batch_|manifest_)?[a-z0-9_]{8}\.(?:txt|pdf|prn)$")
+
+
+class BookingJob:
+    """One booking to save (and optionally print). Retries resume at the failed step."""
+
+    _ids = count(1)
+
+    def __init__(self, data: dict, print_receipt: bool = True):
+        self.id = next(self._ids)
+        self.data = data
+        self.print_receipt = print_receipt
+        self.status = QUEUED
+        self.saved = False
+        self.error = None
+
+    @property
+    def receipt_no(self) -> str:
+        return self.data.get("receipt_no", "")
+
+    def __repr__(self):
+        return f"<BookingJob #{self.id} {self.receipt_no} {self.status}>"
+
+
+def write_temp_receipt(content, prefix: str = "courierx_") -> str:
+    """
+    Write a rendered receipt (str -> .txt, PDF bytes -> .pdf, other bytes -> .prn)
+    to a fresh temp file (never reused, so overlapping prints can't collide).
+    """
+    if isinstance(content, str):
+        suffix, content = ".txt", content.encode("utf-8")
+    else:
+        suffix = ".pdf" if content.startswith(b"%PDF") else ".prn"
+    fd, path = tempfile.mkstemp(prefix=prefix, suffix=suffix)
+    with os.fdopen(fd, "wb") as f:
+        f.write(content)
+    return path
+
+
+def discard_temp_file(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError as e:
+        logging.warning("Could not remove temp file %s: %s", path, e)
+
+
+def cleanup_temp_files(max_age: float = TEMP_MAX_AGE, directory: str = None) -> int:
+    """
+    Remove receipt/spool files older than max_age seconds. The shell print
+    reads them asynchronously, so they can't be deleted right after printing;
+    this runs at startup instead. Returns how many were removed.
+    """
+    directory = directory or tempfile.gettempdir()
+    cutoff = time.time() - max_age
+    removed = 0
+    try:
+        names = os.listdir(directory)
+    except OSError as e:
+        logging.warning("Could not list %s: %s", directory, e)
+        return 0
+    for name in names:
+        if not _TEMP_NAME.match(name):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        except OSError:
+            pass    # in use by the spooler or already gone; next start retries
+    if removed:
+        logging.info("Removed %d old print temp file(s) from %s", removed, directory)
+    return removed
+
+
+def send_to_printer(path: str) -> None:
+    """Windows shell print of a file; other platforms must supply their own printer."""
+    if not hasattr(os, "startfile"):
+        raise RuntimeError("Printing via os.startfile is only available on Windows.")
+    os.startfile(path, "print")
+
+
+class BookingPipeline:
+    """
+    save(data) -> (ok, err)           e.g. db.insert_form_row_sqlalchemy
+    render(data) -> str | bytes       rendered receipt (see receipts.render)
+    printer(path)                     sends a rendered file to the printer
+    on_status(job)                    called (from the worker) on every change
+    """
+
+    def __init__(self, save, render, on_status=None, printer=send_to_printer):
+        self._save = save
+        self._render = render
+        self._printer = printer
+        self._on_status = on_status or (lambda job: None)
+        self._queue = queue.Queue()
+        self._failed = {}
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="booking-pipeline", daemon=True)
+        self._thread.start()
+
+    def submit(self, data: dict, print_receipt: bool = True, saved: bool = False) -> BookingJob:
+        """saved=True: the caller already persisted the booking; only print it."""
+        job = BookingJob(dict(data), print_receipt)
+        job.saved = saved
+        self._queue.put(job)
+        self._notify(job)
+        return job
+
+    def retry(self, job: BookingJob) -> None:
+        with self._lock:
+            self._failed.pop(job.id, None)
+        job.status, job.error = QUEUED, None
+        self._queue.put(job)
+        self._notify(job)
+
+    def retry_failed(self) -> int:
+        jobs = self.failed_jobs()
+        for job in jobs:
+            self.retry(job)
+        return len(jobs)
+
+    def failed_jobs(self) -> list:
+        with self._lock:
+            return list(self._failed.values())
+
+    def pending(self) -> int:
+        return self._queue.unfinished_tasks
+
+    def wait(self) -> None:
+        """Block until every submitted job has finished (used at exit / headless)."""
+        self._queue.join()
+
+    def _notify(self, job):
+        try:
+            self._on_status(job)
+        except Exception:
+            logging.exception("Pipeline status callback failed")
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                self._process(job)
+            finally:
+                self._queue.task_done()
+
+    def _process(self, job: BookingJob):
+        try:
+            if not job.saved:
+                job.status = SAVING
+                self._notify(job)
+                ok, err = self._save(job.data)
+                if not ok:
+                    raise RuntimeError(f"Failed to save: {err or 'unknown error'}")
+                job.saved = True
+            if job.print_receipt:
+                job.status = PRINTING
+                self._notify(job)
+                path = write_temp_receipt(self._render(job.data))
+                try:
+                    self._printer(path)
+                except Exception:
+                    discard_temp_file(path)     # a retry renders a fresh file
+                    raise
+            job.status = DONE
+        except Exception as e:
+            logging.exception("Booking job %s failed: %s", job, e)
+            job.status, job.error = FAILED, str(e)
+            with self._lock:
+                self._failed[job.id] = job
+        self._notify(job)
@@ -0,0 +1,411 @@
+"""
+Receipt rendering: one booking (CourierForm row or form dict) -> plain text,
+PDF bytes or ESC/POS bytes for thermal printers.
+
+The layout comes from a small line-based template (see DEFAULT_TEMPLATE)
+that is parsed once and cached; renderers only fill in values. Extra output
+formats can be plugged in with register_renderer().
+
+write_receipts() / write_manifest() stream many bookings into one spool file
+(one receipt per page, or a tabular day sheet) without holding them all.
+"""
+import io
+import os
+import string
+from datetime import datetime
+from functools import lru_cache
+
+# Booking fields available to templates (plus {timestamp})
+RECORD_FIELDS = (
+    "receipt_no", "token_no", "weight", "price",
+    "sender_name", "sender_address", "sender_pincode", "sender_phone",
+    "receiver_name", "house", "street", "locality", "city", "state",
+    "receiver_pincode", "receiver_phone",
+)
+
+# title:  box title          center: centred line under the title
+# left:   sender column      right:  receiver column
+DEFAULT_TEMPLATE = """\
+title: CourierX Form Details
+center: *** RECEIPT NO: {receipt_no} ***
+center: Token No: {token_no}
+center: Weight: {weight} kg   |   Price: ₹{price}
+center: Day/Time: {timestamp}
+left: Sender Name: {sender_name}
+left: Sender Address: {sender_address}
+left: Sender Pin Code: {sender_pincode}
+left: Sender Phone: {sender_phone}
+right: Receiver Name: {receiver_name}
+right: House/Flat No: {house}
+right: Street Name: {street}
+right: Locality/Area: {locality}
+right: City: {city}
+right: State: {state}
+right: Receiver Pin Code: {receiver_pincode}
+right: Receiver Phone: {receiver_phone}
+"""
+
+
+TEMPLATE_FIELDS = frozenset(RECORD_FIELDS + ("timestamp",))
+
+
+def _check_placeholders(n: int, raw: str, body: str) -> None:
+    """Reject unknown {fields} and stray braces now rather than at print time."""
+    try:
+        for _literal, field, spec, _conv in string.Formatter().parse(body):
+            if field is not None and field not in TEMPLATE_FIELDS:
+                raise ValueError(f"unknown field {{{field}}}")
+        body.format_map(dict.fromkeys(TEMPLATE_FIELDS, ""))
+    except ValueError as e:
+        raise ValueError(f"Receipt template line {n}: {e} in {raw!r}") from None
+
+
+class ReceiptTemplate:
+    __slots__ = ("title", "center", "left", "right")
+
+    def __init__(self, title, center, left, right):
+        self.title = title
+        self.center = tuple(center)
+        self.left = tuple(left)
+        self.right = tuple(right)
+
+
+@lru_cache(maxsize=32)
+def parse_template(source: str) -> ReceiptTemplate:
+    """Parse template text (cached by its content)."""
+    title, parts = "", {"center": [], "left": [], "right": []}
+    for n, raw in enumerate(source.splitlines(), start=1):
+        line = raw.rstrip()
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        kind, sep, body = line.partition(":")
+        kind = kind.strip().lower()
+        body = body[1:] if body.startswith(" ") else body
+        if not sep or (kind != "title" and kind not in parts):
+            raise ValueError(f"Receipt template line {n}: expected title/center/left/right, got {raw!r}")
+        if kind == "title":
+            title = body
+        else:
+            _check_placeholders(n, raw, body)
+            parts[kind].append(body)
+    return ReceiptTemplate(title, parts["center"], parts["left"], parts["right"])
+
+
+_file_templates = {}
+
+def load_template(path: str) -> ReceiptTemplate:
+    """Template from a file, re-read only when the file changes."""
+    mtime = os.stat(path).st_mtime_ns
+    cached = _file_templates.get(path)
+    if cached is None or cached[0] != mtime:
+        with open(path, "r", encoding="utf-8") as f:
+            cached = _file_templates[path] = (mtime, parse_template(f.read()))
+    return cached[1]
+
+
+def _getter(record):
+    return record.get if isinstance(record, dict) else (lambda k, d=None: getattr(record, k, d))
+
+
+def record_values(record, timestamp=None) -> dict:
+    """CourierForm row or form dict -> template values ('' for missing)."""
+    get = _getter(record)
+    values = {k: ("" if get(k) is None else get(k)) for k in RECORD_FIELDS}
+    if timestamp is None:
+        created = get("created_at")
+        timestamp = created if isinstance(created, datetime) else datetime.now()
+    if isinstance(timestamp, datetime):
+        timestamp = timestamp.strftime("%Y-%m-%d %H:%M:%S")
+    values["timestamp"] = timestamp
+    return values
+
+
+def _resolve(template) -> ReceiptTemplate:
+    if template is None:
+        return parse_template(DEFAULT_TEMPLATE)
+    if isinstance(template, ReceiptTemplate):
+        return template
+    return parse_template(template)
+
+
+# =========================
+# Plain text (boxed, two columns)
+# =========================
+UNICODE_BOX = {"tl": "╔", "tr": "╗", "bl": "╚", "br": "╝", "h": "═", "v": "║",
+               "ml": "╟", "mr": "╢", "mh": "─", "col": "│"}
+ASCII_BOX = {"tl": "+", "tr": "+", "bl": "+", "br": "+", "h": "=", "v": "|",
+             "ml": "+", "mr": "+", "mh": "-", "col": "|"}
+
+
+@lru_cache(maxsize=32)
+def _ascii_template(tpl: ReceiptTemplate) -> ReceiptTemplate:
+    """Same layout with the rupee sign spelled out (Courier/cp437 have no glyph)."""
+    fix = lambda s: s.replace("₹", "Rs.")
+    return ReceiptTemplate(fix(tpl.title), map(fix, tpl.center), map(fix, tpl.left), map(fix, tpl.right))
+
+
+def text_lines(record, template=None, timestamp=None, box=UNICODE_BOX) -> list:
+    tpl = _resolve(template)
+    if box is ASCII_BOX:
+        tpl = _ascii_template(tpl)
+    values = record_values(record, timestamp)
+    left = [s.format_map(values) for s in tpl.left]
+    right = [s.format_map(values) for s in tpl.right]
+    rows = max(len(left), len(right))
+    left += [""] * (rows - len(left))
+    right += [""] * (rows - len(right))
+
+    left_width = max((len(s) for s in left), default=20)
+    right_width = max((len(s) for s in right), default=20)
+    width = left_width + right_width + 7
+    v = box["v"]
+    return [
+        box["tl"] + box["h"] * width + box["tr"],
+        v + f" {tpl.title} ".center(width) + v,
+        *(v + s.format_map(values).center(width) + v for s in tpl.center),
+        box["ml"] + box["mh"] * width + box["mr"],
+        *(f"{v} {l.ljust(left_width)} {box['col']} {r.ljust(right_width)} {v}" for l, r in zip(left, right)),
+        box["bl"] + box["h"] * width + box["br"],
+    ]
+
+
+def render_text(record, template=None, timestamp=None) -> str:
+    return "\n".join(text_lines(record, template, timestamp))
+
+
+# =========================
+# PDF (dependency-free, Courier, one page per receipt)
+# =========================
+def _pdf_escape(s: str) -> str:
+    return s.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+class PdfWriter:
+    """
+    Minimal PDF 1.4 writer: pages of monospaced text lines (A4 portrait).
+    Each page is written to the binary file f as soon as it is added; only
+    object offsets are kept, and close() writes the page tree and xref.
+    """
+
+    PAGE_W, PAGE_H, MARGIN = 595, 842, 36
+
+    def __init__(self, f, font_size: float = 8.0, leading: float = None):
+        self.f = f
+        self.font_size = font_size
+        self.leading = leading or font_size * 1.25
+        self._pos = 0
+        self._offsets = {}
+        self._kids = []
+        self._write(b"%PDF-1.4\n")
+        self._object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        self._object(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>")
+
+    @property
+    def lines_per_page(self) -> int:
+        return int((self.PAGE_H - 2 * self.MARGIN) // self.leading)
+
+    @property
+    def pages(self) -> int:
+        return len(self._kids)
+
+    def _write(self, data: bytes) -> None:
+        self.f.write(data)
+        self._pos += len(data)
+
+    def _object(self, num: int, body: bytes) -> None:
+        self._offsets[num] = self._pos
+        self._write(b"%d 0 obj\n" % num + body + b"\nendobj\n")
+
+    def add_page(self, lines) -> None:
+        ops = [f"BT /F1 {self.font_size:g} Tf {self.leading:g} TL "
+               f"{self.MARGIN} {self.PAGE_H - self.MARGIN - self.font_size:g} Td"]
+        for line in lines:
+            ops.append(f"({_pdf_escape(line)}) Tj T*")
+        ops.append("ET")
+        content = "\n".join(ops).encode("cp1252", "replace")
+        num = len(self._offsets) + 2          # +1 next free, +1 for the reserved /Pages (2)
+        self._object(num, b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream")
+        self._object(num + 1, b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] "
+                              b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>"
+                              % (self.PAGE_W, self.PAGE_H, num))
+        self._kids.append(b"%d 0 R" % (num + 1))
+
+    def close(self) -> None:
+        self._object(2, b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(self._kids), len(self._kids)))
+        size = len(self._offsets) + 1
+        xref = self._pos
+        self._write(b"xref\n0 %d\n0000000000 65535 f \n" % size)
+        self._write(b"".join(b"%010d 00000 n \n" % self._offsets[n] for n in range(1, size)))
+        self._write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (size, xref))
+
+
+def render_pdf(record, template=None, timestamp=None) -> bytes:
+    buf = io.BytesIO()
+    pdf = PdfWriter(buf)
+    pdf.add_page(text_lines(record, template, timestamp, box=ASCII_BOX))
+    pdf.close()
+    return buf.getvalue()
+
+
+# =========================
+# ESC/POS (thermal, single column)
+# =========================
+ESC_INIT = b"\x1b@"
+ESC_ALIGN_LEFT, ESC_ALIGN_CENTER = b"\x1ba\x00", b"\x1ba\x01"
+ESC_BOLD_ON, ESC_BOLD_OFF = b"\x1bE\x01", b"\x1bE\x00"
+ESC_FEED_CUT = b"\n\n\n\x1dV\x42\x00"       # feed, then partial cut
+
+
+def _wrap(s: str, width: int):
+    while len(s) > width:
+        yield s[:width]
+        s = "  " + s[width:]
+    yield s
+
+
+def render_escpos(record, template=None, timestamp=None, width: int = 42) -> bytes:
+    """Receipt for a thermal printer (width characters per line, cp437 text)."""
+    tpl = _ascii_template(_resolve(template))
+    values = record_values(record, timestamp)
+
+    def enc(s: str) -> bytes:
+        return s.encode("cp437", "replace") + b"\n"
+
+    out = [ESC_INIT, ESC_ALIGN_CENTER, ESC_BOLD_ON, enc(tpl.title), ESC_BOLD_OFF]
+    out += [enc(part) for s in tpl.center for part in _wrap(s.format_map(values), width)]
+    out += [ESC_ALIGN_LEFT, enc("-" * width)]
+    out += [enc(part) for s in tpl.left for part in _wrap(s.format_map(values), width)]
+    out.append(enc("-" * width))
+    out += [enc(part) for s in tpl.right for part in _wrap(s.format_map(values), width)]
+    out.append(ESC_FEED_CUT)
+    return b"".join(out)
+
+
+# =========================
+# Registry
+# =========================
+RENDERERS = {"text": render_text, "pdf": render_pdf, "escpos": render_escpos}
+
+
+def register_renderer(name: str, fn) -> None:
+    """fn(record, template=None, timestamp=None) -> str | bytes"""
+    RENDERERS[name] = fn
+
+
+def render(record, fmt: str = "text", template=None, timestamp=None):
+    try:
+        fn = RENDERERS[fmt]
+    except KeyError:
+        raise ValueError(f"Unknown receipt format {fmt!r}; available: {sorted(RENDERERS)}")
+    return fn(record, template=template, timestamp=timestamp)
+
+
+# =========================
+# Batch spooling (many bookings -> one file)
+# =========================
+SPOOL_SUFFIXES = {"text": ".txt", "pdf": ".pdf", "escpos": ".prn"}
+TEXT_PAGE_BREAK = "\f"
+
+
+def write_receipts(records, f, fmt: str = "text", template=None) -> int:
+    """
+    Stream one receipt per page into the binary file f. Text receipts are
+    separated by form feeds, ESC/POS ones by their paper cut. Returns the count.
+    """
+    n = 0
+    if fmt == "pdf":
+        pdf = PdfWriter(f)
+        for record in records:
+            pdf.add_page(text_lines(record, template, box=ASCII_BOX))
+            n += 1
+        pdf.close()
+        return n
+    for record in records:
+        out = render(record, fmt, template)
+        if isinstance(out, str):
+            out = ((TEXT_PAGE_BREAK if n else "") + out + "\n").encode("utf-8")
+        f.write(out)
+        n += 1
+    return n
+
+
+# (heading, width, value) for each manifest column
+MANIFEST_COLUMNS = (
+    ("#", 5, None),
+    ("Receipt", 9, "receipt_no"),
+    ("Token", 6, "token_no"),
+    ("Receiver", 20, "receiver_name"),
+    ("City", 16, "city"),
+    ("State", 14, "state"),
+    ("PIN", 6, "receiver_pincode"),
+    ("Kg", 7, "weight"),
+    ("Price", 8, "price"),
+)
+
+
+def _cell(value, width: int, right: bool = False) -> str:
+    s = "" if value is None else str(value)
+    s = s[:width]
+    return s.rjust(width) if right else s.ljust(width)
+
+
+def _manifest_row(n: int, values: dict) -> str:
+    return " ".join(
+        _cell(n if key is None else values.get(key), width, right=key in (None, "weight", "price"))
+        for _, width, key in MANIFEST_COLUMNS
+    )
+
+
+def _amount(value, scale: int):
+    """Text price/weight -> paise/grams (0 when unparseable); used when the numeric columns are absent."""
+    try:
+        return int(round(float(str(value).replace(",", "")) * scale))
+    except (TypeError, ValueError):
+        return 0
+
+
+def manifest_pages(records, title: str, rows_per_page: int = 60):
+    """
+    Yield pages (lists of lines) of a manifest: header on every page, one
+    line per booking, totals on the last page.
+    """
+    heading = " ".join(_cell(h, w, right=k in (None, "weight", "price")) for h, w, k in MANIFEST_COLUMNS)
+    rule = "-" * len(heading)
+    count = paise = grams = 0
+    page_no = 1
+    page = None
+    for record in records:
+        if page is None:
+            page = [f"{title}    (page {page_no})", "", heading, rule]
+        values = record_values(record, timestamp="")
+        get = _getter(record)
+        p, g = get("price_paise"), get("weight_grams")
+        count += 1
+        paise += p if isinstance(p, int) else _amount(values["price"], 100)
+        grams += g if isinstance(g, int) else _amount(values["weight"], 1000)
+        page.append(_manifest_row(count, values))
+        if len(page) - 4 >= rows_per_page:
+            yield page
+            page, page_no = None, page_no + 1
+    if page is None:
+        page = [f"{title}    (page {page_no})", "", heading, rule]
+    page += [rule, f"Consignments: {count}    Weight: {grams / 1000:,.3f} kg    "
+                   f"Amount: Rs.{paise / 100:,.2f}"]
+    yield page
+
+
+def write_manifest(records, f, title: str, fmt: str = "pdf") -> int:
+    """Stream a manifest sheet ("pdf" or "text") into the binary file f. Returns pages written."""
+    if fmt == "pdf":
+        pdf = PdfWriter(f)
+        for page in manifest_pages(records, title, rows_per_page=pdf.lines_per_page - 6):
+            pdf.add_page(page)
+        pdf.close()
+        return pdf.pages
+    if fmt != "text":
+        raise ValueError(f"Manifest format must be 'pdf' or 'text', not {fmt!r}")
+    pages = 0
+    for page in manifest_pages(records, title):
+        f.write(((TEXT_PAGE_BREAK if pages else "") + "\n".join(page) + "\n").encode("utf-8"))
+        pages += 1
+    return pages
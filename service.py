@@ -0,0 +1,317 @@
+"""
+Headless CourierX service: booking insert, PIN lookup, receipt allocation and
+report queries over a local HTTP/JSON API, for kiosks and a web front desk.
+
+No Tk, no license overlay; it shares courierx.db (and the PIN cache) with
+the desktop app. Requests are handled by a fixed pool of worker threads,
+each using a pooled SQLAlchemy connection.
+
+    python service.py --db courierx.db --pincodes India_pincode.csv [--port 8765] [--workers 16]
+
+    GET  /health
+    GET  /pin/<pin>                      -> {pin, district, state, localities}
+    POST /receipts                       -> {receipt_no}
+    POST /bookings   {form fields}       -> 201 {receipt_no}; city/state
+                                            filled from the PIN, receipt_no
+                                            allocated when missing
+    GET  /bookings?days=30&limit=200&before=<cursor>   newest first (keyset);
+                                            days <= MAX_DAYS, else 400
+    GET  /bookings?q=<text>              full-text search, best first
+    GET  /bookings/<id>
+    GET  /reports/summary?from=YYYY-MM-DD&to=YYYY-MM-DD&top=10
+"""
+import argparse
+import json
+import logging
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import db
+from db import CourierForm
+
+BOOKING_COLUMNS = ("id", "created_at", "updated_at") + db.FORM_FIELDS
+MAX_BODY = 64 * 1024
+MAX_PAGE = 1000
+MAX_DAYS = 3660
+
+
+class ApiError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    raise TypeError(f"{type(value).__name__} is not JSON serialisable")
+
+
+def _int_arg(params, name, default, lo=1, hi=None):
+    raw = params.get(name, [None])[0]
+    if raw in (None, ""):
+        return default
+    try:
+        value = int(raw)
+    except ValueError:
+        raise ApiError(400, f"{name} must be an integer")
+    return max(lo, min(value, hi)) if hi else max(lo, value)
+
+
+# =========================
+# Request logic (params are parse_qs dicts)
+# =========================
+class CourierService:
+    """Request logic, kept apart from the HTTP plumbing so it can be called directly."""
+
+    def __init__(self, pin_index=None):
+        self.pin_index = pin_index
+
+    def lookup_pin(self, pin: str) -> dict:
+        if not (len(pin) == 6 and pin.isdigit()):
+            raise ApiError(400, "PIN must be 6 digits")
+        if self.pin_index is None:
+            raise ApiError(503, "PIN data not loaded (start with --pincodes)")
+        dist, state = self.pin_index.lookup(pin)
+        if dist is None:
+            raise ApiError(404, f"PIN {pin} not found")
+        return {"pin": pin, "district": dist, "state": state,
+                "localities": self.pin_index.localities(pin)}
+
+    def allocate_receipt(self) -> dict:
+        return {"receipt_no": db.allocate_receipt_no()}
+
+    def create_booking(self, body: dict) -> dict:
+        if not isinstance(body, dict):
+            raise ApiError(400, "Body must be a JSON object")
+        data = {f: str(body.get(f) or "").strip() for f in db.FORM_FIELDS}
+        if self.pin_index is not None and data["receiver_pincode"] and not (data["city"] and data["state"]):
+            dist, state = self.pin_index.lookup(data["receiver_pincode"])
+            data["city"] = data["city"] or dist or ""
+            data["state"] = data["state"] or state or ""
+        # validate before allocating, so rejected requests don't use up numbers
+        blank = not data["receipt_no"]
+        err = db.validate_form_data({**data, "receipt_no": "-"} if blank else data)
+        if err:
+            raise ApiError(400, err)
+        if blank:
+            data["receipt_no"] = db.allocate_receipt_no()
+        ok, err = db.insert_form_row_sqlalchemy(data)
+        if not ok:
+            if "UNIQUE" in (err or ""):
+                raise ApiError(409, f"Receipt {data['receipt_no']} already exists")
+            raise ApiError(500, f"Failed to save: {err or 'unknown error'}")
+        return {"receipt_no": data["receipt_no"]}
+
+    def get_booking(self, booking_id: int) -> dict:
+        session = db.get_session()
+        try:
+            row = (session.query(*[getattr(CourierForm, c) for c in BOOKING_COLUMNS])
+                          .filter(CourierForm.id == booking_id).first())
+        finally:
+            session.close()
+        if row is None:
+            raise ApiError(404, f"Booking {booking_id} not found")
+        return dict(zip(BOOKING_COLUMNS, row))
+
+    def list_bookings(self, params) -> dict:
+        limit = _int_arg(params, "limit", db.REPORT_PAGE_SIZE, hi=MAX_PAGE)
+        q = (params.get("q", [""])[0]).strip()
+        if q:
+            ids = db.search_booking_ids(q, limit=limit)
+            session = db.get_session()
+            try:
+                rows = (session.query(*[getattr(CourierForm, c) for c in BOOKING_COLUMNS])
+                               .filter(CourierForm.id.in_(ids)).all()) if ids else []
+            finally:
+                session.close()
+            rank = {i: n for n, i in enumerate(ids)}
+            rows.sort(key=lambda r: rank[r.id])
+            return {"bookings": [dict(zip(BOOKING_COLUMNS, r)) for r in rows], "next": None}
+
+        days = _int_arg(params, "days", db.RECENT_DAYS)
+        if days > MAX_DAYS:
+            raise ApiError(400, f"days must be at most {MAX_DAYS}")
+        cursor = None
+        before = params.get("before", [""])[0]
+        if before:
+            try:
+                ts, last_id = before.rsplit("~", 1)
+                cursor = datetime.strptime(ts, "%Y-%m-%d %H:%M:%S.%f"), int(last_id)
+            except ValueError:
+                raise ApiError(400, "Bad cursor")
+        rows = db.recent_bookings_page(cursor, limit, days, BOOKING_COLUMNS)
+        nxt = None
+        if len(rows) == limit:
+            nxt = f"{rows[-1].created_at:%Y-%m-%d %H:%M:%S.%f}~{rows[-1].id}"
+        return {"bookings": [dict(zip(BOOKING_COLUMNS, r)) for r in rows], "next": nxt}
+
+    def summary(self, params) -> dict:
+        first_day, today = db.recent_day_range()
+        start = params.get("from", [first_day.isoformat()])[0]
+        end = params.get("to", [today.isoformat()])[0]
+        for d in (start, end):
+            try:
+                datetime.strptime(d, "%Y-%m-%d")
+            except ValueError:
+                raise ApiError(400, "Dates must be YYYY-MM-DD")
+        s = db.dashboard_summary(start, end, top_n=_int_arg(params, "top", 10, hi=100))
+        return {
+            "from": start, "to": end,
+            "bookings": s["bookings"], "revenue_paise": s["revenue_paise"], "weight_grams": s["weight_grams"],
+            "daily": [{"day": d, "bookings": b, "revenue_paise": r, "weight_grams": w}
+                      for d, b, r, w in s["daily"]],
+            "top_states": [{"state": st, "bookings": b, "revenue_paise": r} for st, b, r in s["top_states"]],
+            "top_cities": [{"city": c, "state": st, "bookings": b, "revenue_paise": r}
+                           for c, st, b, r in s["top_cities"]],
+        }
+
+
+# =========================
+# HTTP plumbing
+# =========================
+_ROUTES = [
+    ("GET", re.compile(r"^/health$"), lambda svc, m, p, b: {"ok": True}),
+    ("GET", re.compile(r"^/pin/(\w+)$"), lambda svc, m, p, b: svc.lookup_pin(m.group(1))),
+    ("POST", re.compile(r"^/receipts$"), lambda svc, m, p, b: svc.allocate_receipt()),
+    ("POST", re.compile(r"^/bookings$"), lambda svc, m, p, b: (201, svc.create_booking(b))),
+    ("GET", re.compile(r"^/bookings$"), lambda svc, m, p, b: svc.list_bookings(p)),
+    ("GET", re.compile(r"^/bookings/(\d+)$"), lambda svc, m, p, b: svc.get_booking(int(m.group(1)))),
+    ("GET", re.compile(r"^/reports/summary$"), lambda svc, m, p, b: svc.summary(p)),
+]
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"      # keep-alive, so clients reuse connections
+    timeout = 15                       # idle keep-alive connections give their worker back
+    server_version = "CourierX"
+    disable_nagle_algorithm = True     # headers and body go out as separate writes
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def _dispatch(self, method):
+        url = urlsplit(self.path)
+        try:
+            body = None
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+            except ValueError:
+                raise ApiError(400, "Bad Content-Length")
+            if length < 0:
+                raise ApiError(400, "Bad Content-Length")
+            if length > MAX_BODY:
+                raise ApiError(413, "Request body too large")
+            if length:
+                try:
+                    body = json.loads(self.rfile.read(length))
+                except ValueError:
+                    raise ApiError(400, "Body is not valid JSON")
+            path_matched = False
+            for m_name, pattern, fn in _ROUTES:
+                m = pattern.match(url.path)
+                if not m:
+                    continue
+                path_matched = True
+                if m_name == method:
+                    result = fn(self.server.service, m, parse_qs(url.query), body)
+                    status, payload = result if isinstance(result, tuple) else (200, result)
+                    self._send(status, payload)
+                    return
+            raise ApiError(405 if path_matched else 404, "Method not allowed" if path_matched else "Not found")
+        except ApiError as e:
+            self._send(e.status, {"error": str(e)})
+        except Exception as e:
+            logging.exception("%s %s failed: %s", method, self.path, e)
+            self._send(500, {"error": "Internal error"})
+
+    def _send(self, status, payload):
+        data = json.dumps(payload, default=_json_default, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, fmt, *args):
+        logging.debug("%s - " + fmt, self.client_address[0], *args)
+
+
+class ServiceHTTPServer(HTTPServer):
+    """HTTPServer whose connections are handled by a bounded thread pool."""
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, address, service: CourierService, workers: int = 16):
+        super().__init__(address, ApiHandler)
+        self.service = service
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="api")
+
+    def process_request(self, request, client_address):
+        self._pool.submit(self._handle, request, client_address)
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self._pool.shutdown(wait=True)
+
+
+def load_pin_index(csv_path: str):
+    """PinIndex from the desktop app's cache next to the CSV, else from the CSV."""
+    from pincodes import load_cache, load_csv, save_cache
+    cache_path = os.path.splitext(csv_path)[0] + ".cache"
+    cached = load_cache(cache_path, csv_path)
+    if cached is not None:
+        return cached[0]
+    index, columns, _rows = load_csv(csv_path)
+    save_cache(index, cache_path, csv_path, columns)
+    return index
+
+
+def make_server(db_path: str, host: str = "127.0.0.1", port: int = 8765, workers: int = 16,
+                pin_index=None, profile: str = db.DEFAULT_SQLITE_PROFILE) -> ServiceHTTPServer:
+    db.init_db(f"sqlite:///{os.path.abspath(db_path)}", profile, pool_size=workers)
+    return ServiceHTTPServer((host, port), CourierService(pin_index), workers)
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="CourierX headless HTTP/JSON service.")
+    ap.add_argument("--db", default="courierx.db", help="courierx.db to serve")
+    ap.add_argument("--pincodes", help="India_pincode.csv for /pin and city/state autofill")
+    ap.add_argument("--host", default="127.0.0.1", help="bind address (default: local only)")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--workers", type=int, default=16, help="request threads (and DB connections)")
+    ap.add_argument("--profile", default=os.environ.get("COURIERX_DB_PROFILE", db.DEFAULT_SQLITE_PROFILE))
+    args = ap.parse_args(argv)
+
+    pin_index = load_pin_index(args.pincodes) if args.pincodes else None
+    server = make_server(args.db, args.host, args.port, args.workers, pin_index, args.profile)
+    logging.info("CourierX service on http://%s:%d (%d workers)", args.host, server.server_port, args.workers)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        db.release_receipt_numbers()
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+    raise SystemExit(main())
@@ -0,0 +1,467 @@
+"""
+Multi-counter sync: merge bookings from many branch courierx.db files into
+one central store (SQLite, or any SQLAlchemy URL such as Postgres).
+
+Only deltas move. The central store keeps per-branch high-water marks: rows
+with id > last_id are new, rows with id <= last_id but (updated_at, id) past
+(last_updated_at, last_updated_id) were edited since the last run. Edited
+rows are read in (updated_at, id) order, so a run that stops part-way resumes
+after the last batch it applied. Every central row is tagged with its branch
+and source id, so re-running a sync is idempotent.
+
+Receipt numbers are per counter (every branch has an RX00001), so the
+central key is "<branch>:<receipt_no>"; if a branch has stored the same
+receipt twice, the later row gets "<branch>:<receipt_no>:<source id>" and
+is counted as a collision.
+
+pull reads branch DB files on a local disk only. courierx.db runs in WAL
+mode, whose shared-memory index does not work across machines, so opening a
+counter's live database over an SMB share (even read-only) can read torn
+pages or block its saves; UNC paths and mapped network drives are refused.
+To move data between machines, either:
+
+  - export a compressed delta file (zlib'd batches) at the branch and load it
+    at head office, or
+  - take a self-contained snapshot at the branch (SQLite backup API; the copy
+    is switched out of WAL), copy that file over, and pull it locally.
+
+    python sync.py marks --central central.db north            (high-water marks as JSON)
+    python sync.py export --branch north --db courierx.db --marks marks.json -o north.cxsync
+    python sync.py load --central central.db north.cxsync
+
+    python sync.py snapshot --db courierx.db -o north-snapshot.db      (at the branch)
+    python sync.py pull --central central.db  north=D:/inbox/north-snapshot.db  south=D:/south.db
+"""
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import struct
+import sys
+import time
+import zlib
+from datetime import datetime
+
+from sqlalchemy import (Column, DateTime, Integer, MetaData, String, Table, UniqueConstraint,
+                        bindparam, create_engine, func, inspect, select, text, tuple_)
+
+import db
+
+metadata = MetaData()
+
+central_bookings = Table(
+    "central_bookings", metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("branch_id", String(32), nullable=False),
+    Column("source_id", Integer, nullable=False),
+    Column("receipt_key", String(80), nullable=False),
+    *[Column(f, String(256)) for f in db.FORM_FIELDS],
+    Column("weight_grams", Integer),
+    Column("price_paise", Integer),
+    Column("created_at", DateTime, index=True),
+    Column("updated_at", DateTime),
+    Column("synced_at", DateTime),
+    UniqueConstraint("branch_id", "source_id", name="ux_central_branch_source"),
+    UniqueConstraint("receipt_key", name="ux_central_receipt_key"),
+)
+
+sync_state = Table(
+    "sync_state", metadata,
+    Column("branch_id", String(32), primary_key=True),
+    Column("last_id", Integer, nullable=False, default=0),
+    Column("last_updated_at", DateTime),
+    Column("last_updated_id", Integer),      # tie-break for rows sharing last_updated_at
+    Column("last_sync_at", DateTime),
+    Column("rows_total", Integer, nullable=False, default=0),
+)
+
+SOURCE_COLUMNS = ("id",) + db.FORM_FIELDS + ("weight_grams", "price_paise", "created_at", "updated_at")
+BATCH_SIZE = 5000
+FILE_MAGIC = b"CXSYNC1\n"
+
+
+def central_engine(url: str):
+    if "://" not in url:
+        url = f"sqlite:///{os.path.abspath(url)}"
+    engine = create_engine(url)
+    if engine.dialect.name == "sqlite":
+        db._apply_sqlite_profile(engine, db.DEFAULT_SQLITE_PROFILE)
+    metadata.create_all(engine)
+    if "last_updated_id" not in {c["name"] for c in inspect(engine).get_columns("sync_state")}:
+        with engine.begin() as conn:        # central store from before the (updated_at, id) marks
+            conn.execute(text("ALTER TABLE sync_state ADD COLUMN last_updated_id INTEGER"))
+    return engine
+
+
+def get_marks(engine, branch_id: str):
+    """(last_id, last_updated_at, last_updated_id) for a branch; (0, None, None) before its first sync."""
+    s = sync_state.c
+    with engine.connect() as conn:
+        row = conn.execute(select(s.last_id, s.last_updated_at, s.last_updated_id)
+                           .where(s.branch_id == branch_id)).first()
+    return tuple(row) if row else (0, None, None)
+
+
+# =========================
+# Reading deltas from a branch DB
+# =========================
+def is_network_path(path: str) -> bool:
+    """UNC (\\\\host\\share, //host/share) paths, and mapped network drives on Windows."""
+    p = str(path).replace("\\", "/")
+    if p.startswith(("//?/", "//./")):         # Win32 device/long-path prefix
+        return p[4:].upper().startswith("UNC/")
+    if p.startswith("//"):
+        return True
+    if os.name == "nt":
+        import ctypes
+        drive = os.path.splitdrive(os.path.abspath(path))[0]
+        if drive and ctypes.windll.kernel32.GetDriveTypeW(drive + "\\") == 4:     # DRIVE_REMOTE
+            return True
+    return False
+
+
+def _open_branch(path: str):
+    """Read-only connection to a local branch courierx.db (never writes to the counter's file)."""
+    if is_network_path(path):
+        raise ValueError(f"{path} is on a network share; SQLite (WAL) databases must not be opened "
+                         "across machines. Run 'sync.py snapshot' or 'sync.py export' at the branch "
+                         "and copy the file here instead.")
+    uri = "file:" + os.path.abspath(path).replace("\\", "/") + "?mode=ro"
+    return create_engine("sqlite://", creator=lambda: sqlite3.connect(uri, uri=True))
+
+
+def iter_deltas(branch_engine, last_id: int, last_updated_at, batch_size: int = BATCH_SIZE,
+                last_updated_id=None):
+    """
+    Yield lists of row dicts (SOURCE_COLUMNS), batch_size per list: first rows
+    edited since (last_updated_at, last_updated_id) in (updated_at, id) order,
+    then new rows (id > last_id), oldest id first.
+    """
+    t = db.CourierForm.__table__
+    with branch_engine.connect() as conn:
+        present = {r[1] for r in conn.exec_driver_sql("PRAGMA table_info(courier_forms)")}
+        cols = [t.c[c] for c in SOURCE_COLUMNS if c in present]
+        names = [c.name for c in cols]
+
+        def batches(where, key):
+            cursor = None
+            while True:
+                q = select(*cols).where(where)
+                if cursor is not None:
+                    q = q.where(tuple_(*key) > tuple_(*cursor))
+                rows = conn.execute(q.order_by(*key).limit(batch_size)).all()
+                if not rows:
+                    return
+                out = []
+                for r in rows:
+                    d = dict(zip(names, r))
+                    if "price_paise" not in d:       # branch not migrated yet
+                        d["price_paise"] = _try(db.parse_price_paise, d.get("price"))
+                        d["weight_grams"] = _try(db.parse_weight_grams, d.get("weight"))
+                    out.append(d)
+                yield out
+                cursor = tuple(getattr(rows[-1], c.name) for c in key)
+
+        if last_updated_at is not None:
+            since = (t.c.updated_at > last_updated_at if last_updated_id is None else
+                     tuple_(t.c.updated_at, t.c.id) > tuple_(last_updated_at, last_updated_id))
+            yield from batches((t.c.id <= last_id) & since, (t.c.updated_at, t.c.id))
+        yield from batches(t.c.id > last_id, (t.c.id,))
+
+
+def _try(fn, value):
+    try:
+        return fn(value)
+    except ValueError:
+        return None
+
+
+# =========================
+# Applying deltas centrally
+# =========================
+def apply_batch(engine, branch_id: str, rows) -> dict:
+    """
+    Upsert one batch from branch_id and advance its marks, in one transaction.
+    Returns {"inserted", "updated", "collisions"}.
+    """
+    stats = {"inserted": 0, "updated": 0, "collisions": 0}
+    if not rows:
+        return stats
+    c = central_bookings.c
+    now = datetime.now()
+    with engine.begin() as conn:
+        existing = {}
+        ids = [r["id"] for r in rows]
+        for i in range(0, len(ids), 500):
+            existing.update((sid, (cid, upd, key)) for sid, cid, upd, key in conn.execute(
+                select(c.source_id, c.id, c.updated_at, c.receipt_key)
+                .where(c.branch_id == branch_id, c.source_id.in_(ids[i:i + 500]))))
+
+        new, changed, rekey = [], [], []
+        for r in rows:
+            rec = {f: r.get(f) for f in db.FORM_FIELDS}
+            rec.update(branch_id=branch_id, source_id=r["id"], weight_grams=r.get("weight_grams"),
+                       price_paise=r.get("price_paise"), created_at=r.get("created_at"),
+                       updated_at=r.get("updated_at"), synced_at=now)
+            base_key = f"{branch_id}:{r.get('receipt_no') or ''}"
+            if r["id"] in existing:
+                central_id, stored_upd, stored_key = existing[r["id"]]
+                if stored_upd is None or (rec["updated_at"] and rec["updated_at"] > stored_upd):
+                    rec["id"] = central_id
+                    if stored_key in (base_key, f"{base_key}:{r['id']}"):
+                        rec["receipt_key"] = stored_key
+                    else:                       # receipt_no was edited at the branch
+                        rec["receipt_key"] = base_key
+                        rekey.append(rec)
+                    changed.append(rec)
+            else:
+                rec["receipt_key"] = base_key
+                new.append(rec)
+        stats["collisions"] = _assign_receipt_keys(conn, new + rekey)
+
+        if new:
+            conn.execute(central_bookings.insert(), new)
+            stats["inserted"] = len(new)
+
+        if changed:
+            fields = db.FORM_FIELDS + ("receipt_key", "weight_grams", "price_paise", "created_at",
+                                       "updated_at", "synced_at")
+            stmt = (central_bookings.update().where(c.id == bindparam("b_id"))
+                    .values({f: bindparam(f"b_{f}") for f in fields}))
+            conn.execute(stmt, [{f"b_{k}": v for k, v in rec.items()} for rec in changed])
+            stats["updated"] = len(changed)
+
+        last_id = max(r["id"] for r in rows)
+        last_upd = max(((r["updated_at"], r["id"]) for r in rows if r.get("updated_at")), default=None)
+        _advance_marks(conn, branch_id, last_id, last_upd, len(new), now)
+    return stats
+
+
+def _assign_receipt_keys(conn, recs) -> int:
+    """
+    Give each rec a free receipt_key: its "<branch>:<receipt_no>" unless that is
+    taken (or the receipt is blank), then "...:<source id>". Returns collisions.
+    """
+    c = central_bookings.c
+    keys = list({rec["receipt_key"] for rec in recs})
+    taken = set()
+    for i in range(0, len(keys), 500):
+        taken.update(k for (k,) in conn.execute(
+            select(c.receipt_key).where(c.receipt_key.in_(keys[i:i + 500]))))
+    collisions = 0
+    for rec in recs:
+        if rec["receipt_key"] in taken or not rec["receipt_no"]:
+            rec["receipt_key"] = f"{rec['receipt_key']}:{rec['source_id']}"
+            collisions += bool(rec["receipt_no"])
+        taken.add(rec["receipt_key"])
+    return collisions
+
+
+def _advance_marks(conn, branch_id, last_id, last_updated, added, now):
+    """last_updated: the (updated_at, id) of the latest row applied, or None."""
+    s = sync_state.c
+    row = conn.execute(select(s.last_id, s.last_updated_at, s.last_updated_id)
+                       .where(s.branch_id == branch_id)).first()
+    upd_at, upd_id = last_updated or (None, None)
+    if row is None:
+        conn.execute(sync_state.insert().values(branch_id=branch_id, last_id=last_id,
+                                                last_updated_at=upd_at, last_updated_id=upd_id,
+                                                last_sync_at=now, rows_total=added))
+        return
+    values = {"last_id": max(row[0], last_id), "last_sync_at": now,
+              "rows_total": s.rows_total + added}
+    if last_updated is not None and (row[1] is None or last_updated > (row[1], row[2] or 0)):
+        values.update(last_updated_at=upd_at, last_updated_id=upd_id)
+    conn.execute(sync_state.update().where(s.branch_id == branch_id).values(**values))
+
+
+def pull_branch(engine, branch_id: str, path: str, batch_size: int = BATCH_SIZE) -> dict:
+    """Pull one branch DB directly; returns totals for the run."""
+    last_id, last_upd, last_upd_id = get_marks(engine, branch_id)
+    branch = _open_branch(path)
+    totals = {"inserted": 0, "updated": 0, "collisions": 0}
+    try:
+        for rows in iter_deltas(branch, last_id, last_upd, batch_size, last_upd_id):
+            for k, v in apply_batch(engine, branch_id, rows).items():
+                totals[k] += v
+    finally:
+        branch.dispose()
+    return totals
+
+
+def snapshot_db(path: str, out_path: str) -> int:
+    """
+    Consistent copy of a local courierx.db via the SQLite backup API (safe
+    while the app is saving), switched to a rollback journal so the copy is a
+    single file that can be moved to head office. Returns its size in bytes.
+    """
+    if is_network_path(path):
+        raise ValueError(f"Take the snapshot on the machine that holds {path}")
+    tmp = out_path + ".tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    src = sqlite3.connect(path, timeout=30)
+    try:
+        dst = sqlite3.connect(tmp)
+        try:
+            src.backup(dst)
+            dst.execute("PRAGMA journal_mode=DELETE")
+        finally:
+            dst.close()
+    finally:
+        src.close()
+    os.replace(tmp, out_path)
+    return os.path.getsize(out_path)
+
+
+# =========================
+# Compressed delta files (offline branches)
+# =========================
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(type(value).__name__)
+
+
+def export_deltas(path: str, branch_id: str, out_path: str, last_id: int = 0, last_updated_at=None,
+                  batch_size: int = BATCH_SIZE, last_updated_id=None) -> int:
+    """Write the branch's deltas as length-prefixed zlib'd JSON batches. Returns rows written."""
+    branch = _open_branch(path)
+    n = 0
+    try:
+        with open(out_path, "wb") as f:
+            f.write(FILE_MAGIC)
+            f.write(json.dumps({"branch": branch_id}).encode() + b"\n")
+            for rows in iter_deltas(branch, last_id, last_updated_at, batch_size, last_updated_id):
+                blob = zlib.compress(json.dumps(rows, default=_json_default).encode("utf-8"), 6)
+                f.write(struct.pack(">I", len(blob)))
+                f.write(blob)
+                n += len(rows)
+    finally:
+        branch.dispose()
+    return n
+
+
+def load_deltas(engine, in_path: str) -> dict:
+    """Apply a file written by export_deltas; re-loading the same file is harmless."""
+    totals = {"inserted": 0, "updated": 0, "collisions": 0}
+    with open(in_path, "rb") as f:
+        if f.read(len(FILE_MAGIC)) != FILE_MAGIC:
+            raise ValueError(f"{in_path} is not a CourierX sync file")
+        branch_id = json.loads(f.readline())["branch"]
+        while True:
+            head = f.read(4)
+            if not head:
+                break
+            rows = json.loads(zlib.decompress(f.read(struct.unpack(">I", head)[0])))
+            for r in rows:
+                for k in ("created_at", "updated_at"):
+                    if r.get(k):
+                        r[k] = datetime.fromisoformat(r[k])
+            for k, v in apply_batch(engine, branch_id, rows).items():
+                totals[k] += v
+    totals["branch"] = branch_id
+    return totals
+
+
+# =========================
+# CLI
+# =========================
+def _parse_branch(spec: str):
+    """'name=path' or just a path (branch id = its folder name)."""
+    if "=" in spec and not os.path.exists(spec):
+        name, path = spec.split("=", 1)
+    else:
+        path = spec
+        name = os.path.basename(os.path.dirname(os.path.abspath(spec))) or "branch"
+    return name.strip(), path
+
+
+def _report(branch_id, totals, seconds):
+    print(f"{branch_id:<16} +{totals['inserted']:>7} new  {totals['updated']:>6} updated  "
+          f"{totals['collisions']:>4} receipt collision(s)  {seconds:6.2f}s")
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Merge branch courierx.db files into a central store.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("pull", help="pull deltas from branch DB files or snapshots on a local disk")
+    p.add_argument("--central", required=True, help="central DB path or SQLAlchemy URL")
+    p.add_argument("branches", nargs="+", help="name=path/to/courierx.db (or just the path)")
+    p.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+
+    p = sub.add_parser("marks", help="print high-water marks for export on an offline branch")
+    p.add_argument("--central", required=True)
+    p.add_argument("branch")
+
+    p = sub.add_parser("export", help="write a compressed delta file at a branch")
+    p.add_argument("--branch", required=True)
+    p.add_argument("--db", default="courierx.db")
+    p.add_argument("--marks", help="JSON from 'sync.py marks' (default: everything)")
+    p.add_argument("-o", "--out", required=True)
+
+    p = sub.add_parser("snapshot", help="copy a branch DB into one file for transfer")
+    p.add_argument("--db", default="courierx.db")
+    p.add_argument("-o", "--out", required=True)
+
+    p = sub.add_parser("load", help="apply delta files at head office")
+    p.add_argument("--central", required=True)
+    p.add_argument("files", nargs="+")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "export":
+        last_id, last_upd, last_upd_id = 0, None, None
+        if args.marks:
+            with open(args.marks, "r", encoding="utf-8") as f:
+                m = json.load(f)
+            last_id = m.get("last_id", 0)
+            last_upd = datetime.fromisoformat(m["last_updated_at"]) if m.get("last_updated_at") else None
+            last_upd_id = m.get("last_updated_id")
+        n = export_deltas(args.db, args.branch, args.out, last_id, last_upd, last_updated_id=last_upd_id)
+        print(f"{n} row(s) written to {args.out} ({os.path.getsize(args.out):,} bytes)")
+        return 0
+    if args.cmd == "snapshot":
+        print(f"Snapshot of {args.db} written to {args.out} ({snapshot_db(args.db, args.out):,} bytes)")
+        return 0
+
+    engine = central_engine(args.central)
+    if args.cmd == "marks":
+        last_id, last_upd, last_upd_id = get_marks(engine, args.branch)
+        print(json.dumps({"branch": args.branch, "last_id": last_id,
+                          "last_updated_at": last_upd.isoformat() if last_upd else None,
+                          "last_updated_id": last_upd_id}))
+        return 0
+
+    failed = 0
+    t_all = time.perf_counter()
+    if args.cmd == "pull":
+        for spec in args.branches:
+            branch_id, path = _parse_branch(spec)
+            t0 = time.perf_counter()
+            try:
+                _report(branch_id, pull_branch(engine, branch_id, path, args.batch_size),
+                        time.perf_counter() - t0)
+            except Exception as e:
+                failed += 1
+                logging.error("Sync of %s (%s) failed: %s", branch_id, path, e)
+    else:
+        for path in args.files:
+            t0 = time.perf_counter()
+            try:
+                totals = load_deltas(engine, path)
+                _report(totals["branch"], totals, time.perf_counter() - t0)
+            except Exception as e:
+                failed += 1
+                logging.error("Loading %s failed: %s", path, e)
+    with engine.connect() as conn:
+        total = conn.execute(select(func.count()).select_from(central_bookings)).scalar()
+    print(f"central: {total:,} booking(s); took {time.perf_counter() - t_all:.2f}s"
+          + (f"; {failed} failed" if failed else ""))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+    sys.exit(main())
@@ -0,0 +1,38 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+
+
+@pytest.fixture
+def fresh_db(tmp_path):
+    """An initialised, empty courierx.db in tmp_path; the module globals are reset afterwards."""
+    path = tmp_path / "courierx.db"
+    engine = db.init_db(f"sqlite:///{path}")
+    yield path
+    db.SessionLocal.remove()
+    engine.dispose()
+    db._receipt_block.clear()
+    db._receipt_range[:] = [0, 0]
+
+
+def _booking(receipt_no, **overrides):
+    data = {
+        "receipt_no": receipt_no, "token_no": "T1", "weight": "1.25", "price": "120.50",
+        "sender_name": "Asha Rao", "sender_address": "12 MG Road", "sender_pincode": "560001",
+        "sender_phone": "9876543210", "receiver_name": "Vikram Singh", "house": "4",
+        "street": "Station Road", "locality": "Civil Lines", "city": "Jaipur", "state": "Rajasthan",
+        "receiver_pincode": "302006", "receiver_phone": "9123456780",
+    }
+    data.update(overrides)
+    return data
+
+
+@pytest.fixture
+def booking():
+    """booking(receipt_no, **overrides) -> a form dict that passes validate_form_data."""
+    return _booking
@@ -0,0 +1,26 @@
+import os
+from datetime import datetime
+
+import batchprint
+import db
+
+
+def test_empty_day_manifest_reports_no_bookings(fresh_db):
+    start, end = batchprint.day_range(datetime(2020, 1, 1))
+    path, pages, n = batchprint.spool_manifest(batchprint.iter_forms(start=start, end=end), "Empty day", "text")
+    os.remove(path)
+    assert pages == 1 and n == 0      # a header-only page is still rendered; callers skip on n
+
+
+def test_manifest_counts_bookings_and_reports_progress(fresh_db, booking):
+    for i in range(1, 4):
+        db.insert_form_row_sqlalchemy(booking(f"RX{i:05d}"))
+    seen = []
+    start, end = batchprint.day_range(datetime.now())
+    path, pages, n = batchprint.spool_manifest(batchprint.iter_forms(start=start, end=end), "Today", "text",
+                                               progress=seen.append)
+    with open(path, "rb") as f:
+        sheet = f.read().decode("utf-8")
+    os.remove(path)
+    assert (pages, n, seen) == (1, 3, [3])
+    assert "RX00003" in sheet
@@ -0,0 +1,63 @@
+import csv
+from datetime import datetime
+
+import db
+import importer
+
+
+def _write_csv(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=list(rows[0]))
+        w.writeheader()
+        w.writerows(rows)
+
+
+def _read_errors(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def _stored(column):
+    session = db.get_session()
+    try:
+        return sorted(r for (r,) in session.query(column))
+    finally:
+        session.close()
+
+
+def test_invalid_rows_do_not_use_up_receipt_numbers(fresh_db, tmp_path, booking):
+    rows = [booking(""), booking("", receiver_phone="12"), booking("", sender_name=""), booking("")]
+    path = tmp_path / "bookings.csv"
+    _write_csv(path, rows)
+
+    inserted, failed, errors_path = importer.import_bookings(str(path))
+
+    assert inserted == 2 and failed == 2
+    assert [e["receipt_no"] for e in _read_errors(errors_path)] == ["", ""]
+    assert _stored(db.CourierForm.receipt_no) == ["RX00001", "RX00002"]
+
+
+def test_unparseable_booking_dates_fail_the_row(fresh_db, tmp_path, booking):
+    rows = [booking("RX00001", created_at="05-01-2024"), booking("RX00002", created_at="05.01.2024"),
+            booking("RX00003", created_at="2024/01/05"), booking("RX00004", created_at="")]
+    path = tmp_path / "bookings.csv"
+    _write_csv(path, rows)
+
+    inserted, failed, errors_path = importer.import_bookings(str(path))
+
+    assert (inserted, failed) == (2, 2)
+    errors = _read_errors(errors_path)
+    assert [e["receipt_no"] for e in errors] == ["RX00002", "RX00003"]
+    assert all("not understood" in e["error"] for e in errors)
+    created = _stored(db.CourierForm.created_at)
+    assert created[0] == datetime(2024, 1, 5)
+    assert created[1].date() == datetime.now().date()      # empty cell: import time
+
+
+def test_stale_errors_file_is_removed_on_a_clean_import(fresh_db, tmp_path, booking):
+    path = tmp_path / "bookings.csv"
+    (tmp_path / "bookings.errors.csv").write_text("old")
+    _write_csv(path, [booking("RX00001")])
+
+    assert importer.import_bookings(str(path)) == (1, 0, None)
+    assert not (tmp_path / "bookings.errors.csv").exists()
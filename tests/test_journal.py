@@ -0,0 +1,126 @@
+import sqlite3
+from datetime import datetime
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+import db
+import journal
+
+
+def _count(receipt=None):
+    with db._engine.connect() as conn:
+        if receipt is None:
+            return conn.exec_driver_sql("SELECT COUNT(*) FROM courier_forms").scalar()
+        return conn.exec_driver_sql("SELECT COUNT(*) FROM courier_forms WHERE receipt_no = ?",
+                                    (receipt,)).scalar()
+
+
+def test_encode_decode_round_trip(booking):
+    data = booking("RX00001", created_at=datetime(2025, 5, 1, 9, 30, 15, 123))
+    line = journal._encode(data)
+    assert line.endswith(b"\n")
+    assert journal._decode(line) == data
+
+
+def test_decode_rejects_bad_crc(booking):
+    line = bytearray(journal._encode(booking("RX00001")))
+    line[-3] ^= 0x01
+    assert journal._decode(bytes(line)) is None
+    assert journal._decode(b"zzzz {}\n") is None
+
+
+def test_torn_tail_is_dropped(tmp_path, booking):
+    path = tmp_path / "courierx.journal"
+    good = journal._encode(booking("RX00001"))
+    path.write_bytes(good + journal._encode(booking("RX00002"))[:40])
+    j = journal.BookingJournal(str(path), apply=lambda rows: (len(rows), 0, []))
+    try:
+        assert path.read_bytes() == good
+        assert j.pending() == 1
+        assert j.pending_receipts() == {"RX00001"}
+    finally:
+        j.close()
+
+
+def test_drain_applies_and_compacts(fresh_db, tmp_path, booking):
+    path = tmp_path / "courierx.journal"
+    j = journal.BookingJournal(str(path))
+    try:
+        for i in range(1, 6):
+            assert j.append(booking(f"RX{i:05d}")) == (True, None)
+        assert j.pending() == 5
+        assert j.pending_receipts() == {f"RX{i:05d}" for i in range(1, 6)}
+        assert j.drain_once() == 5
+        assert j.pending() == 0 and j.pending_receipts() == set()
+        assert path.stat().st_size == 0
+    finally:
+        j.close()
+    assert _count() == 5
+
+
+def test_replay_after_crash_skips_applied_rows(fresh_db, tmp_path, booking):
+    path = tmp_path / "courierx.journal"
+    lines = [journal._encode(booking(f"RX{i:05d}", created_at=datetime(2025, 1, 1, 10, i))) for i in range(1, 4)]
+    path.write_bytes(b"".join(lines))
+    # First two were written before the crash, the journal was never compacted
+    db.insert_forms_once([journal._decode(line) for line in lines[:2]])
+    j = journal.BookingJournal(str(path))
+    try:
+        assert j.drain_once() == 1
+    finally:
+        j.close()
+    assert _count() == 3
+    assert not (tmp_path / "courierx.journal.rejected").exists()
+
+
+def test_receipt_collision_is_rejected_and_reported(fresh_db, tmp_path, booking):
+    assert db.insert_form_row_sqlalchemy(booking("RX00001"))[0]
+    reported = []
+    path = tmp_path / "courierx.journal"
+    j = journal.BookingJournal(str(path), on_reject=reported.extend)
+    try:
+        j.append(booking("RX00001", receiver_name="Someone Else"))
+        j.append(booking("RX00002"))
+        assert j.drain_once() == 1
+    finally:
+        j.close()
+    assert reported == [("RX00001", "Receipt RX00001 already used by another booking")]
+    rejected = (tmp_path / "courierx.journal.rejected").read_bytes()
+    assert b"Someone Else" in rejected
+    assert _count("RX00001") == 1 and _count("RX00002") == 1
+
+
+def test_insert_forms_once_stored_row_without_created_at(fresh_db, booking):
+    with db._engine.begin() as conn:
+        conn.exec_driver_sql("INSERT INTO courier_forms (receipt_no, sender_name) VALUES ('RX00001', 'Old Row')")
+    rows = [booking("RX00001", created_at=datetime(2025, 1, 1)), booking("RX00002", created_at=datetime(2025, 1, 1))]
+    inserted, skipped, conflicts = db.insert_forms_once(rows)
+    assert (inserted, skipped) == (1, 0)
+    assert [d["receipt_no"] for d, _ in conflicts] == ["RX00001"]
+
+
+def test_insert_forms_once_falls_back_to_row_by_row(fresh_db, booking):
+    # A constraint the receipt pre-check can't see: the batch fails, then only the bad row does
+    with db._engine.begin() as conn:
+        conn.exec_driver_sql("CREATE UNIQUE INDEX ux_test_token ON courier_forms (token_no)")
+    ts = datetime(2025, 1, 1)
+    rows = [booking("RX00001", token_no="A", created_at=ts), booking("RX00002", token_no="B", created_at=ts),
+            booking("RX00003", token_no="B", created_at=ts), booking("RX00004", token_no="C", created_at=ts)]
+    inserted, skipped, conflicts = db.insert_forms_once(rows)
+    assert (inserted, skipped) == (3, 0)
+    assert [d["receipt_no"] for d, _ in conflicts] == ["RX00003"]
+    assert _count() == 3
+
+
+def test_locked_db_propagates(fresh_db, booking):
+    # "database is locked" must reach the drainer (which backs off), not become a conflict
+    db._engine.dispose()
+    lock = sqlite3.connect(str(fresh_db), timeout=0)
+    lock.execute("BEGIN EXCLUSIVE")
+    try:
+        with pytest.raises(OperationalError):
+            db.insert_forms_once([booking("RX00001", created_at=datetime(2025, 1, 1))])
+    finally:
+        lock.rollback()
+        lock.close()
@@ -0,0 +1,95 @@
+import sqlite3
+from datetime import datetime
+
+import db
+
+# courier_forms as the first release created it (no indexes, text price/weight)
+BASELINE_SCHEMA = """
+CREATE TABLE courier_forms (
+    id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+    receipt_no VARCHAR(32), token_no VARCHAR(32), weight VARCHAR(32), price VARCHAR(32),
+    sender_name VARCHAR(128), sender_address VARCHAR(256), sender_pincode VARCHAR(16),
+    sender_phone VARCHAR(16), receiver_name VARCHAR(128), house VARCHAR(64), street VARCHAR(128),
+    locality VARCHAR(128), city VARCHAR(128), state VARCHAR(64), receiver_pincode VARCHAR(16),
+    receiver_phone VARCHAR(16), created_at DATETIME, updated_at DATETIME
+)"""
+
+
+def _baseline_db(path, rows):
+    conn = sqlite3.connect(path)
+    conn.execute(BASELINE_SCHEMA)
+    conn.executemany(
+        "INSERT INTO courier_forms (receipt_no, price, weight, sender_name, receiver_name, city, state, "
+        "created_at, updated_at) VALUES (?, ?, ?, 'Asha Rao', 'Vikram Singh', 'Jaipur', 'Rajasthan', ?, ?)",
+        [(r, p, w, ts, ts) for r, p, w, ts in rows])
+    conn.commit()
+    conn.close()
+
+
+def _user_version(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_migrate_db_on_courier_forms_only(tmp_path):
+    # What benchmarks/bench_db_indexes.py does: only courier_forms exists, no create_all
+    path = tmp_path / "bench.db"
+    _baseline_db(path, [("RX00001", "100", "1", "2025-01-01 10:00:00.000000")])
+    engine = db.create_engine(f"sqlite:///{path}")
+    try:
+        assert db.migrate_db(engine) == db.SCHEMA_VERSION
+    finally:
+        engine.dispose()
+
+
+def test_baseline_db_is_upgraded(tmp_path):
+    path = tmp_path / "courierx.db"
+    _baseline_db(path, [
+        ("RX00007", "₹1,250.50", "1.25 kg", "2025-01-01 10:00:00.000000"),
+        ("RX00003", "oops", "2", "2025-01-01 11:00:00.000000"),
+        ("RX00009", "80", "", "2025-01-02 09:00:00.000000"),
+    ])
+    engine = db.init_db(f"sqlite:///{path}")
+    try:
+        assert _user_version(path) == db.SCHEMA_VERSION
+        with engine.connect() as conn:
+            got = dict(conn.exec_driver_sql(
+                "SELECT receipt_no, price_paise FROM courier_forms").all())
+            unique = {r[1]: r[2] for r in conn.exec_driver_sql("PRAGMA index_list(courier_forms)")}
+        assert got == {"RX00007": 125050, "RX00003": None, "RX00009": 8000}
+        assert unique["ux_courier_forms_receipt_no"] == 1
+        # sequence continues after the highest stored number
+        assert db.allocate_receipt_no() == "RX00010"
+        # search index was built from the existing rows
+        assert len(db.search_booking_ids("Vikram")) == 3
+
+        s = db.dashboard_summary("2025-01-01", "2025-01-02")
+        assert s["bookings"] == 3
+        assert s["revenue_paise"] == 133050 and isinstance(s["revenue_paise"], int)
+        assert s["weight_grams"] == 3250
+        assert [tuple(r) for r in s["daily"]] == [("2025-01-02", 1, 8000, 0), ("2025-01-01", 2, 125050, 3250)]
+    finally:
+        db.SessionLocal.remove()
+        engine.dispose()
+        db._receipt_block.clear()
+
+
+def test_current_db_skips_migrations(fresh_db, monkeypatch):
+    calls = []
+    monkeypatch.setattr(db, "migrate_db", lambda engine: calls.append(engine))
+    engine = db.init_db(f"sqlite:///{fresh_db}")
+    engine.dispose()
+    assert calls == []
+
+
+def test_rollups_stay_exact(fresh_db, booking):
+    rows = [booking(f"RX{i:05d}", price="0.10", weight="0.001",
+                    created_at=datetime(2025, 3, 1, 12, 0)) for i in range(1, 1001)]
+    assert db.bulk_insert_forms(rows)[0] == 1000
+    s = db.dashboard_summary("2025-03-01", "2025-03-01")
+    # 1000 x 0.10 sums to exactly 100.00 (a float column drifts)
+    assert s["revenue_paise"] == 10000
+    assert s["weight_grams"] == 1000
@@ -0,0 +1,32 @@
+from pincodes import PinIndex, PrefixIndex, lookup_pin
+
+
+def _index():
+    idx = PinIndex()
+    idx.add("302006", "Jaipur", "Rajasthan", "Civil Lines")
+    idx.add("302006", "Ignored", "Ignored", "C-Scheme")
+    idx.add("302006", "", "", "civil lines")
+    idx.add("560001", "Bangalore", "Karnataka", "MG Road")
+    return idx
+
+
+def test_prefix_suggestions_are_scoped_and_case_insensitive():
+    localities = _index().locality_index()
+    assert localities.suggest("c", scope="302006") == ["C-Scheme", "Civil Lines"]
+    assert localities.suggest("CIV", scope="302006") == ["Civil Lines"]
+    assert localities.suggest("c", scope="560001") == []
+    assert localities.suggest("", scope="560001") == ["MG Road"]
+    assert PrefixIndex().suggest("") == []
+
+
+def test_prefix_suggestions_respect_the_limit():
+    idx = PrefixIndex((PrefixIndex.key(f"Area {i:02d}"), f"Area {i:02d}") for i in range(30))
+    assert idx.suggest("area", limit=3) == ["Area 00", "Area 01", "Area 02"]
+
+
+def test_lookup_pin_validates_before_the_index():
+    idx = _index()
+    assert lookup_pin(idx, " 302006 ") == ("Jaipur", "Rajasthan")
+    assert lookup_pin(idx, "30200") == (None, None)
+    assert lookup_pin(idx, "999999") == (None, None)
+    assert lookup_pin(None, "302006") == (None, None)
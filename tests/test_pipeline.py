@@ -0,0 +1,41 @@
+import os
+import time
+
+import pipeline
+
+
+def test_cleanup_removes_only_old_print_temp_files(tmp_path):
+    old = time.time() - 2 * pipeline.TEMP_MAX_AGE
+    names = {
+        "courierx_k2j9_x0a.txt": True, "courierx_batch_ab12cd34.pdf": True,
+        "courierx_manifest_zz99yy88.prn": True, "courierx_receipt_counter.txt": False,
+        "courierx.db": False, "other_ab12cd34.pdf": False,
+    }
+    for name in names:
+        (tmp_path / name).write_text("x")
+        os.utime(tmp_path / name, (old, old))
+    (tmp_path / "courierx_fresh123.txt").write_text("x")     # may still be printing
+
+    assert pipeline.cleanup_temp_files(directory=str(tmp_path)) == 3
+    left = set(os.listdir(tmp_path))
+    assert left == {n for n, gone in names.items() if not gone} | {"courierx_fresh123.txt"}
+
+
+def test_failed_print_removes_its_temp_file(tmp_path, monkeypatch):
+    written = []
+
+    def fake_write(content, prefix="courierx_"):
+        path = tmp_path / "courierx_abcd1234.txt"
+        path.write_text(content)
+        written.append(path)
+        return str(path)
+
+    def broken_printer(path):
+        raise OSError("printer offline")
+
+    monkeypatch.setattr(pipeline, "write_temp_receipt", fake_write)
+    p = pipeline.BookingPipeline(lambda data: (True, None), lambda data: "receipt", printer=broken_printer)
+    job = p.submit({"receipt_no": "RX00001"})
+    p.wait()
+    assert job.status == pipeline.FAILED
+    assert written and not written[0].exists()
@@ -0,0 +1,84 @@
+import sqlite3
+
+import db
+
+
+def _store(path, receipts):
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        "INSERT INTO courier_forms (receipt_no, created_at, updated_at) "
+        "VALUES (?, '2025-01-01 10:00:00', '2025-01-01 10:00:00')", [(r,) for r in receipts])
+    conn.commit()
+    conn.close()
+
+
+def _next_value(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT next_value FROM receipt_sequence WHERE name = ?",
+                            (db.RECEIPT_SEQUENCE,)).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_numbers_are_sequential_and_never_repeat(fresh_db):
+    first = [db.allocate_receipt_no() for _ in range(3)]
+    assert first == ["RX00001", "RX00002", "RX00003"]
+    db._receipt_block.clear()           # another process / restart without release
+    assert db.allocate_receipt_no() == db.format_receipt_no(1 + db.RECEIPT_BLOCK_SIZE)
+
+
+def test_reset_jumps_over_stored_numbers_in_one_reservation(fresh_db):
+    _store(fresh_db, [db.format_receipt_no(i) for i in range(1, 5001)] + ["RX05003"])
+    db.reset_receipt_sequence(1)
+    assert db.allocate_receipt_no() == "RX05001"
+    assert db.allocate_receipt_no() == "RX05002"
+    assert db.allocate_receipt_no() == "RX05004"
+    assert _next_value(fresh_db) == 5001 + db.RECEIPT_BLOCK_SIZE
+
+
+def test_journal_pending_numbers_are_skipped(fresh_db):
+    taken = {"RX00001", "RX00003"}
+    got = [db.allocate_receipt_no(taken) for _ in range(2)]
+    assert got == ["RX00002", "RX00004"]
+
+
+def test_release_gives_the_unused_tail_back(fresh_db):
+    assert db.allocate_receipt_no() == "RX00001"
+    shown = db.allocate_receipt_no()    # on the form at exit, never saved
+    assert db.release_receipt_numbers([shown]) == db.RECEIPT_BLOCK_SIZE - 1
+    assert _next_value(fresh_db) == 2
+    assert db.allocate_receipt_no() == "RX00002"
+
+
+def test_release_keeps_numbers_after_another_reservation(fresh_db):
+    db.allocate_receipt_no()
+    conn = sqlite3.connect(fresh_db)
+    conn.execute("UPDATE receipt_sequence SET next_value = next_value + 20")
+    conn.commit()
+    conn.close()
+    assert db.release_receipt_numbers() == 0
+    assert _next_value(fresh_db) == 1 + 2 * db.RECEIPT_BLOCK_SIZE
+
+
+def test_unique_index_is_retried_once_duplicates_are_gone(fresh_db):
+    conn = sqlite3.connect(fresh_db)
+    conn.execute("DROP INDEX ux_courier_forms_receipt_no")
+    conn.execute("CREATE INDEX ux_courier_forms_receipt_no ON courier_forms (receipt_no)")
+    conn.commit()
+    conn.close()
+    _store(fresh_db, ["RX00007", "RX00007"])
+    with db._engine.begin() as c:
+        assert db._ensure_unique_receipts(c) is False
+
+    conn = sqlite3.connect(fresh_db)
+    conn.execute("DELETE FROM courier_forms WHERE id = (SELECT MAX(id) FROM courier_forms)")
+    conn.commit()
+    conn.close()
+    db.SessionLocal.remove()
+    db._engine.dispose()
+    db.init_db(f"sqlite:///{fresh_db}")   # schema is current: only the index check runs
+    conn = sqlite3.connect(fresh_db)
+    unique = {r[1]: r[2] for r in conn.execute("PRAGMA index_list(courier_forms)")}
+    conn.close()
+    assert unique["ux_courier_forms_receipt_no"] == 1
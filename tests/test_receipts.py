@@ -0,0 +1,31 @@
+import pytest
+
+import receipts
+
+
+def test_default_template_renders_every_field(booking):
+    text = receipts.render_text(booking("RX00001"), timestamp="2024-01-01 10:00:00")
+    assert "RX00001" in text and "Vikram Singh" in text and "2024-01-01 10:00:00" in text
+
+
+@pytest.mark.parametrize("line", [
+    "center: Ref {reciept_no}",         # misspelt field
+    "left: {sender_name.upper}",        # attribute access
+    "right: Phone } {receiver_phone}",  # stray brace
+    "right: {receiver_phone",           # unclosed placeholder
+])
+def test_bad_placeholders_are_rejected_at_parse_time(line):
+    with pytest.raises(ValueError, match="line 2"):
+        receipts.parse_template(f"title: Receipt\n{line}\n")
+
+
+def test_escaped_braces_and_format_specs_are_allowed(booking):
+    tpl = receipts.parse_template("title: Receipt\ncenter: {{{receipt_no}}} {price:>8}\n")
+    assert "{RX00001}   120.50" in receipts.render_text(booking("RX00001"), tpl)
+
+
+def test_load_template_rejects_a_bad_file(tmp_path):
+    path = tmp_path / "receipt_template.txt"
+    path.write_text("title: Receipt\nleft: {nope}\n", encoding="utf-8")
+    with pytest.raises(ValueError, match="unknown field"):
+        receipts.load_template(str(path))
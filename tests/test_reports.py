@@ -0,0 +1,42 @@
+from datetime import datetime, timedelta
+
+import db
+
+
+def test_recent_pages_cover_every_row_once_newest_first(fresh_db, booking):
+    now = datetime.now().replace(microsecond=0)
+    rows = []
+    for i in range(1, 26):
+        # pairs of bookings share a timestamp, so the cursor must break ties on id
+        rows.append(booking(f"RX{i:05d}", created_at=now - timedelta(minutes=i // 2)))
+    rows.append(booking("RX00099", created_at=now - timedelta(days=db.RECENT_DAYS + 1)))
+    assert db.bulk_insert_forms(rows)[0] == len(rows)
+
+    seen, cursor = [], None
+    while True:
+        page = db.recent_bookings_page(cursor, limit=4)
+        seen += [(r.created_at, r.id) for r in page]
+        if len(page) < 4:
+            break
+        cursor = (page[-1].created_at, page[-1].id)
+
+    assert len(seen) == 25 == len(set(seen))
+    assert seen == sorted(seen, reverse=True)
+
+
+def test_newer_pages_walk_back_to_the_top(fresh_db, booking):
+    now = datetime.now().replace(microsecond=0)
+    rows = [booking(f"RX{i:05d}", created_at=now - timedelta(minutes=i // 3)) for i in range(1, 31)]
+    assert db.bulk_insert_forms(rows)[0] == len(rows)
+    everything = [r.id for r in db.recent_bookings_page(limit=100)]
+
+    last = db.recent_bookings_page(limit=100)[-1]
+    seen, cursor = [last.id], (last.created_at, last.id)
+    while True:
+        page = db.recent_bookings_page(cursor, limit=4, newer=True)
+        seen = [r.id for r in page] + seen
+        if len(page) < 4:
+            break
+        cursor = (page[0].created_at, page[0].id)
+
+    assert seen == everything
@@ -0,0 +1,39 @@
+import db
+
+
+def _match(query):
+    with db._engine.connect() as conn:
+        return db._fts_match_expr(conn, query)
+
+
+def test_match_expression_quotes_every_term(fresh_db):
+    expr = _match('vik "rao')
+    assert expr is not None and " AND " in expr
+    assert '""' in expr                     # embedded quote is escaped, not an FTS5 syntax error
+
+
+def test_search_finds_by_name_phone_and_receipt(fresh_db, booking):
+    db.insert_form_row_sqlalchemy(booking("RX00001"))
+    db.insert_form_row_sqlalchemy(booking("RX00002", receiver_name="Meera Iyer",
+                                          receiver_phone="9000012345", token_no="T7"))
+    [meera] = db.search_booking_ids("meera")
+    assert db.search_booking_ids("000123") == [meera]
+    assert db.search_booking_ids("RX00002") == [meera]
+    assert db.search_booking_ids("T7") == [meera]       # too short for trigrams: exact token
+    assert len(db.search_booking_ids("vikram")) == 1
+    assert db.search_booking_ids('"') == []
+
+
+def test_bulk_and_journal_inserts_are_indexed_set_wise(fresh_db, booking):
+    rows = [booking(f"RX{i:05d}", receiver_name=f"Bulk Person {i}") for i in range(1, 51)]
+    inserted, failures = db.bulk_insert_forms(iter(rows), chunk_size=20)
+    assert (inserted, failures) == (50, [])
+    db.insert_forms_once([booking("RX00099", receiver_name="Journal Person")])
+    db.insert_form_row_sqlalchemy(booking("RX00100", receiver_name="Single Person"))   # via the trigger
+
+    assert len(db.search_booking_ids("bulk person")) == 50
+    assert len(db.search_booking_ids("journal person")) == 1
+    assert len(db.search_booking_ids("single person")) == 1
+    with db._engine.begin() as conn:
+        conn.exec_driver_sql(f"INSERT INTO {db.FTS_TABLE} ({db.FTS_TABLE}) VALUES ('integrity-check')")
+        assert conn.exec_driver_sql(f"SELECT COUNT(*) FROM {db.FTS_PAUSE_TABLE}").scalar() == 0
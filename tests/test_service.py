@@ -0,0 +1,59 @@
+import http.client
+import json
+import threading
+
+import pytest
+
+import db
+import service
+
+
+@pytest.fixture
+def api(tmp_path):
+    server = service.make_server(str(tmp_path / "courierx.db"), port=0, workers=2)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server.server_port
+    server.shutdown()
+    server.server_close()
+    db.SessionLocal.remove()
+    db._engine.dispose()
+    db._receipt_block.clear()
+    db._receipt_range[:] = [0, 0]
+
+
+def _request(port, method, path, body=None, headers=None):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    try:
+        conn.request(method, path, body=body, headers=headers or {})
+        resp = conn.getresponse()
+        return resp.status, json.loads(resp.read())
+    finally:
+        conn.close()
+
+
+def test_days_out_of_range_is_a_client_error(api):
+    assert _request(api, "GET", f"/bookings?days={service.MAX_DAYS}")[0] == 200
+    status, payload = _request(api, "GET", "/bookings?days=99999999999")
+    assert status == 400 and "days" in payload["error"]
+
+
+def test_bad_content_length_is_a_client_error(api):
+    status, payload = _request(api, "POST", "/bookings", body=b"{}",
+                               headers={"Content-Length": "abc"})
+    assert status == 400
+
+
+def test_summary_defaults_to_the_dashboard_range(api):
+    status, payload = _request(api, "GET", "/reports/summary")
+    first, last = db.recent_day_range()
+    assert status == 200
+    assert (payload["from"], payload["to"]) == (first.isoformat(), last.isoformat())
+
+
+def test_rejected_bookings_do_not_use_up_receipt_numbers(api, booking):
+    bad = json.dumps({**booking(""), "sender_phone": "123"}).encode()
+    for _ in range(3):
+        assert _request(api, "POST", "/bookings", body=bad, headers={"Content-Type": "application/json"})[0] == 400
+    good = json.dumps(booking("")).encode()
+    status, payload = _request(api, "POST", "/bookings", body=good, headers={"Content-Type": "application/json"})
+    assert (status, payload) == (201, {"receipt_no": "RX00001"})
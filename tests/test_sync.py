@@ -0,0 +1,108 @@
+import sqlite3
+
+import pytest
+
+import sync
+
+
+@pytest.mark.parametrize("path, network", [
+    ("//north/courierx/courierx.db", True),
+    ("\\\\north\\courierx\\courierx.db", True),
+    ("\\\\?\\UNC\\north\\courierx\\courierx.db", True),
+    ("\\\\?\\C:\\courierx\\courierx.db", False),
+    ("D:/south/courierx.db", False),
+    ("courierx.db", False),
+])
+def test_network_paths_are_recognised(path, network):
+    assert sync.is_network_path(path) is network
+
+
+def test_pull_refuses_a_share():
+    with pytest.raises(ValueError, match="snapshot"):
+        sync._open_branch("//north/courierx/courierx.db")
+
+
+def test_snapshot_of_a_wal_db_pulls_like_the_original(fresh_db, booking, tmp_path):
+    import db
+    for i in range(1, 4):
+        assert db.insert_form_row_sqlalchemy(booking(f"RX0000{i}"))[0]
+    snap = str(tmp_path / "north-snapshot.db")
+    sync.snapshot_db(str(fresh_db), snap)
+
+    conn = sqlite3.connect(snap)
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+    conn.close()
+    central = sync.central_engine(str(tmp_path / "central.db"))
+    assert sync.pull_branch(central, "north", snap)["inserted"] == 3
+    central.dispose()
+
+
+def _edit_branch(path, source_id, updated_at, **values):
+    conn = sqlite3.connect(str(path))
+    sets = ", ".join(f"{k} = ?" for k in values)
+    conn.execute(f"UPDATE courier_forms SET {sets}, updated_at = ? WHERE id = ?",
+                 (*values.values(), f"{updated_at:%Y-%m-%d %H:%M:%S.%f}", source_id))
+    conn.commit()
+    conn.close()
+
+
+def _central_rows(central):
+    c = sync.central_bookings.c
+    with central.connect() as conn:
+        return {r.source_id: r for r in conn.execute(
+            sync.select(c.source_id, c.receipt_key, c.receiver_name))}
+
+
+def test_a_run_stopped_after_one_batch_loses_no_edits(fresh_db, booking, tmp_path):
+    import db
+    from datetime import datetime, timedelta
+    for i in range(1, 4):
+        assert db.insert_form_row_sqlalchemy(booking(f"RX0000{i}"))[0]
+    central = sync.central_engine(str(tmp_path / "central.db"))
+    sync.pull_branch(central, "north", str(fresh_db))
+
+    later = datetime.now() + timedelta(minutes=5)
+    _edit_branch(fresh_db, 1, later + timedelta(seconds=2), receiver_name="Edited last")
+    _edit_branch(fresh_db, 3, later + timedelta(seconds=1), receiver_name="Edited first")
+    branch = sync._open_branch(str(fresh_db))
+    last_id, last_upd, last_upd_id = sync.get_marks(central, "north")
+    first = next(sync.iter_deltas(branch, last_id, last_upd, 1, last_upd_id))
+    branch.dispose()
+    assert [r["id"] for r in first] == [3]          # oldest edit first, whatever its id
+    sync.apply_batch(central, "north", first)       # ...and the run stops here
+
+    assert sync.pull_branch(central, "north", str(fresh_db), batch_size=1)["updated"] == 1
+    rows = _central_rows(central)
+    assert (rows[1].receiver_name, rows[3].receiver_name) == ("Edited last", "Edited first")
+    central.dispose()
+
+
+def test_edited_receipt_no_moves_the_receipt_key(fresh_db, booking, tmp_path):
+    import db
+    from datetime import datetime, timedelta
+    for i in range(1, 3):
+        assert db.insert_form_row_sqlalchemy(booking(f"RX0000{i}"))[0]
+    central = sync.central_engine(str(tmp_path / "central.db"))
+    sync.pull_branch(central, "north", str(fresh_db))
+
+    later = datetime.now() + timedelta(minutes=5)
+    _edit_branch(fresh_db, 2, later, receipt_no="RX00009")
+    _edit_branch(fresh_db, 1, later, receiver_name="Same receipt")
+    totals = sync.pull_branch(central, "north", str(fresh_db))
+    rows = _central_rows(central)
+    assert (totals["updated"], totals["collisions"]) == (2, 0)
+    assert (rows[1].receipt_key, rows[2].receipt_key) == ("north:RX00001", "north:RX00009")
+    central.dispose()
+
+
+def test_central_store_from_before_the_id_mark_is_upgraded(tmp_path):
+    path = tmp_path / "central.db"
+    conn = sqlite3.connect(str(path))
+    conn.execute("CREATE TABLE sync_state (branch_id VARCHAR(32) PRIMARY KEY, last_id INTEGER NOT NULL, "
+                 "last_updated_at DATETIME, last_sync_at DATETIME, rows_total INTEGER NOT NULL)")
+    conn.execute("INSERT INTO sync_state VALUES ('north', 7, '2024-01-01 10:00:00.000000', NULL, 7)")
+    conn.commit()
+    conn.close()
+    central = sync.central_engine(str(path))
+    assert sync.get_marks(central, "north")[::2] == (7, None)
+    central.dispose()